@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Non interactive batch search. Reads one keyword per line from a file or stdin, fans the
+keywords out over worker processes that each own a browser and streams one JSON line
+per keyword and engine to stdout in completion order.
+
+    python batch.py --input keywords.txt --engine google --engine bing --workers 4 > results.jsonl
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import queue
+import sys
+import threading
+import time
+from constants.browser import SupportedBrowsers
+from selenium.common.exceptions import TimeoutException
+from pages.common_search import ConsentStats, SearchInterstitial
+from pages.engines import SEARCH_PAGES
+from utils import rate_limiter
+from utils.rate_limiter import RateLimiter
+from settings import BATCH_WORKERS, BATCH_QUEUE_DEPTH, RATE_LIMIT_REPORT_INTERVAL, USE_BROWSER_PROFILES
+
+
+def _outcome(error):
+    """
+    Rate limiter outcome of a search that raised error
+    """
+    if error is None:
+        return rate_limiter.OK
+    if isinstance(error, SearchInterstitial):
+        return rate_limiter.INTERSTITIAL
+    if isinstance(error, TimeoutException):
+        return rate_limiter.TIMEOUT
+    return rate_limiter.ERROR
+
+
+def _worker(worker_id, browser, max_pages, use_cache, lean, tabs, task_queue, result_queue):
+    """
+    Worker process, runs searches from task_queue until it receives None
+    """
+    from utils.driverclass import DriverClass
+    from utils.driverpool import DriverPool
+    from utils.profiles import ProfileManager
+    from utils.lean_browser import LeanStats
+    from utils.result_cache import ResultCache
+
+    driver_pool = DriverPool(browser=browser, size=1, profiles=ProfileManager() if USE_BROWSER_PROFILES else None,
+                             driver_factory=lambda **kwargs: DriverClass.register_driver(browser=browser, lean=lean,
+                                                                                         **kwargs))
+    cache = ResultCache() if use_cache else None
+    stats = {"worker": worker_id, "keywords": 0, "errors": 0, "busy_seconds": 0.0}
+    started = time.monotonic()
+    try:
+        if tabs > 1:
+            _tab_worker(worker_id, driver_pool, tabs, stats, task_queue, result_queue)
+        else:
+            while True:
+                task = task_queue.get()
+                if task is None:
+                    break
+                engine, keyword = task
+                task_started = time.monotonic()
+                record = {"engine": engine, "keyword": keyword, "worker": worker_id, "results": [], "error": None,
+                          "outcome": rate_limiter.OK}
+                collect_lean = None
+                if lean and browser == SupportedBrowsers.chrome:
+                    # drained in the session of the search, a search served from the cache starts no browser
+                    def collect_lean(driver, record=record):
+                        record["lean"] = LeanStats.collect(driver)
+                try:
+                    search = SEARCH_PAGES[engine].search(keyword, driver_pool, max_pages=max_pages, cache=cache,
+                                                         after_search=collect_lean)
+                    record["results"] = [result.to_dict() for result in search]
+                except Exception as e:
+                    record["error"] = str(e)
+                    record["outcome"] = _outcome(e)
+                    stats["errors"] += 1
+                record["seconds"] = round(time.monotonic() - task_started, 3)
+                stats["keywords"] += 1
+                stats["busy_seconds"] += record["seconds"]
+                result_queue.put(record)
+    finally:
+        driver_pool.close()
+        stats["wall_seconds"] = time.monotonic() - started
+        stats["consent"] = ConsentStats.report()
+        if cache is not None:
+            stats["cache"] = cache.report()
+        if lean and browser == SupportedBrowsers.chrome:
+            stats["lean"] = LeanStats.report()
+        result_queue.put(("done", stats))
+
+
+def _tab_worker(worker_id, driver_pool, tabs, stats, task_queue, result_queue):
+    """
+    Runs the tasks of a single engine in parallel tabs of one browser
+    """
+    from pages.tab_search import TabSearch
+
+    engines = set()
+
+    def queued_keywords():
+        while True:
+            task = task_queue.get()
+            if task is None:
+                return
+            engines.add(task[0])
+            yield task[1]
+
+    keywords = queued_keywords()
+    first_keyword = next(keywords, None)
+    if first_keyword is None:
+        return
+    engine = engines.pop()
+    with driver_pool.session() as driver:
+        search = TabSearch(driver, SEARCH_PAGES[engine], tabs=tabs)
+        for keyword, results, error, seconds in search.search_many(itertools.chain([first_keyword], keywords)):
+            stats["keywords"] += 1
+            stats["errors"] += 1 if error else 0
+            stats["busy_seconds"] += seconds
+            result_queue.put({"engine": engine, "keyword": keyword, "worker": worker_id,
+                              "error": str(error) if error else None, "outcome": _outcome(error),
+                              "results": [result.to_dict() for result in results], "seconds": round(seconds, 3)})
+
+
+def _feed(keywords, engines, task_queue, workers, limiter=None):
+    """
+    Puts keyword tasks on the bounded task queue, blocking while the workers catch up.
+    With a limiter every engine is dispatched by its own thread, so an engine that is
+    backing off does not hold up the others by more than the queue depth.
+    """
+    if limiter is None:
+        engine_queues = {engine: task_queue for engine in engines}
+        dispatchers = []
+    else:
+        engine_queues = {engine: queue.Queue(maxsize=workers * BATCH_QUEUE_DEPTH) for engine in engines}
+        dispatchers = [threading.Thread(target=_dispatch, args=(engine, engine_queues[engine], task_queue, limiter),
+                                        daemon=True)
+                       for engine in engines]
+    for dispatcher in dispatchers:
+        dispatcher.start()
+    for line in keywords:
+        keyword = line.strip()
+        if not keyword:
+            continue
+        for engine in engines:
+            engine_queues[engine].put((engine, keyword))
+    for dispatcher, engine in zip(dispatchers, engines):
+        engine_queues[engine].put(None)
+        dispatcher.join()
+    for _ in range(workers):
+        task_queue.put(None)
+
+
+def _dispatch(engine, engine_queue, task_queue, limiter):
+    """
+    Moves the tasks of one engine to the workers as fast as its rate limit allows
+    """
+    while True:
+        task = engine_queue.get()
+        if task is None:
+            return
+        limiter.acquire(engine)
+        task_queue.put(task)
+
+
+def run_batch(keywords, engines, workers=BATCH_WORKERS, browser=SupportedBrowsers.chrome, max_pages=1,
+              use_cache=False, lean=False, tabs=1, rate_limit=False, output=sys.stdout, metrics=sys.stderr):
+    """
+    Run every keyword against every engine and stream JSON lines to output
+    :param keywords: iterable of keyword lines
+    :param engines: list of SearchEngines member names
+    :param workers: number of worker processes
+    :param browser: browser type from SupportedBrowsers
+    :param max_pages: result pages per keyword
+    :param use_cache: serve results from the ResultCache where possible
+    :param lean: start the browsers with the lean profile
+    :param tabs: result pages each browser loads in parallel tabs, needs a single engine
+    :param rate_limit: pace every engine with an adaptive RateLimiter
+    :param output: file object the JSON lines are written to
+    :param metrics: file object the live rate limit metrics are written to
+    :return: (list of per worker stats, rate limit snapshot or None)
+    """
+    if tabs > 1 and len(engines) > 1:
+        raise ValueError("Searching in parallel tabs supports a single engine, got {}".format(engines))
+    task_queue = multiprocessing.Queue(maxsize=workers * max(tabs, BATCH_QUEUE_DEPTH))
+    result_queue = multiprocessing.Queue(maxsize=workers * BATCH_QUEUE_DEPTH)
+    processes = [multiprocessing.Process(target=_worker, daemon=True,
+                                         args=(worker_id, browser, max_pages, use_cache, lean, tabs, task_queue,
+                                               result_queue))
+                 for worker_id in range(workers)]
+    for process in processes:
+        process.start()
+    limiter = RateLimiter(max_concurrency=workers * tabs) if rate_limit else None
+    feeder = threading.Thread(target=_feed, args=(keywords, engines, task_queue, workers, limiter), daemon=True)
+    feeder.start()
+
+    worker_stats = []
+    next_report = time.monotonic() + RATE_LIMIT_REPORT_INTERVAL
+    while len(worker_stats) < workers:
+        if limiter is not None and time.monotonic() >= next_report:
+            metrics.write("rate limits {}\n".format(json.dumps(limiter.snapshot(), separators=(",", ":"))))
+            metrics.flush()
+            next_report = time.monotonic() + RATE_LIMIT_REPORT_INTERVAL
+        try:
+            record = result_queue.get(timeout=1)
+        except queue.Empty:
+            if not any(process.is_alive() for process in processes):
+                break
+            continue
+        if isinstance(record, tuple) and record[0] == "done":
+            worker_stats.append(record[1])
+            continue
+        if limiter is not None:
+            limiter.release(record["engine"], record["seconds"], record["outcome"])
+        output.write(json.dumps(record, separators=(",", ":")) + "\n")
+        output.flush()
+    for process in processes:
+        process.join()
+    return (sorted(worker_stats, key=lambda stats: stats["worker"]),
+            limiter.snapshot() if limiter is not None else None)
+
+
+def print_summary(worker_stats, rate_limits=None, stream=sys.stderr):
+    total_keywords = 0
+    for stats in worker_stats:
+        total_keywords += stats["keywords"]
+        throughput = stats["keywords"] / stats["wall_seconds"] if stats["wall_seconds"] else 0.0
+        stream.write("worker {worker}: {keywords} searches, {errors} errors, {busy:.1f}s busy, "
+                     "{throughput:.2f} searches/s, consent {consent}{cache}{lean}\n".format(
+                         worker=stats["worker"], keywords=stats["keywords"], errors=stats["errors"],
+                         busy=stats["busy_seconds"], throughput=throughput, consent=stats.get("consent"),
+                         cache=", cache {}".format(stats["cache"]) if "cache" in stats else "",
+                         lean=", lean {}".format(stats["lean"]) if "lean" in stats else ""))
+    for engine, snapshot in sorted((rate_limits or {}).items()):
+        stream.write("{engine}: rate {rate}/s, concurrency {concurrency}, {back_offs} back offs, "
+                     "{timeouts} timeouts, {interstitials} interstitials\n".format(engine=engine, **snapshot))
+    stream.write("total: {} searches\n".format(total_keywords))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", help="keyword file, one keyword per line (default: stdin)")
+    parser.add_argument("--engine", action="append", choices=sorted(SEARCH_PAGES),
+                        help="search engine, can be repeated (default: google)")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--browser", default=SupportedBrowsers.chrome,
+                        choices=[SupportedBrowsers.chrome, SupportedBrowsers.firefox])
+    parser.add_argument("--pages", type=int, default=1, help="result pages per keyword")
+    parser.add_argument("--cache", action="store_true", help="serve results from the result cache")
+    parser.add_argument("--lean", action="store_true", help="headless browsers without images, fonts and media")
+    parser.add_argument("--tabs", type=int, default=1, help="result pages each browser loads in parallel tabs")
+    parser.add_argument("--rate-limit", action="store_true",
+                        help="pace every engine adaptively, backing off on captchas and timeouts")
+    args = parser.parse_args(argv)
+
+    keywords = open(args.input, encoding="utf-8") if args.input else sys.stdin
+    try:
+        worker_stats, rate_limits = run_batch(keywords, args.engine or ["google"], workers=args.workers,
+                                              browser=args.browser, max_pages=args.pages, use_cache=args.cache,
+                                              lean=args.lean, tabs=args.tabs, rate_limit=args.rate_limit)
+    finally:
+        if keywords is not sys.stdin:
+            keywords.close()
+    print_summary(worker_stats, rate_limits)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,323 @@
+"""
+Local stand-in for an Appium / WinAppDriver endpoint driving the Windows calculator. It
+speaks enough of the W3C WebDriver protocol for the calculator suite and the shared
+session manager of utils.appium_session, so both run on machines without Windows.
+Sessions, commands and TCP connections are counted to check session reuse and keep-alive.
+
+    python -m benchmarks.appium_stand_in --port 4723
+"""
+
+import argparse
+import itertools
+import json
+import re
+import socket
+import threading
+import time
+from decimal import Decimal, localcontext
+from fractions import Fraction
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from selenium.webdriver.common.keys import Keys
+from utils.calculator_engine import KEYBOARD, KEYPAD, RESULTS_ID
+
+# automation id and accessibility name of every key of the calculator in standard mode
+CALCULATOR_KEYS = {
+    "num0Button": "Zero", "num1Button": "One", "num2Button": "Two", "num3Button": "Three",
+    "num4Button": "Four", "num5Button": "Five", "num6Button": "Six", "num7Button": "Seven",
+    "num8Button": "Eight", "num9Button": "Nine", "decimalSeparatorButton": "Decimal separator",
+    "plusButton": "Plus", "minusButton": "Minus", "multiplyButton": "Multiply by", "divideButton": "Divide by",
+    "equalButton": "Equals", "negateButton": "Positive negative", "clearButton": "Clear",
+    "clearEntryButton": "Clear entry", "backSpaceButton": "Backspace",
+}
+# automation id of the key a keystroke presses, Escape clears like the Clear key
+SHORTCUTS = dict({shortcut: KEYPAD[key] for key, shortcut in KEYBOARD.items()}, **{"\n": "equalButton"})
+ELEMENT_KEY = "element-6066-11e4-a52e-4f735466cecf"
+# the display is formatted here on its own, the engine checks it against its own expectation
+DISPLAY_DIGITS = 16
+DIVIDE_BY_ZERO_MESSAGE = "Cannot divide by zero"
+
+
+class Calculator:
+    """
+    Standard mode calculator, evaluates left to right like the Windows one. After a division
+    by zero only digits and the clear keys work, a digit clears the error and starts over.
+    """
+    OPERATIONS = {"plusButton": "+", "minusButton": "-", "multiplyButton": "*", "divideButton": "/"}
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.entry = "0"
+        self.accumulator = None
+        self.operation = None
+        self.fresh = True
+        self.error = None
+
+    def _apply(self):
+        value = Fraction(self.entry)
+        if self.operation is None or self.accumulator is None:
+            return value
+        if self.operation == "+":
+            return self.accumulator + value
+        if self.operation == "-":
+            return self.accumulator - value
+        if self.operation == "*":
+            return self.accumulator * value
+        if value == 0:
+            raise ZeroDivisionError
+        return self.accumulator / value
+
+    def _show(self, value):
+        self.entry = str(value.numerator) if value.denominator == 1 else str(value)
+
+    def press(self, key):
+        if self.error:
+            if not (key.startswith("num") or key in ("decimalSeparatorButton", "clearButton", "clearEntryButton")):
+                return
+            self.clear()
+        if key.startswith("num"):
+            digit = key[3]
+            self.entry = digit if self.fresh or self.entry == "0" else self.entry + digit
+            self.fresh = False
+        elif key == "decimalSeparatorButton":
+            if self.fresh:
+                self.entry, self.fresh = "0.", False
+            elif "." not in self.entry:
+                self.entry += "."
+        elif key == "negateButton":
+            self._show(-Fraction(self.entry))
+        elif key in self.OPERATIONS or key == "equalButton":
+            try:
+                if not (self.fresh and key in self.OPERATIONS and self.operation):
+                    result = self._apply()
+                    self.accumulator = result
+                    self._show(result)
+            except ZeroDivisionError:
+                self.clear()
+                self.error = DIVIDE_BY_ZERO_MESSAGE
+                return
+            self.operation = self.OPERATIONS.get(key)
+            self.fresh = True
+        elif key in ("clearButton", "clearEntryButton"):
+            self.clear()
+        elif key == "backSpaceButton" and not self.fresh:
+            self.entry = self.entry[:-1] or "0"
+
+    @staticmethod
+    def _format(value):
+        """
+        Rounded to the digits of the display, with thousands separators or as e.g. 1.e+20
+        """
+        with localcontext() as context:
+            context.prec = DISPLAY_DIGITS
+            number = (Decimal(abs(value.numerator)) / Decimal(value.denominator)).normalize()
+        sign = "-" if value < 0 else ""
+        if number and number.adjusted() >= DISPLAY_DIGITS:
+            mantissa = "".join(map(str, number.as_tuple().digits))
+            return "{}{}.{}e+{}".format(sign, mantissa[0], mantissa[1:], number.adjusted())
+        integer, _, fraction = "{:f}".format(number).partition(".")
+        return sign + "{:,}".format(int(integer)) + ("." + fraction if fraction else "")
+
+    def display(self):
+        if self.error:
+            return "Display is {}".format(self.error)
+        if self.entry.endswith("."):
+            return "Display is {}.".format(self._format(Fraction(self.entry[:-1])))
+        return "Display is {}".format(self._format(Fraction(self.entry)))
+
+
+class AppiumStandIn:
+    """
+    Usage:
+        with AppiumStandIn() as server:
+            driver = AppiumSessions.session({"app": CALCULATOR_APP_ID}, endpoint=server.url)
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, session_delay=0.0, command_delay=0.0):
+        """
+        :param port: port to listen on, 0 picks a free one
+        :param session_delay: seconds a new session takes, launching the app is the slow part
+        :param command_delay: seconds every other command takes
+        """
+        self.session_delay = session_delay
+        self.command_delay = command_delay
+        self.sessions = {}
+        self.sessions_created = 0
+        self.commands = 0
+        self.connections = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # headers and body are separate writes, Nagle would hold the body back for a delayed ack
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with server._lock:
+                    server.connections += 1
+
+            def _handle(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+                status, value = server.handle(method, self.path, body)
+                payload = json.dumps({"value": value}).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def do_DELETE(self):
+                self._handle("DELETE")
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    @staticmethod
+    def _error(status, error, message):
+        return status, {"error": error, "message": message, "stacktrace": ""}
+
+    @staticmethod
+    def _element(automation_id):
+        return {ELEMENT_KEY: automation_id}
+
+    @staticmethod
+    def _find(using, value):
+        """
+        :return: automation ids of the elements matching a locator
+        """
+        elements = dict(CALCULATOR_KEYS, **{RESULTS_ID: "Display"})
+        if using in ("accessibility id", "id"):
+            return [value] if value in elements else []
+        if using == "name":
+            return [automation_id for automation_id, name in elements.items() if name == value]
+        if using == "css selector":
+            # the selenium client sends name lookups as css attribute selectors
+            match = re.fullmatch(r'\[name="(.*)"\]', value)
+            return [automation_id for automation_id, name in elements.items() if match and name == match.group(1)]
+        return []
+
+    def handle(self, method, path, body):
+        """
+        :return: (http status, value of the response)
+        """
+        with self._lock:
+            self.commands += 1
+        parts = path.strip("/").split("/")
+        if parts == ["status"]:
+            return 200, {"ready": True, "message": "stand-in"}
+        if parts == ["session"] and method == "POST":
+            time.sleep(self.session_delay)
+            session_id = "stand-in-{}".format(next(self._ids))
+            capabilities = body.get("capabilities", {}).get("alwaysMatch", {})
+            with self._lock:
+                self.sessions[session_id] = Calculator()
+                self.sessions_created += 1
+            return 200, {"sessionId": session_id, "capabilities": dict(capabilities, platformName="Windows")}
+        calculator = self.sessions.get(parts[1]) if len(parts) > 1 and parts[0] == "session" else None
+        if calculator is None:
+            return self._error(404, "invalid session id", "No session {}".format(path))
+        time.sleep(self.command_delay)
+        command = parts[2:]
+        if not command and method == "DELETE":
+            with self._lock:
+                del self.sessions[parts[1]]
+            return 200, None
+        if command == ["window"]:
+            return 200, "calculator-window"
+        if command in (["element"], ["elements"]):
+            found = self._find(body.get("using"), body.get("value"))
+            if command == ["elements"]:
+                return 200, [self._element(automation_id) for automation_id in found]
+            if not found:
+                return self._error(404, "no such element", "No element {using} {value}".format(**body))
+            return 200, self._element(found[0])
+        if len(command) == 3 and command[0] == "element":
+            element, action = command[1], command[2]
+            if action == "click" and element in CALCULATOR_KEYS:
+                calculator.press(element)
+                return 200, None
+            if action == "text":
+                return 200, calculator.display() if element == RESULTS_ID else CALCULATOR_KEYS.get(element, "")
+            if action == "value":
+                for character in body.get("text", ""):
+                    if character in SHORTCUTS:
+                        calculator.press(SHORTCUTS[character])
+                return 200, None
+            if action == "displayed":
+                return 200, True
+        if command == ["actions"] and method == "POST":
+            self._perform(calculator, body.get("actions", []))
+            return 200, None
+        if command == ["actions"] and method == "DELETE":
+            return 200, None
+        return self._error(404, "unknown command", "{} {} is not emulated".format(method, path))
+
+    @staticmethod
+    def _perform(calculator, sources):
+        """
+        W3C actions, a pointer down and up over a key presses it, key strokes press their shortcut
+        """
+        for source in sources:
+            target = None
+            for action in source.get("actions", []):
+                if action["type"] == "pointerMove":
+                    origin = action.get("origin")
+                    target = origin.get(ELEMENT_KEY) if isinstance(origin, dict) else None
+                elif action["type"] == "pointerUp" and target in CALCULATOR_KEYS:
+                    calculator.press(target)
+                elif action["type"] == "keyDown" and action.get("value") in SHORTCUTS:
+                    calculator.press(SHORTCUTS[action["value"]])
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4723)
+    parser.add_argument("--session-delay", type=float, default=0.0, help="seconds a new session takes")
+    args = parser.parse_args(argv)
+    server = AppiumStandIn(host=args.host, port=args.port, session_delay=args.session_delay)
+    print("Appium stand-in listening on {}".format(server.url))
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    main()
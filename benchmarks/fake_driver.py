@@ -0,0 +1,278 @@
+"""
+In-process stand-in for a WebDriver, good enough to run the search page objects against
+the fixture server when no browser is available. Pages are fetched over http and queried
+with lxml, the browser side scripts of utils.page_scripts and utils.readiness are
+emulated. Every call goes through execute() like on a real driver, so command counts
+and Instrumentation work the same way.
+"""
+
+import time
+from urllib.parse import urlencode, urljoin
+import urllib3
+from selenium.common.exceptions import NoSuchElementException, WebDriverException
+from selenium.webdriver.common.keys import Keys
+from utils.html_locators import parse_html, find_all, find_first, element_text
+from utils.locator import Locator
+from utils.page_scripts import BULK_EXTRACT_RESULTS, NAVIGATION_TIMING, PREFETCH_DONE, PREFETCH_NEXT_PAGE
+from utils.readiness import READINESS_SCRIPT
+
+
+class FakeWebElement:
+
+    def __init__(self, driver, element_id):
+        self._driver = driver
+        self.id = element_id
+
+    @property
+    def text(self):
+        return self._driver.execute("getElementText", {"id": self.id})
+
+    def get_attribute(self, name):
+        return self._driver.execute("getElementAttribute", {"id": self.id, "name": name})
+
+    def send_keys(self, *value):
+        self._driver.execute("sendKeysToElement", {"id": self.id, "text": "".join(value)})
+
+    def click(self):
+        self._driver.execute("clickElement", {"id": self.id})
+
+    def is_displayed(self):
+        return self._driver.execute("isElementDisplayed", {"id": self.id})
+
+    def is_enabled(self):
+        return self._driver.execute("isElementEnabled", {"id": self.id})
+
+    def is_selected(self):
+        return False
+
+    def find_element(self, by, value):
+        return self._driver.execute("findChildElement", {"id": self.id, "using": by, "value": value})
+
+    def find_elements(self, by, value):
+        return self._driver.execute("findChildElements", {"id": self.id, "using": by, "value": value})
+
+
+class FakeWebDriver:
+    """
+    Usage:
+        driver = FakeWebDriver()
+        GoogleSearch(driver, url=fixture_server.url)
+    """
+
+    def __init__(self):
+        self.command_count = 0
+        self.current_handle = "fake-window-1"
+        self._http = urllib3.PoolManager()
+        self._url = "about:blank"
+        self._root = parse_html("<html><body></body></html>")
+        self._elements = {}
+        self._element_ids = {}
+        self._values = {}
+        self._pending_navigation = None
+        self._load_ms = None
+        self._scripts = {
+            BULK_EXTRACT_RESULTS: self._bulk_extract,
+            READINESS_SCRIPT: self._readiness,
+            PREFETCH_NEXT_PAGE: self._prefetch_next_page,
+            PREFETCH_DONE: self._prefetch_done,
+            NAVIGATION_TIMING: self._navigation_timing,
+            "return document.readyState": lambda: "complete",
+            "arguments[0].click();": lambda element: self._click({"id": element.id}),
+        }
+
+    # WebDriver API
+
+    def execute(self, command, params=None):
+        self.command_count += 1
+        handler = getattr(self, "_" + command, None)
+        if handler is None:
+            raise WebDriverException("Command {} is not supported by the fake driver".format(command))
+        return handler(params or {})
+
+    def get(self, url):
+        self.execute("get", {"url": url})
+
+    @property
+    def current_url(self):
+        return self.execute("getCurrentUrl")
+
+    @property
+    def title(self):
+        return self.execute("getTitle")
+
+    @property
+    def window_handles(self):
+        return self.execute("getWindowHandles")
+
+    @property
+    def current_window_handle(self):
+        return self.execute("getCurrentWindowHandle")
+
+    def find_element(self, by, value):
+        return self.execute("findElement", {"using": by, "value": value})
+
+    def find_elements(self, by, value):
+        return self.execute("findElements", {"using": by, "value": value})
+
+    def execute_script(self, script, *args):
+        return self.execute("executeScript", {"script": script, "args": list(args)})
+
+    def delete_all_cookies(self):
+        self.execute("deleteAllCookies")
+
+    def implicitly_wait(self, seconds):
+        self.execute("setTimeouts", {"implicit": seconds})
+
+    def quit(self):
+        self.execute("quit")
+
+    # command handlers
+
+    def _get(self, params):
+        self._load(params["url"])
+
+    def _getCurrentUrl(self, params):
+        return self._url
+
+    def _getTitle(self, params):
+        title = self._root.find(".//title")
+        return element_text(title) or ""
+
+    def _getWindowHandles(self, params):
+        return [self.current_handle]
+
+    def _getCurrentWindowHandle(self, params):
+        return self.current_handle
+
+    def _findElement(self, params, root=None):
+        found = self._findElements(params, root)
+        if not found:
+            raise NoSuchElementException("Unable to locate element {}@@{}".format(params["using"], params["value"]))
+        return found[0]
+
+    def _findElements(self, params, root=None):
+        root = self._root if root is None else root
+        return [self._wrap(node) for node in find_all(root, Locator(params["using"], params["value"]))]
+
+    def _findChildElement(self, params):
+        return self._findElement(params, self._node(params["id"]))
+
+    def _findChildElements(self, params):
+        return self._findElements(params, self._node(params["id"]))
+
+    def _getElementText(self, params):
+        return element_text(self._node(params["id"]))
+
+    def _getElementAttribute(self, params):
+        if params["name"] == "value":
+            return self._values.get(params["id"], self._node(params["id"]).get("value"))
+        return self._node(params["id"]).get(params["name"])
+
+    def _sendKeysToElement(self, params):
+        text = params["text"]
+        if Keys.ENTER in text or Keys.RETURN in text:
+            self._submit(params["id"])
+            return
+        self._values[params["id"]] = self._values.get(params["id"], "") + text
+
+    def _clickElement(self, params):
+        self._click(params)
+
+    def _isElementDisplayed(self, params):
+        self._node(params["id"])
+        return True
+
+    def _isElementEnabled(self, params):
+        return self._node(params["id"]).get("disabled") is None
+
+    def _executeScript(self, params):
+        handler = self._scripts.get(params["script"]) or self._scripts.get(params["script"].strip())
+        if handler is None:
+            raise WebDriverException("Script is not supported by the fake driver")
+        return handler(*params["args"])
+
+    def _deleteAllCookies(self, params):
+        pass
+
+    def _setTimeouts(self, params):
+        pass
+
+    def _quit(self, params):
+        self._http.clear()
+
+    # page emulation
+
+    def _load(self, url):
+        started = time.perf_counter()
+        response = self._http.request("GET", url)
+        self._load_ms = round((time.perf_counter() - started) * 1000)
+        if response.status != 200:
+            raise WebDriverException("Got http status {} for {}".format(response.status, url))
+        self._url = url
+        self._root = parse_html(response.data, base_url=url)
+        self._elements.clear()
+        self._element_ids.clear()
+        self._values.clear()
+
+    def _wrap(self, node):
+        element_id = self._element_ids.get(node)
+        if element_id is None:
+            element_id = "fake-element-{}".format(len(self._elements) + 1)
+            self._element_ids[node] = element_id
+            self._elements[element_id] = node
+        return FakeWebElement(self, element_id)
+
+    def _node(self, element_id):
+        node = self._elements.get(element_id)
+        if node is None:
+            raise WebDriverException("stale element reference: {}".format(element_id))
+        return node
+
+    def _submit(self, element_id):
+        node = self._node(element_id)
+        form = next(node.iterancestors("form"), None)
+        if form is None:
+            return
+        query = urlencode({node.get("name"): self._values.get(element_id, "")})
+        self._load(urljoin(self._url, form.get("action") or "") + "?" + query)
+
+    def _click(self, params):
+        href = self._node(params["id"]).get("href")
+        if href:
+            self._load(href)
+
+    def _bulk_extract(self, results_by, results_value, *child_locators):
+        title, link, description = [Locator(by, value) if by else None
+                                    for by, value in zip(child_locators[::2], child_locators[1::2])]
+        records = []
+        for result in find_all(self._root, Locator(results_by, results_value)):
+            anchor = find_first(result, link)
+            records.append({"title": element_text(find_first(result, title)),
+                            "url": anchor.get("href") if anchor is not None else None,
+                            "description": element_text(find_first(result, description))})
+        return records
+
+    def _readiness(self, by=None, value=None):
+        found = bool(find_all(self._root, Locator(by, value))) if by else True
+        return ["complete", 0, found]
+
+    def _prefetch_next_page(self, by, value):
+        link = find_first(self._root, Locator(by, value))
+        if link is None or not link.get("href"):
+            return None
+        self._pending_navigation = link.get("href")
+        return self._pending_navigation
+
+    def _navigation_timing(self):
+        # the fixture server is local, the whole load counts as time to first byte
+        if self._load_ms is None:
+            return None
+        phases = dict.fromkeys(("redirect", "dns", "connect", "tls", "download", "dom_processing"), 0)
+        return dict(phases, ttfb=self._load_ms, dom_content_loaded=self._load_ms, load=self._load_ms,
+                    transfer_bytes=None, resources=0, resource_bytes=0, resources_by_type={}, slowest_resource=0)
+
+    def _prefetch_done(self):
+        if self._pending_navigation:
+            self._load(self._pending_navigation)
+            self._pending_navigation = None
+        return True
@@ -0,0 +1,81 @@
+"""
+Local stand-in for a search engine, serving saved home and result pages from benchmarks/fixtures
+"""
+
+import os
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+class FixtureServer:
+    """
+    Serves <engine>_home.html on / and <engine>_serp.html on /search for every query and page
+
+    Usage:
+        with FixtureServer("google") as server:
+            GoogleSearch(driver, url=server.url)
+    """
+
+    def __init__(self, engine, host="127.0.0.1", port=0):
+        """
+        :param engine: fixture prefix, e.g. google or bing
+        :param host: interface to listen on
+        :param port: port to listen on, 0 picks a free one
+        """
+        pages = {}
+        for path, name in (("/", "home"), ("/search", "serp")):
+            with open(os.path.join(FIXTURES_DIR, "{}_{}.html".format(engine, name)), "rb") as fixture:
+                pages[path] = fixture.read()
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # headers and body are separate writes, Nagle would hold the body back for a delayed ack
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def do_GET(self):
+                server.requests += 1
+                body = pages.get(urlsplit(self.path).path.rstrip("/") or "/")
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,250 @@
+"""
+Locator analyzer. Evaluates every locator declared on the search page classes against the
+saved pages in benchmarks/fixtures, reports how long one evaluation takes and how many
+elements it matches, and suggests a CSS selector where one matches exactly the same
+elements in less time. Child locators (loc_title, ...) are evaluated on every search result.
+
+Timings come from lxml by default; pass --driver chrome or firefox to time the locators
+inside a headless browser, which is what the page objects actually pay for. lxml runs CSS
+through an XPath translation, so it understates what class selectors gain in a browser.
+
+    python -m benchmarks.locators
+    python -m benchmarks.locators --driver chrome --json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from cssselect import HTMLTranslator
+from lxml import etree
+from selenium.webdriver.common.by import By
+from benchmarks.fixture_server import FIXTURES_DIR, FixtureServer
+from constants.browser import SupportedBrowsers
+from pages.engines import SEARCH_PAGES
+from utils.locator import Locator, xpath_to_css
+from utils.page_scripts import LOCATOR_BENCHMARK
+from utils.html_locators import parse_html
+
+DRIVER_CHOICES = ("lxml", SupportedBrowsers.chrome, SupportedBrowsers.firefox)
+FIXTURE_PATHS = {"home": "/", "serp": "/search"}
+# a suggestion has to be at least this much faster to be worth the churn
+MIN_SPEEDUP = 1.1
+
+
+def page_locators(page_class):
+    """
+    Locators declared on page_class and its bases, without templates like next_page
+    :return: dict of attribute name to Locator
+    """
+    locators = {}
+    for cls in reversed(page_class.__mro__):
+        for name, value in vars(cls).items():
+            if isinstance(value, Locator) and "{" not in value.value:
+                locators[name] = value
+    return locators
+
+
+def parent_locator(page_class, locator):
+    """
+    Locator the given locator is relative to, the search result for the child locators
+    """
+    if locator.by == By.XPATH and locator.value.startswith("."):
+        return page_class.search_result
+    return None
+
+
+def candidates(locator):
+    """
+    Alternative locators matching the same elements in theory, to be verified on the fixtures
+    :return: list of (Locator, note)
+    """
+    found = []
+    if locator.by == By.XPATH:
+        for exact_class in (False, True):
+            try:
+                css = Locator(By.CSS_SELECTOR, xpath_to_css(locator.value, exact_class=exact_class))
+            except ValueError as e:
+                return [(None, str(e))]
+            if css not in [candidate for candidate, _ in found]:
+                found.append((css, "exact class" if exact_class else None))
+    elif locator.by == By.ID:
+        found.append((Locator(By.CSS_SELECTOR, "#" + locator.value), None))
+    elif locator.by == By.NAME:
+        found.append((Locator(By.CSS_SELECTOR, '[name="{}"]'.format(locator.value)), None))
+    return found
+
+
+class LxmlTimer:
+    """
+    Evaluates locators on the parsed fixtures, every locator compiled once like a browser would
+    """
+    name = "lxml"
+
+    def __init__(self, engine):
+        self.documents = {}
+        for page, path in FIXTURE_PATHS.items():
+            fixture = os.path.join(FIXTURES_DIR, "{}_{}.html".format(engine, page))
+            if os.path.isfile(fixture):
+                with open(fixture, "rb") as markup:
+                    self.documents[page] = parse_html(markup.read())
+
+    @staticmethod
+    def _compile(locator, relative):
+        if locator.by == By.CSS_SELECTOR:
+            value = locator.value
+            prefix = "descendant::" if relative else "descendant-or-self::"
+            if value.startswith(":scope > "):
+                value, prefix = value[len(":scope > "):], "child::"
+            return etree.XPath(HTMLTranslator().css_to_xpath(value, prefix=prefix))
+        if locator.by == By.XPATH:
+            return etree.XPath(locator.value)
+        if locator.by in (By.ID, By.NAME):
+            attribute = etree.XPath(".//*[@{}=$value]".format("id" if locator.by == By.ID else "name"))
+            return lambda element: attribute(element, value=locator.value)
+        return etree.XPath(".//" + locator.value)
+
+    def time(self, page, locator, parent, iterations):
+        """
+        :return: (microseconds per evaluation, matched element ids) or None without the fixture
+        """
+        root = self.documents.get(page)
+        if root is None:
+            return None
+        roots = self._compile(parent, False)(root) if parent else [root]
+        evaluate = self._compile(locator, parent is not None)
+
+        def run():
+            found = []
+            for element in roots:
+                found.extend(evaluate(element))
+            return found
+
+        tree = root.getroottree()
+        matches = [tree.getpath(element) for element in run() if isinstance(element, etree.ElementBase)]
+        started = time.perf_counter()
+        for _ in range(iterations):
+            run()
+        return (time.perf_counter() - started) / iterations * 1e6, matches
+
+    def close(self):
+        pass
+
+
+class BrowserTimer:
+    """
+    Evaluates locators inside a headless browser on the fixture pages
+    """
+
+    def __init__(self, engine, browser):
+        from utils.driverclass import DriverClass
+        self.name = browser
+        self.driver = DriverClass.register_driver(browser=browser, headless=True)
+        self.server = FixtureServer(engine).__enter__()
+        self.current_page = None
+
+    def time(self, page, locator, parent, iterations):
+        if page != self.current_page:
+            self.driver.get(self.server.url + FIXTURE_PATHS[page])
+            self.current_page = page
+        arguments = list(locator) + (list(parent) if parent else [None, None]) + [iterations]
+        milliseconds, matches = self.driver.execute_script(LOCATOR_BENCHMARK, *arguments)
+        return milliseconds * 1000, [element.id for element in matches]
+
+    def close(self):
+        self.server.__exit__(None, None, None)
+        self.driver.quit()
+
+
+def analyze_locator(timer, page_class, locator, iterations):
+    parent = parent_locator(page_class, locator)
+    measured = {}
+    for page in FIXTURE_PATHS:
+        timing = timer.time(page, locator, parent, iterations)
+        if timing is not None:
+            measured[page] = timing
+    report = {
+        "locator": str(locator),
+        "relative_to": str(parent) if parent else None,
+        "pages": {page: {"matches": len(matches), "us": round(us, 2)} for page, (us, matches) in measured.items()},
+        "candidates": [],
+        "suggestion": None,
+    }
+    baseline = sum(us for us, _ in measured.values())
+    best_speedup = MIN_SPEEDUP
+    for candidate, note in candidates(locator):
+        if candidate is None:
+            report["note"] = note
+            continue
+        timings = {page: timer.time(page, candidate, parent, iterations) for page in measured}
+        identical = all(timings[page][1] == matches for page, (_, matches) in measured.items())
+        total = sum(us for us, _ in timings.values())
+        report["candidates"].append({
+            "locator": str(candidate),
+            "note": note,
+            "identical": identical,
+            "pages": {page: {"matches": len(matches), "us": round(us, 2)} for page, (us, matches) in timings.items()},
+            "speedup": round(baseline / total, 2) if total else None,
+        })
+        if identical and total and baseline / total >= best_speedup:
+            best_speedup = baseline / total
+            report["suggestion"] = str(candidate)
+    return report
+
+
+def analyze(engines, driver="lxml", iterations=200):
+    """
+    :return: machine readable report of every locator of the page classes of engines
+    """
+    report = {"driver": driver, "iterations": iterations, "pages": {}}
+    for engine in engines:
+        page_class = SEARCH_PAGES[engine]
+        timer = LxmlTimer(engine) if driver == "lxml" else BrowserTimer(engine, driver)
+        try:
+            report["pages"][page_class.__name__] = {
+                name: analyze_locator(timer, page_class, locator, iterations)
+                for name, locator in sorted(page_locators(page_class).items())}
+        finally:
+            timer.close()
+    return report
+
+
+def print_report(report, stream=sys.stdout):
+    stream.write("Locator timings on {} ({} iterations), us per evaluation\n".format(
+        report["driver"], report["iterations"]))
+    for page_class, locators in sorted(report["pages"].items()):
+        for name, entry in locators.items():
+            stream.write("\n{}.{} {}\n".format(page_class, name, entry["locator"]))
+            if entry["relative_to"]:
+                stream.write("  relative to {}\n".format(entry["relative_to"]))
+            for page, measured in sorted(entry["pages"].items()):
+                stream.write("  {:<6}{:>6} matches {:>10.2f} us\n".format(page, measured["matches"], measured["us"]))
+            for candidate in entry["candidates"]:
+                stream.write("  {} {}{}: {}, {}x\n".format(
+                    "->" if candidate["locator"] == entry["suggestion"] else "  ", candidate["locator"],
+                    " ({})".format(candidate["note"]) if candidate["note"] else "",
+                    "identical matches" if candidate["identical"] else "different matches", candidate["speedup"]))
+            if entry.get("note"):
+                stream.write("  no CSS equivalent: {}\n".format(entry["note"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engine", action="append", choices=sorted(SEARCH_PAGES),
+                        help="page class to analyze, can be repeated (default: all)")
+    parser.add_argument("--driver", default="lxml", choices=DRIVER_CHOICES)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = analyze(args.engine or sorted(SEARCH_PAGES), driver=args.driver, iterations=args.iterations)
+    if args.json:
+        print(json.dumps(report, indent=2, sort_keys=True))
+    else:
+        print_report(report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,242 @@
+"""
+Offline benchmark of the search page objects against saved result pages.
+
+Runs GoogleSearch / BingSearch end to end against a local fixture server, on a headless
+browser when one can be started and on the FakeWebDriver otherwise, and reports latency
+percentiles, WebDriver commands per query and peak memory as stable JSON. A browser run
+can be recorded to a cassette and replayed later without a browser, see utils.cassette.
+With --driver http the result pages are fetched and parsed without any WebDriver by
+pages.http_search, which checks its html parsing against the same saved pages.
+
+    python -m benchmarks.run --iterations 20 --output bench.json
+    python -m benchmarks.run --baseline bench.json
+    python -m benchmarks.run --driver chrome --record chrome.cassette
+    python -m benchmarks.run --driver replay --cassette chrome.cassette --iterations 1000
+    python -m benchmarks.run --driver http
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from benchmarks.fake_driver import FakeWebDriver
+from benchmarks.fixture_server import FixtureServer
+from constants.browser import SupportedBrowsers
+from pages.engines import SEARCH_PAGES
+from pages.http_search import HttpSearch
+from utils.general_utils import log_to_console, percentile
+from utils.instrumentation import Instrumentation
+from utils.lean_browser import LeanStats
+
+SCHEMA_VERSION = 1
+# an image the lean profile blocks, requested after a query to check that blocking is still on
+REQUEST_BLOCKED_IMAGE = """
+var done = arguments[arguments.length - 1];
+var image = new Image();
+image.onload = image.onerror = function () { done(); };
+image.src = '/lean-check.png';
+"""
+DRIVER_CHOICES = ("auto", "fake", "replay", "http", SupportedBrowsers.chrome, SupportedBrowsers.firefox)
+# metrics compared against a baseline, lower is better for all of them
+COMPARED_METRICS = ("p50_ms", "p95_ms", "commands_per_query", "peak_python_memory_kb")
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def make_driver(kind, lean=False, cassette=None):
+    """
+    :param kind: one of DRIVER_CHOICES, auto tries headless chrome and firefox before the fake driver
+    :param lean: start browsers with the lean profile
+    :param cassette: cassette replayed by the replay driver, or the browser session is recorded to
+    :return: (driver, driver name), the http driver is None
+    """
+    if kind == "http":
+        return None, "http"
+    if kind == "fake":
+        return FakeWebDriver(), "fake"
+    if kind == "replay":
+        from utils.cassette import replay_driver
+        return replay_driver(cassette), "replay"
+    from utils.driverclass import DriverClass
+    browsers = [kind] if kind != "auto" else [SupportedBrowsers.chrome, SupportedBrowsers.firefox]
+    for browser in browsers:
+        try:
+            return DriverClass.register_driver(browser=browser, headless=True, lean=lean, cassette=cassette), browser
+        except Exception as e:
+            if kind != "auto":
+                raise
+            log_to_console("Headless {} not available due to {}".format(browser, e))
+    return FakeWebDriver(), "fake"
+
+
+def run_query(page_class, driver, url, keyword):
+    if driver is None:
+        # raises UnusableResultPage when the locators of the page class match nothing in the html
+        return HttpSearch(page_class, base_url=url).search(keyword)
+    page = page_class(driver, url=url)
+    return list(page.enter_search(keyword=keyword).parse_search_results())
+
+
+def bench_engine(engine, driver, iterations, keyword, warmup=1, lean=False):
+    """
+    :return: dict of metrics for one engine
+    """
+    page_class = SEARCH_PAGES[engine]
+    latencies = []
+    commands = []
+    results = 0
+    with FixtureServer(engine) as server:
+        for _ in range(warmup):
+            run_query(page_class, driver, server.url, keyword)
+        for _ in range(iterations):
+            commands_before = Instrumentation.command_count
+            started = time.perf_counter()
+            results = len(run_query(page_class, driver, server.url, keyword))
+            latencies.append(time.perf_counter() - started)
+            commands.append(Instrumentation.command_count - commands_before)
+            if lean:
+                LeanStats.collect(driver)
+        # memory is traced in a separate query so tracing does not skew the latencies
+        tracemalloc.start()
+        run_query(page_class, driver, server.url, keyword)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {
+        "iterations": iterations,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "commands_per_query": round(sum(commands) / len(commands), 2),
+        "results_per_query": results,
+        "peak_python_memory_kb": round(peak_memory / 1024, 1),
+    }
+
+
+def check_lean_pool(engine, keyword, checkouts=2):
+    """
+    Requests are blocked per tab and every checkin of a pooled session opens a new tab, so
+    every checkout of the same session has to report blocked requests
+    :return: list of blocked requests per checkout
+    """
+    from utils.driverclass import DriverClass
+    from utils.driverpool import DriverPool
+    pool = DriverPool(browser=SupportedBrowsers.chrome, size=1, max_page_loads=None, max_memory_mb=None,
+                      driver_factory=lambda **kwargs: DriverClass.register_driver(
+                          browser=SupportedBrowsers.chrome, headless=True, lean=True, **kwargs))
+    blocked = []
+    try:
+        with FixtureServer(engine) as server:
+            for _ in range(checkouts):
+                with pool.session() as driver:
+                    run_query(SEARCH_PAGES[engine], driver, server.url, keyword)
+                    driver.execute_async_script(REQUEST_BLOCKED_IMAGE)
+                    blocked.append((LeanStats.collect(driver) or {}).get("blocked_requests", 0))
+    finally:
+        pool.close()
+    return blocked
+
+
+def run_benchmarks(engines, driver_kind="auto", iterations=10, keyword="selenium", lean=False, cassette=None):
+    """
+    :return: machine readable benchmark report
+    """
+    Instrumentation.enable()
+    driver, driver_name = make_driver(driver_kind, lean=lean, cassette=cassette)
+    if driver_name == "replay":
+        Instrumentation.instrument_driver(driver)
+    lean = lean and driver_name not in ("fake", "replay", "http")
+    # blocked requests are only reported by chrome
+    collect_lean_stats = lean and driver_name == SupportedBrowsers.chrome
+    try:
+        report = {
+            "schema_version": SCHEMA_VERSION,
+            "driver": driver_name,
+            "lean": lean,
+            "python": platform.python_version(),
+            "keyword": keyword,
+            "engines": {engine: bench_engine(engine, driver, iterations, keyword, lean=collect_lean_stats) for engine in engines},
+        }
+    finally:
+        if driver is not None:
+            driver.quit()
+    if collect_lean_stats:
+        report["lean_stats"] = LeanStats.report()
+        report["lean_pool_blocked_requests"] = check_lean_pool(engines[0], keyword)
+    if resource is not None:
+        report["peak_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return report
+
+
+def compare(report, baseline, max_regression):
+    """
+    Print the change of every compared metric against baseline
+    :return: list of regressions beyond max_regression
+    """
+    regressions = []
+    if baseline.get("driver") != report["driver"]:
+        log_to_console("Baseline was taken on driver {}, this run used {}".format(
+            baseline.get("driver"), report["driver"]))
+    for engine, metrics in sorted(report["engines"].items()):
+        baseline_metrics = baseline.get("engines", {}).get(engine)
+        if baseline_metrics is None:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = baseline_metrics.get(metric), metrics[metric]
+            if not old:
+                continue
+            change = (new - old) / old
+            log_to_console("{} {}: {} -> {} ({:+.1%})".format(engine, metric, old, new, change))
+            if change > max_regression:
+                regressions.append("{} {}".format(engine, metric))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engine", action="append", choices=sorted(SEARCH_PAGES),
+                        help="engine to benchmark, can be repeated (default: all)")
+    parser.add_argument("--driver", default="auto", choices=DRIVER_CHOICES)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--keyword", default="selenium")
+    parser.add_argument("--lean", action="store_true", help="start the browser with the lean profile")
+    parser.add_argument("--cassette", help="cassette served by --driver replay")
+    parser.add_argument("--record", help="record the browser session to this cassette")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.10,
+                        help="fail when a metric is worse than the baseline by more than this fraction")
+    args = parser.parse_args(argv)
+    if args.driver == "replay" and not args.cassette:
+        parser.error("--driver replay needs --cassette")
+    if args.record and args.driver in ("fake", "replay", "http"):
+        parser.error("--record needs a browser driver")
+
+    report = run_benchmarks(args.engine or sorted(SEARCH_PAGES), driver_kind=args.driver,
+                            iterations=args.iterations, keyword=args.keyword, lean=args.lean,
+                            cassette=args.cassette if args.driver == "replay" else args.record)
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as report_file:
+            report_file.write(output + "\n")
+    else:
+        print(output)
+    if 0 in report.get("lean_pool_blocked_requests", []):
+        log_to_console("A checkout of a pooled lean session blocked no requests: {}".format(
+            report["lean_pool_blocked_requests"]))
+        return 1
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            regressions = compare(report, json.load(baseline_file), args.max_regression)
+        if regressions:
+            log_to_console("Regressions: {}".format(", ".join(regressions)))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
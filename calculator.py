@@ -1,43 +1,37 @@
 import unittest
-from appium import webdriver
+from utils.appium_session import AppiumSessions
+from utils.calculator_engine import CalculatorEngine, Keypad, random_cases
 from utils.general_utils import log_to_console
+from settings import CALCULATOR_APP_ID
+
+
+def clear_calculator(driver):
+    Keypad.of(driver).element("clear").click()
 
 
 class SimpleCalculatorTests(unittest.TestCase):
 
-    @classmethod
-    def setUpClass(self):
-        # set up appium
-        desired_caps = {}
-        desired_caps["app"] = "Microsoft.WindowsCalculator_8wekyb3d8bbwe!App"
-        log_to_console("Opening Calculator App")
-        self.driver = webdriver.Remote(
-            command_executor='http://127.0.0.1:4723',
-            desired_capabilities=desired_caps)
-
-    @classmethod
-    def tearDownClass(self):
-        log_to_console("Closing driver instance")
-        self.driver.quit()
+    def setUp(self):
+        # the calculator is launched once per process and cleared before every further test
+        self.driver = AppiumSessions.session({"app": CALCULATOR_APP_ID}, reset=clear_calculator)
+        self.engine = CalculatorEngine(self.driver)
 
     def getresults(self):
-        displaytext = self.driver.find_element_by_accessibility_id("CalculatorResults").text
-        displaytext = displaytext.strip("Display is ")
-        displaytext = displaytext.rstrip(' ')
-        displaytext = displaytext.lstrip(' ')
-        return displaytext
+        return self.engine.result()
 
     def test_multiplication(self):
         log_to_console("Test for multiplication 9*99=891")
-        self.driver.find_element_by_name("Nine").click()
-        self.driver.find_element_by_name("Multiply by").click()
-        self.driver.find_element_by_name("Nine").click()
-        self.driver.find_element_by_name("Nine").click()
-        self.driver.find_element_by_name("Equals").click()
+        self.engine.enter("9*99")
         log_to_console("Verifying the result")
         self.assertEqual(self.getresults(), "891")
         log_to_console("Test passed succesfully")
 
+    def test_generated_expressions(self):
+        log_to_console("Test for 200 generated expressions")
+        summary = self.engine.run(random_cases(200, seed=1, decimals=2, negative=True))
+        log_to_console("Verifying the results {}".format(summary))
+        self.assertEqual(summary["failed"], 0)
+
 
 if __name__ == '__main__':
     suite = unittest.TestLoader().loadTestsFromTestCase(SimpleCalculatorTests)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+High volume calculator tests. Runs cases from tables and / or generated from a seed on one
+calculator session and streams a JSON line per case with its result and latency, the
+summary goes to stderr. Exits with 1 when a case failed.
+
+    python calculator_cases.py --table cases.csv --report report.jsonl
+    python calculator_cases.py --random 5000 --seed 7 --decimals 3 --negative
+    python calculator_cases.py --random 1000 --endpoint http://127.0.0.1:4724 --mode keys
+"""
+
+import argparse
+import itertools
+import json
+import sys
+from utils.appium_session import AppiumSessions, SessionStats
+from utils.calculator_engine import ENTRY_MODES, CalculatorEngine, random_cases, read_table
+from utils.instrumentation import Instrumentation
+from settings import APPIUM_ENDPOINT, CALCULATOR_APP_ID, CALCULATOR_ENTRY_MODE
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--table", action="append", default=[],
+                        help="CSV or .jsonl file with expression and optional expected columns, can be repeated")
+    parser.add_argument("--random", type=int, default=0, help="number of generated cases")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--operands", type=int, nargs=2, default=(2, 4), metavar=("MIN", "MAX"))
+    parser.add_argument("--digits", type=int, default=4, help="max digits of the integer part of an operand")
+    parser.add_argument("--decimals", type=int, default=0, help="max digits after the decimal separator")
+    parser.add_argument("--negative", action="store_true", help="generate negative operands as well")
+    parser.add_argument("--mode", default=CALCULATOR_ENTRY_MODE, choices=ENTRY_MODES)
+    parser.add_argument("--endpoint", default=APPIUM_ENDPOINT)
+    parser.add_argument("--report", help="JSON lines report (default: stdout)")
+    parser.add_argument("--max-failures", type=int, help="stop after this many failed cases")
+    args = parser.parse_args(argv)
+    if not args.table and not args.random:
+        parser.error("give --table and / or --random")
+
+    cases = itertools.chain(
+        itertools.chain.from_iterable(read_table(path) for path in args.table),
+        random_cases(args.random, seed=args.seed, operands=tuple(args.operands), digits=args.digits,
+                     decimals=args.decimals, negative=args.negative))
+    Instrumentation.enable()
+    driver = Instrumentation.instrument_driver(AppiumSessions.session({"app": CALCULATOR_APP_ID},
+                                                                      endpoint=args.endpoint))
+    report = open(args.report, "w", encoding="utf-8") if args.report else sys.stdout
+    commands_before = Instrumentation.command_count
+    try:
+        summary = CalculatorEngine(driver, mode=args.mode).run(cases, report, max_failures=args.max_failures)
+    finally:
+        if report is not sys.stdout:
+            report.close()
+    summary["commands_per_case"] = round((Instrumentation.command_count - commands_before)
+                                         / max(summary["cases"], 1), 2)
+    summary["sessions"] = SessionStats.report()
+    sys.stderr.write(json.dumps(summary, sort_keys=True) + "\n")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,10 +1,15 @@
 #!/usr/bin/env python3
 
 import os
-from utils.driverclass import DriverClass
+from utils.driverpool import DriverPool
 from constants.search_engine import SearchEngines
 from utils.general_utils import user_input, get_search_engine_url, log_to_console
+from pages.common_search import ConsentStats
 from pages.google import GoogleSearch
+from utils.profiles import ProfileManager
+from utils.readiness import ReadinessStats
+from utils.instrumentation import Instrumentation
+from settings import INSTRUMENTATION_JSON_REPORT, INSTRUMENTATION_PROMETHEUS_FILE, USE_BROWSER_PROFILES
 
 
 if __name__ == '__main__':
@@ -12,11 +17,28 @@ if __name__ == '__main__':
     log_to_console("Starting Search Engine Task")
     user_input()
     log_to_console("Opening Browser - {}".format(os.getenv("BROWSER")))
-    driver = DriverClass.register_driver(browser=os.getenv("BROWSER"))
-    log_to_console("Clearing Browser Cookies")
-    driver.delete_all_cookies()
-    log_to_console("Navigating to search engine url {}".format(get_search_engine_url(search_engine=SearchEngines.google)))
-    home_page = GoogleSearch(driver)
-    log_to_console("Searching for Keyword {}".format(os.getenv("KEYWORD")))
-    home_page.enter_search(keyword=os.getenv("KEYWORD")).parse_search_results()
-    driver.quit()
+    profiles = None
+    if USE_BROWSER_PROFILES:
+        profiles = ProfileManager()
+        if os.getenv("RESET_PROFILE") == "1":
+            log_to_console("Resetting browser profiles {}".format(profiles.reset(os.getenv("BROWSER"))))
+    driver_pool = DriverPool(browser=os.getenv("BROWSER"), profiles=profiles)
+    with driver_pool.session() as driver:
+        if profiles is None:
+            log_to_console("Clearing Browser Cookies")
+            driver.delete_all_cookies()
+        log_to_console("Navigating to search engine url {}".format(get_search_engine_url(search_engine=SearchEngines.google)))
+        home_page = GoogleSearch(driver)
+        log_to_console("Searching for Keyword {}".format(os.getenv("KEYWORD")))
+        for result in home_page.enter_search(keyword=os.getenv("KEYWORD")).parse_search_results():
+            if result.position == 3:
+                log_to_console("The third search result is  ---->")
+                log_to_console(result.title)
+    driver_pool.close()
+    log_to_console("Page readiness waits {}".format(ReadinessStats.report()))
+    log_to_console("Consent pages {}".format(ConsentStats.report()))
+    if Instrumentation.enabled:
+        Instrumentation.write_json(INSTRUMENTATION_JSON_REPORT)
+        Instrumentation.write_prometheus(INSTRUMENTATION_PROMETHEUS_FILE)
+        log_to_console("Instrumentation reports written to {} and {}".format(
+            INSTRUMENTATION_JSON_REPORT, INSTRUMENTATION_PROMETHEUS_FILE))
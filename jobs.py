@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Resumable keyword jobs on top of the durable job queue. Enqueue a keyword list once, then
+start workers on any host that sees the queue file; stop or crash them at any time and
+start them again to pick up where the job left off.
+
+    python jobs.py enqueue nightly --input keywords.txt --engine google --engine bing
+    python jobs.py work nightly --workers 4
+    python jobs.py status nightly --watch 10
+    python jobs.py export nightly > results.jsonl
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import sys
+import time
+from constants.browser import SupportedBrowsers
+from pages.engines import SEARCH_PAGES
+from utils.job_queue import JobQueue, worker_name
+from settings import BATCH_WORKERS, JOB_ENQUEUE_BATCH, JOB_POLL_INTERVAL, JOB_QUEUE_PATH, USE_BROWSER_PROFILES
+
+
+class LeaseLost(Exception):
+    """
+    Raised when another worker took over the task, e.g. after this one stalled past its lease
+    """
+
+
+def _worker(path, job, browser, use_cache, lean, wait):
+    """
+    Worker process, runs tasks of job till none is left
+    """
+    from utils.driverclass import DriverClass
+    from utils.driverpool import DriverPool
+    from utils.profiles import ProfileManager
+    from utils.general_utils import log_to_console
+    from utils.result_cache import ResultCache
+
+    queue = JobQueue(path)
+    owner = worker_name()
+    driver_pool = DriverPool(browser=browser, size=1, profiles=ProfileManager() if USE_BROWSER_PROFILES else None,
+                             driver_factory=lambda **kwargs: DriverClass.register_driver(browser=browser, lean=lean,
+                                                                                         **kwargs))
+    cache = ResultCache() if use_cache else None
+    try:
+        while True:
+            task = queue.lease(owner, job=job)
+            if task is None:
+                # tasks leased by other workers may still come back after a crash or a failure
+                if not wait and queue.is_finished(job):
+                    return
+                time.sleep(JOB_POLL_INTERVAL)
+                continue
+            started = time.monotonic()
+            try:
+                search = SEARCH_PAGES[task.engine].search(task.keyword, driver_pool, max_pages=task.max_pages,
+                                                          cache=cache)
+                results = []
+                for result in search:
+                    # a search over many pages can outlast the lease, it is renewed with every new page
+                    if results and result.page != results[-1]["page"] and not queue.extend_lease(task):
+                        raise LeaseLost("{} was leased to another worker".format(task))
+                    results.append(result.to_dict())
+            except LeaseLost as e:
+                log_to_console("{}, dropping its results".format(e))
+                continue
+            except Exception as e:
+                retry = queue.fail(task, e)
+                log_to_console("{} failed due to {}, {}".format(task, e, "will retry" if retry else "giving up"))
+                continue
+            queue.complete(task, results, time.monotonic() - started)
+    finally:
+        driver_pool.close()
+
+
+def enqueue(args):
+    queue = JobQueue(args.queue)
+    engines = args.engine or ["google"]
+    added = {engine: 0 for engine in engines}
+    keywords = open(args.input, encoding="utf-8") if args.input else sys.stdin
+    try:
+        # streamed in batches, a keyword list of millions of lines is never held in memory
+        for batch in iter(lambda: list(itertools.islice(keywords, JOB_ENQUEUE_BATCH)), []):
+            for engine in engines:
+                added[engine] += queue.enqueue(args.job, engine, batch, max_pages=args.pages)
+    finally:
+        if keywords is not sys.stdin:
+            keywords.close()
+    for engine in engines:
+        print("{}: added {} {} tasks".format(args.job, added[engine], engine))
+    return 0
+
+
+def work(args):
+    processes = [multiprocessing.Process(target=_worker,
+                                         args=(args.queue, args.job, args.browser, args.cache, args.lean, args.wait))
+                 for _ in range(args.workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    print(json.dumps(JobQueue(args.queue).report(args.job), sort_keys=True))
+    return 0
+
+
+def status(args):
+    queue = JobQueue(args.queue)
+    while True:
+        print(json.dumps(queue.report(args.job), sort_keys=True))
+        sys.stdout.flush()
+        if not args.watch or queue.is_finished(args.job):
+            return 0
+        time.sleep(args.watch)
+
+
+def export(args):
+    for record in JobQueue(args.queue).results(args.job):
+        sys.stdout.write(json.dumps(record, separators=(",", ":")) + "\n")
+    return 0
+
+
+def retry(args):
+    print("{}: queued {} failed tasks again".format(args.job, JobQueue(args.queue).retry_failed(args.job)))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queue", default=JOB_QUEUE_PATH, help="job queue database, may be on a shared mount")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("enqueue", help="add keywords to a job")
+    command.add_argument("job")
+    command.add_argument("--input", help="keyword file, one keyword per line (default: stdin)")
+    command.add_argument("--engine", action="append", choices=sorted(SEARCH_PAGES),
+                         help="search engine, can be repeated (default: google)")
+    command.add_argument("--pages", type=int, default=1, help="result pages per keyword")
+    command.set_defaults(handler=enqueue)
+
+    command = commands.add_parser("work", help="run workers till the job is done")
+    command.add_argument("job")
+    command.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    command.add_argument("--browser", default=SupportedBrowsers.chrome,
+                         choices=[SupportedBrowsers.chrome, SupportedBrowsers.firefox])
+    command.add_argument("--cache", action="store_true", help="serve results from the result cache")
+    command.add_argument("--lean", action="store_true", help="headless browsers without images, fonts and media")
+    command.add_argument("--wait", action="store_true", help="keep waiting for new tasks once the job is done")
+    command.set_defaults(handler=work)
+
+    command = commands.add_parser("status", help="task counts, queue depth and throughput")
+    command.add_argument("job", nargs="?")
+    command.add_argument("--watch", type=float, help="repeat every this many seconds till the job is done")
+    command.set_defaults(handler=status)
+
+    command = commands.add_parser("export", help="write the results of a job as JSON lines")
+    command.add_argument("job")
+    command.set_defaults(handler=export)
+
+    command = commands.add_parser("retry", help="queue the failed tasks of a job again")
+    command.add_argument("job")
+    command.set_defaults(handler=retry)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,20 +4,26 @@ from constants.search_engine import SearchEngines
 
 
 class BingSearch(BaseSearchPage):
+    engine = SearchEngines.bing
     url = get_search_engine_url(search_engine=SearchEngines.bing)
 
-    def __init__(self, selenium_driver=None, url=url):
-        super().__init__(selenium_driver=selenium_driver, url=url)
+    def __init__(self, selenium_driver=None, url=url, window_handle=None):
+        super().__init__(selenium_driver=selenium_driver, url=url, window_handle=window_handle)
 
     search_result = "xpath@@//li[@class='b_algo']"
-    loc_title = ".//h2"
-    loc_url = ".//h2/a"
-    loc_description = ".//p"
+    loc_title = "xpath@@.//h2"
+    loc_url = "xpath@@.//h2/a"
+    loc_description = "xpath@@.//p"
+    page_parameter = "&first={offset}"
+    first_offset = 1
+    interstitial_url_markers = ("/turing/captcha",)
+    consent_accept = "id@@bnp_btn_accept"
 
-    def parse_search_results(self):
+    def parse_search_results(self, max_pages=1, first_page=1):
         """
-        Parse the scraped data into list of dict
+        Lazily parse the scraped data into SearchResult records
         """
         return self._parse_search_results(locator_results=self.search_result, locator_title=self.loc_title,
                                           locator_url=self.loc_url,
-                                          locator_description=self.loc_description)
+                                          locator_description=self.loc_description, max_pages=max_pages,
+                                          first_page=first_page)
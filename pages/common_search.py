@@ -1,35 +1,257 @@
+import threading
+from time import perf_counter
+from urllib.parse import quote_plus
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from selenium.webdriver.common.keys import Keys
 from utils.pagebase import PageBase
-from utils.general_utils import log_to_console
+from utils.page_scripts import BULK_EXTRACT_RESULTS, PREFETCH_DONE, PREFETCH_NEXT_PAGE
+from pages.search_result import SearchResult
+from settings import BULK_RESULT_EXTRACTION, DEFAULT_LOCALE, GLOBAL_TIMEOUT
+
+
+class SearchInterstitial(Exception):
+    """
+    Raised when the engine answers with a captcha or unusual traffic page instead of results
+    """
+
+
+class ConsentStats:
+    """
+    Process wide counts of consent dialogs per engine and the time spent accepting them
+    """
+    _lock = threading.Lock()
+    engines = {}
+
+    @classmethod
+    def record(cls, engine, appeared, seconds):
+        with cls._lock:
+            stats = cls.engines.setdefault(engine, {"checks": 0, "consent_pages": 0, "seconds": 0.0})
+            stats["checks"] += 1
+            stats["consent_pages"] += 1 if appeared else 0
+            stats["seconds"] += seconds
+
+    @classmethod
+    def report(cls):
+        """
+        :return: dict of engine to checks, consent pages met and seconds spent on them
+        """
+        with cls._lock:
+            return {engine: dict(stats, seconds=round(stats["seconds"], 3)) for engine, stats in cls.engines.items()}
+
 
 class BaseSearchPage(PageBase):
+    engine = None  # SearchEngines member, set by the engine specific pages
     search_input = "name@@q"
-    next_page = "xpath@@//a[@aria-label='Page 2']"
+    search_path = "/search?q={keyword}"
+    page_parameter = None  # query parameter opening a later result page, e.g. "&start={offset}"
+    first_offset = 0  # offset of the first result of page 1 in page_parameter
+    results_per_page = 10
+    next_page = "xpath@@//a[@aria-label='Page {page}']"
+    interstitial_url_markers = ()  # url fragments of the captcha / unusual traffic pages of the engine
+    interstitial = "xpath@@//iframe[contains(@src, 'captcha')] | //*[contains(@id, 'captcha')]"
+    consent_accept = None  # button accepting the consent dialog of the engine
+
+    keyword = None  # last searched keyword, tags the navigation timing
+
+    def __init__(self, selenium_driver=None, url=None, window_handle=None):
+        super().__init__(selenium_driver, url, window_handle=window_handle)
+        if url is not None:
+            self.accept_consent()
+
+    def accept_consent(self, wait_time=GLOBAL_TIMEOUT):
+        """
+        Accept the consent dialog when the engine shows one. A persistent profile keeps the
+        consent cookie, so this should only cost a single lookup after the first run.
+        :param wait_time: upper bound for the page to settle after accepting
+        :return: True when a consent dialog was accepted
+        """
+        if self.consent_accept is None:
+            return False
+        started = perf_counter()
+        buttons = self.find_elements(self.consent_accept)
+        if buttons:
+            buttons[0].click()
+            self.wait_till_page_is_ready(wait_time)
+        ConsentStats.record(self.engine.name, bool(buttons), perf_counter() - started)
+        return bool(buttons)
+
+    def timing_tags(self):
+        return dict(super().timing_tags(), engine=self.engine.name if self.engine else None, keyword=self.keyword)
+
+    @classmethod
+    def search_url(cls, keyword, base_url=None, page=1):
+        """
+        Url of the result page of keyword
+        :param base_url: search engine url, defaults to the url of the page class
+        :param page: result page, later pages need page_parameter
+        """
+        url = (base_url or cls.url).rstrip("/") + cls.search_path.format(keyword=quote_plus(keyword))
+        if page > 1:
+            if cls.page_parameter is None:
+                raise ValueError("{} can not open result page {} directly".format(cls.__name__, page))
+            url += cls.page_parameter.format(offset=cls.first_offset + (page - 1) * cls.results_per_page)
+        return url
 
-    def __init__(self, selenium_driver=None, url=None):
-        super().__init__(selenium_driver, url)
+    @classmethod
+    def search(cls, keyword, driver_pool, max_pages=1, locale=DEFAULT_LOCALE, cache=None, after_search=None):
+        """
+        Search keyword, serving result pages from cache before borrowing a browser
+        :param keyword: search keyword
+        :param driver_pool: DriverPool to borrow a browser from on a cache miss
+        :param max_pages: maximum number of result pages to read
+        :param locale: locale the results were scraped for, part of the cache key
+        :param cache: ResultCache, None disables caching
+        :param after_search: callable taking the driver, runs in the same browser session once the
+                             results were read, not called when the cache served every page
+        :return: generator of SearchResult
+        """
+        engine = cls.engine.name
+        page_number = 1
+        cached_results = 0
+        while cache is not None and page_number <= max_pages:
+            cached = cache.get(engine, keyword, page_number, locale)
+            if cached is None:
+                break
+            for record in cached:
+                cached_results += 1
+                yield SearchResult(**record)
+            page_number += 1
+        if page_number > max_pages:
+            return
+        # after a partial hit the search opens at the first missing page, the cached ones are not loaded again
+        can_skip = page_number > 1 and cls.page_parameter is not None
+        with driver_pool.session() as driver:
+            if can_skip:
+                page = cls(driver, url=cls.search_url(keyword, page=page_number))
+                page.keyword = keyword
+                results = page.parse_search_results(max_pages=max_pages, first_page=page_number)
+            else:
+                page = cls(driver)
+                results = page.enter_search(keyword=keyword).parse_search_results(max_pages=max_pages)
+            page_results = []
+            for result in results:
+                if can_skip:
+                    result.position += cached_results
+                if page_results and result.page != page_results[-1].page:
+                    cls._cache_page(cache, engine, keyword, locale, page_results)
+                    page_results = []
+                page_results.append(result)
+                if result.page >= page_number:
+                    yield result
+            cls._cache_page(cache, engine, keyword, locale, page_results)
+            if after_search is not None:
+                after_search(driver)
+
+    @staticmethod
+    def _cache_page(cache, engine, keyword, locale, page_results):
+        if cache is not None and page_results:
+            cache.put(engine, keyword, page_results[0].page, locale, [result.to_dict() for result in page_results])
 
     def enter_search(self, keyword: str = None):
         """
         Perform search
         """
-        self.send_keys(self.search_input, keyword)
-        self.hit_enter(self.search_input)
+        self.keyword = keyword
+        # one lookup and one command for typing and Enter
+        self.send_keys(self.search_input, keyword, Keys.ENTER)
         return self
 
+    def is_interstitial(self):
+        """
+        Whether the browser shows a captcha or unusual traffic page instead of results
+        """
+        url = self._driver.current_url
+        if any(marker in url for marker in self.interstitial_url_markers):
+            return True
+        return bool(self.find_elements(self.interstitial))
+
     def _parse_search_results(self, locator_results=None, locator_title=None, locator_url=None,
-                              locator_description=None):
+                              locator_description=None, max_pages=1, first_page=1):
         """
-        Parse for required data
+        Lazily parse for required data, following next_page for up to max_pages pages.
+        The next page starts loading in the browser while the current page is consumed.
         :param locator_results - Locator to fetch individual tiles of the results
         :param locator_title - Title child of the parent result element
         :param locator_title - anchor tag containing href attribute
         :param locator_description - element representing short desc of the result
+        :param max_pages - maximum number of result pages to read
+        :param first_page - result page the browser shows, for a search opened at a later page
+        :return: generator of SearchResult
+        """
+        position = 0
+        page_number = first_page
+        while True:
+            try:
+                self.wait_till_element_is_present(locator_results, timeout=10)
+            except TimeoutException:
+                if self.is_interstitial():
+                    raise SearchInterstitial("{} served an interstitial at {}".format(
+                        self.engine.name, self._driver.current_url)) from None
+                raise
+            self.record_navigation_timing(result_page=page_number)
+            if BULK_RESULT_EXTRACTION:
+                results = self._extract_results(locator_results, locator_title, locator_url, locator_description)
+            else:
+                results = self._parse_attributes(locator_results, locator_title, locator_url, locator_description)
+            has_next_page = page_number < max_pages and self._prefetch_page(page_number + 1)
+            for result in results:
+                position += 1
+                result.position = position
+                result.page = page_number
+                yield result
+            if not has_next_page:
+                return
+            self._wait_for_prefetched_page()
+            page_number += 1
+
+    def _prefetch_page(self, page_number):
+        """
+        Start navigating to the given result page without waiting for it to load
+        :return: False if there is no link to that page
         """
-        results = self._parse_attributes(locator_results, locator_title, locator_url, locator_description)
-        log_to_console("The third search result is  ---->")
-        log_to_console(results[2].text)
+        by, value = self.get_locator_by(self.next_page)
+        href = self._driver.execute_script(PREFETCH_NEXT_PAGE, by, value.format(page=page_number))
+        return href is not None
+
+    def _wait_for_prefetched_page(self, timeout=10):
+        """
+        Wait till the browser left the page the prefetch was started from
+        """
+        self._wait(timeout).until(
+            lambda driver: driver.execute_script(PREFETCH_DONE),
+            message="Timed out after {} seconds while waiting for the next result page".format(timeout))
+
+    def _extract_results(self, locator_results=None, locator_title=None, locator_url=None, locator_description=None):
+        """
+        Read title, url and description of every result in a single browser round trip
+        """
+        arguments = list(self.get_locator_by(locator_results))
+        for locator in (locator_title, locator_url, locator_description):
+            arguments.extend(self.get_locator_by(locator) if locator else (None, None))
+        records = self._driver.execute_script(BULK_EXTRACT_RESULTS, *arguments) or []
+        return [SearchResult(position=position, title=record.get("title"), url=record.get("url"),
+                             description=record.get("description"))
+                for position, record in enumerate(records, start=1)]
 
     def _parse_attributes(self, locator_results=None, locator_title=None, locator_url=None, locator_description=None):
-        self.wait_till_element_is_present(locator_results, timeout=10)
-        matching_results = self.find_elements(locator_results)
-        return matching_results
+        """
+        Element by element fallback of _extract_results, costs several round trips per result
+        """
+        results = []
+        for position, element in enumerate(self.find_elements(locator_results), start=1):
+            title = self._find_child(element, locator_title)
+            link = self._find_child(element, locator_url)
+            description = self._find_child(element, locator_description)
+            results.append(SearchResult(position=position,
+                                        title=title.text if title else None,
+                                        url=link.get_attribute("href") if link else None,
+                                        description=description.text if description else None))
+        return results
+
+    def _find_child(self, element, locator):
+        if not locator:
+            return None
+        try:
+            return element.find_element(*self.get_locator_by(locator))
+        except NoSuchElementException:
+            return None
@@ -0,0 +1,9 @@
+from constants.search_engine import SearchEngines
+from pages.bing import BingSearch
+from pages.google import GoogleSearch
+
+# Search page class per SearchEngines member name
+SEARCH_PAGES = {
+    SearchEngines.google.name: GoogleSearch,
+    SearchEngines.bing.name: BingSearch,
+}
@@ -4,17 +4,22 @@ from constants.search_engine import SearchEngines
 
 
 class GoogleSearch(BaseSearchPage):
+    engine = SearchEngines.google
     url = get_search_engine_url(search_engine=SearchEngines.google)
 
-    def __init__(self, selenium_driver=None, url=url):
-        super().__init__(selenium_driver=selenium_driver, url=url)
+    def __init__(self, selenium_driver=None, url=url, window_handle=None):
+        super().__init__(selenium_driver=selenium_driver, url=url, window_handle=window_handle)
 
     search_result = "xpath@@//*[@class='g Ww4FFb vt6azd tF2Cxc asEBEc']//*[@class='yuRUbf']"
-    loc_title = ".//h3"
-    loc_url = "./a"
-    loc_description = "./../..//div[@class='VwiC3b yXK7lf MUxGbd yDYNvb lyLwlc lEBKkf']"  # this long class name surprisingly seems to be static
+    loc_title = "xpath@@.//h3"
+    loc_url = "xpath@@./a"
+    page_parameter = "&start={offset}"
+    interstitial_url_markers = ("/sorry/",)
+    consent_accept = "xpath@@//button[@id='L2AGLb'] | //form[contains(@action, 'consent')]//button[@aria-label='Accept all']"
+    loc_description = "xpath@@./../..//div[@class='VwiC3b yXK7lf MUxGbd yDYNvb lyLwlc lEBKkf']"  # this long class name surprisingly seems to be static
 
-    def parse_search_results(self):
+    def parse_search_results(self, max_pages=1, first_page=1):
         return self._parse_search_results(locator_results=self.search_result, locator_title=self.loc_title,
                                           locator_url=self.loc_url,
-                                          locator_description=self.loc_description)
+                                          locator_description=self.loc_description, max_pages=max_pages,
+                                          first_page=first_page)
@@ -0,0 +1,103 @@
+"""
+Browserless search engine for the search page classes. Fetches the result page over
+pooled keep-alive connections and parses it with the locators declared on the page
+class, falling back to the selenium page object when the html is not usable.
+"""
+
+from urllib.parse import urlsplit
+import urllib3
+from utils.general_utils import log_to_console
+from utils.html_locators import parse_html, find_all, find_first, element_text
+from pages.common_search import SearchInterstitial
+from pages.search_result import SearchResult
+from settings import HTTP_POOL_MAXSIZE, HTTP_SEARCH_TIMEOUT, HTTP_USER_AGENT
+
+_connection_pool = urllib3.PoolManager(maxsize=HTTP_POOL_MAXSIZE, block=False,
+                                       retries=urllib3.Retry(total=2, redirect=5, raise_on_redirect=False),
+                                       headers={"User-Agent": HTTP_USER_AGENT,
+                                                "Accept-Language": "en-US,en;q=0.9"})
+
+
+class UnusableResultPage(Exception):
+    """
+    Raised when the fetched html can not be parsed into results without a browser
+    """
+
+
+class HttpSearch:
+    """
+    Usage:
+        results = HttpSearch(GoogleSearch).search("selenium")
+    """
+
+    def __init__(self, page_class, base_url=None, timeout=HTTP_SEARCH_TIMEOUT):
+        """
+        :param page_class: GoogleSearch, BingSearch or another BaseSearchPage subclass
+        :param base_url: search engine url, defaults to the url of the page class
+        :param timeout: seconds for connect and read
+        """
+        self.page_class = page_class
+        self.base_url = (base_url or page_class.url).rstrip("/")
+        self.timeout = timeout
+
+    def search_url(self, keyword):
+        return self.page_class.search_url(keyword, base_url=self.base_url)
+
+    def search(self, keyword):
+        """
+        Fetch and parse the result page of keyword
+        :param keyword: search keyword
+        :return: list of SearchResult
+        """
+        response = _connection_pool.request("GET", self.search_url(keyword), timeout=self.timeout)
+        final_url = response.geturl() or self.search_url(keyword)
+        if response.status == 429 or any(marker in final_url for marker in self.page_class.interstitial_url_markers):
+            raise SearchInterstitial("{} served an interstitial at {}".format(self.page_class.engine.name, final_url))
+        if response.status != 200:
+            raise UnusableResultPage("Got http status {} for {}".format(response.status, final_url))
+        if not final_url.startswith("http"):
+            final_url = self.base_url + final_url
+        return self.parse(response.data, final_url)
+
+    def parse(self, markup, url):
+        """
+        Parse result page html with the locators of the page class
+        :param markup: html of the result page
+        :param url: url the html was served from
+        :return: list of SearchResult
+        """
+        if "consent." in urlsplit(url).netloc:
+            raise UnusableResultPage("Redirected to consent page {}".format(url))
+        root = parse_html(markup, base_url=url)
+        if root.xpath("//form[contains(@action, 'consent')]"):
+            raise UnusableResultPage("Consent wall on {}".format(url))
+        page = self.page_class
+        elements = find_all(root, page.search_result)
+        if not elements:
+            raise UnusableResultPage("No results matched {} on {}".format(page.search_result, url))
+        results = []
+        for position, element in enumerate(elements, start=1):
+            link = find_first(element, page.loc_url)
+            results.append(SearchResult(position=position,
+                                        title=element_text(find_first(element, page.loc_title)),
+                                        url=link.get("href") if link is not None else None,
+                                        description=element_text(find_first(element, page.loc_description))))
+        return results
+
+
+def search_with_fallback(page_class, keyword, driver_pool, base_url=None):
+    """
+    Search over plain http and use a browser from driver_pool only when the html is unusable
+    :param page_class: BaseSearchPage subclass
+    :param keyword: search keyword
+    :param driver_pool: DriverPool to borrow a browser from for the fallback
+    :param base_url: search engine url, defaults to the url of the page class
+    :return: list of SearchResult
+    """
+    try:
+        return HttpSearch(page_class, base_url=base_url).search(keyword)
+    except (UnusableResultPage, urllib3.exceptions.HTTPError) as e:
+        log_to_console("Falling back to browser for {} due to {}".format(keyword, e))
+    with driver_pool.session() as driver:
+        page = page_class(driver, url=base_url or page_class.url)
+        return list(page.enter_search(keyword=keyword).parse_search_results())
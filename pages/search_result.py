@@ -0,0 +1,21 @@
+class SearchResult:
+    """
+    A single organic search result scraped from a result page
+    """
+    __slots__ = ("position", "page", "title", "url", "description")
+
+    def __init__(self, position=None, title=None, url=None, description=None, page=1):
+        self.position = position
+        self.page = page
+        self.title = title
+        self.url = url
+        self.description = description
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other):
+        return isinstance(other, SearchResult) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return "SearchResult(position={!r}, title={!r}, url={!r})".format(self.position, self.title, self.url)
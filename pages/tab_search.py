@@ -0,0 +1,127 @@
+"""
+Search several keywords in parallel tabs of a single browser. Every tab loads a result
+page on its own while the tabs are harvested round-robin as soon as one is ready, which
+gives most of the throughput of several browsers at the memory cost of one.
+"""
+
+import time
+from selenium.common.exceptions import NoSuchElementException, TimeoutException, WebDriverException
+from pages.common_search import SearchInterstitial
+from utils.cassette import is_replay
+from utils.general_utils import log_to_console
+from utils.lean_browser import block_urls_in_new_tab
+from utils.page_scripts import LOAD_STATE, NAVIGATE_WITHOUT_WAITING
+from settings import TAB_SEARCH_TABS, TAB_LOAD_TIMEOUT, TAB_POLL_INTERVAL
+
+
+class _Tab:
+
+    def __init__(self, page):
+        self.page = page
+        self.keyword = None
+        self.started = None
+
+
+class TabSearch:
+    """
+    Usage:
+        with pool.session() as driver:
+            for keyword, results, error, seconds in TabSearch(driver, GoogleSearch).search_many(keywords):
+                ...
+    """
+
+    def __init__(self, driver, page_class, tabs=TAB_SEARCH_TABS, base_url=None, timeout=TAB_LOAD_TIMEOUT):
+        """
+        :param driver: WebDriver object
+        :param page_class: BaseSearchPage subclass
+        :param tabs: number of tabs loading in parallel
+        :param base_url: search engine url, defaults to the url of the page class
+        :param timeout: seconds a tab may take to show results
+        """
+        if tabs < 1:
+            raise ValueError("Tab search needs at least 1 tab, got {}".format(tabs))
+        self._driver = driver
+        self.page_class = page_class
+        self.tabs = tabs
+        self.base_url = base_url
+        self.timeout = timeout
+
+    def _open_tabs(self):
+        driver = self._driver
+        handles = [driver.current_window_handle]
+        for _ in range(self.tabs - 1):
+            # opened by the driver, window.open() from a script can be stopped by the popup blocker
+            driver.switch_to.new_window("tab")
+            handles.append(driver.current_window_handle)
+            block_urls_in_new_tab(driver)
+        if len(set(handles)) < self.tabs:
+            raise WebDriverException("Asked for {} tabs, only {} could be opened".format(self.tabs, len(set(handles))))
+        # the pages switch to their tab when needed
+        driver._active_window_handle = handles[-1]
+        return [_Tab(self.page_class(driver, url=None, window_handle=handle)) for handle in handles]
+
+    def _start(self, tab, keyword):
+        tab.keyword = keyword
+        tab.started = time.monotonic()
+        tab.page.get_current_driver().execute_script(NAVIGATE_WITHOUT_WAITING,
+                                                     self.page_class.search_url(keyword, base_url=self.base_url))
+
+    def _close_tabs(self, tabs):
+        for tab in tabs[1:]:
+            try:
+                tab.page.close_browser()
+            except Exception as e:
+                log_to_console("Could not close tab due to {}".format(e))
+        # leave the driver on the tab it started on
+        tabs[0].page.get_current_driver()
+
+    def search_many(self, keywords):
+        """
+        Search every keyword, yielding in the order the result pages become ready
+        :param keywords: iterable of keywords
+        :return: generator of (keyword, list of SearchResult, exception or None, seconds)
+        """
+        keywords = iter(keywords)
+        tabs = self._open_tabs()
+        busy = []
+        try:
+            for tab in tabs:
+                keyword = next(keywords, None)
+                if keyword is None:
+                    break
+                self._start(tab, keyword)
+                busy.append(tab)
+            result_locator = self.page_class.search_result
+            while busy:
+                harvested = False
+                for tab in list(busy):
+                    loaded, found = tab.page.get_current_driver().execute_script(LOAD_STATE, *result_locator)
+                    timed_out = time.monotonic() - tab.started > self.timeout
+                    if not (loaded or timed_out):
+                        continue
+                    harvested = True
+                    results, error = [], None
+                    if found:
+                        tab.page.keyword = tab.keyword
+                        try:
+                            results = list(tab.page.parse_search_results())
+                        except Exception as e:
+                            # a stale element or a changed layout in one tab must not end the other keywords
+                            error = e
+                    elif tab.page.is_interstitial():
+                        error = SearchInterstitial("{} served an interstitial for {}".format(
+                            self.page_class.engine.name, tab.keyword))
+                    elif loaded:
+                        error = NoSuchElementException("No results matched {}".format(result_locator))
+                    else:
+                        error = TimeoutException("Timed out after {} seconds".format(self.timeout))
+                    yield tab.keyword, results, error, time.monotonic() - tab.started
+                    keyword = next(keywords, None)
+                    if keyword is None:
+                        busy.remove(tab)
+                    else:
+                        self._start(tab, keyword)
+                if not harvested and not is_replay(self._driver):
+                    time.sleep(TAB_POLL_INTERVAL)
+        finally:
+            self._close_tabs(tabs)
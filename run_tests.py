@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Runs the Appium suites sharded over several endpoints and worker processes. Shards are
+balanced on the test durations of earlier runs, every finished test is printed as it
+comes in and the results of all shards are merged into one JSON report. Exits with 1
+when a test failed.
+
+    python run_tests.py
+    python run_tests.py calculator --endpoint http://10.0.0.11:4723 --endpoint http://10.0.0.12:4723
+    APPIUM_ENDPOINTS=http://10.0.0.11:4723,http://10.0.0.12:4723 python run_tests.py --report tests.json
+    python run_tests.py --plan
+"""
+
+import argparse
+import json
+import sys
+import time
+from utils.test_shards import ERROR, FAILED, TestDurations, collect, merge, plan, run
+from settings import TEST_DURATIONS_PATH, TEST_ENDPOINTS, TEST_PROCESSES_PER_ENDPOINT
+
+DEFAULT_SUITES = ("calculator", "teams")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("tests", nargs="*", default=list(DEFAULT_SUITES),
+                        help="test modules, classes or methods (default: {})".format(" ".join(DEFAULT_SUITES)))
+    parser.add_argument("--endpoint", action="append",
+                        help="Appium endpoint, can be repeated (default: APPIUM_ENDPOINTS)")
+    parser.add_argument("--processes", type=int, default=TEST_PROCESSES_PER_ENDPOINT,
+                        help="worker processes per endpoint")
+    parser.add_argument("--durations", default=TEST_DURATIONS_PATH, help="test durations of earlier runs")
+    parser.add_argument("--report", help="write the merged JSON report to this file")
+    parser.add_argument("--plan", action="store_true", help="only print the shards and their predicted time")
+    args = parser.parse_args(argv)
+
+    tests, load_errors = collect(args.tests)
+    durations = TestDurations(args.durations)
+    shards = plan(tests, args.endpoint or TEST_ENDPOINTS, processes=args.processes, durations=durations)
+    for shard in shards:
+        sys.stderr.write("shard {shard} on {endpoint}: {tests} tests, {predicted_seconds}s predicted\n".format(
+            **shard.to_dict()))
+    if args.plan:
+        print(json.dumps([dict(shard.to_dict(), tests=shard.tests) for shard in shards], indent=2))
+        return 0
+
+    started = time.monotonic()
+    records = run(shards)
+    durations.update(records)
+    report = merge(shards, records + load_errors, time.monotonic() - started)
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as report_file:
+            report_file.write(output + "\n")
+    else:
+        print(output)
+    sys.stderr.write("{tests} tests in {seconds}s: {passed} passed, {failed} failed, {error} errors, "
+                     "{skipped} skipped, shard imbalance {imbalance}\n".format(**report["summary"]))
+    return 1 if report["summary"][FAILED] or report["summary"][ERROR] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,12 +3,117 @@ import os
 
 # Configure Timeouts (Seconds)
 GLOBAL_TIMEOUT = 1
-IMPLICIT_WAIT = 1
+ACTION_TIMEOUT = 5  # budget shared by every lookup and wait of one PageBase action, see PageBase.deadline
+# PageBase waits explicitly; an implicit wait would be added to every failed lookup inside those waits
+IMPLICIT_WAIT = 0
+ACTION_POINTER_DURATION = 250  # milliseconds every pointer move of an ActionMacro takes in the browser
+WAIT_BACKEND = "mutation"  # "mutation" waits in the page with a DOM observer, "polling" uses WebDriverWait
+
+# Lean browser profile: headless, eager page loads and no images, fonts, media or trackers
+LEAN_BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf",
+    "*.mp4", "*.webm", "*.mp3",
+    "*doubleclick.net*", "*googletagmanager.com*", "*google-analytics.com*", "*bat.bing.com*",
+]
+# typical transfer size per blocked resource type, used to estimate the bytes saved
+LEAN_ESTIMATED_BYTES = {"Image": 20000, "Font": 40000, "Media": 250000, "Script": 30000, "Other": 5000}
+
+# Page readiness, waits only as long as the page needs instead of sleeping
+USE_FIXED_SLEEPS = False  # opt-in fallback to the old unconditional sleeps
+READINESS_POLL_INTERVAL = 0.1
+READINESS_QUIET_PERIOD = 0.3  # seconds without new network requests before a page counts as idle
+REPLAY_POLL_INTERVAL = 0.001  # waits on a session replayed from a cassette poll a file, not a browser
+
+# Driver session pool
+DRIVER_POOL_SIZE = 1
+DRIVER_POOL_MAX_PAGE_LOADS = 50  # recycle a session after this many page loads
+DRIVER_POOL_MAX_MEMORY_MB = 512  # recycle a session once the JS heap grows past this
+
+# Search result parsing
+BULK_RESULT_EXTRACTION = True  # read every result in one browser side script instead of per element lookups
+
+# Browserless http search
+HTTP_SEARCH_TIMEOUT = 10
+HTTP_POOL_MAXSIZE = 10  # keep-alive connections per host
+HTTP_USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                   "(KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36")
+
+# Multi tab search, several result pages loading in parallel tabs of one browser
+TAB_SEARCH_TABS = 4
+TAB_LOAD_TIMEOUT = 15  # seconds a tab may take to show results
+TAB_POLL_INTERVAL = 0.05
+
+# Batch runner
+BATCH_WORKERS = 2  # worker processes, each owning one browser
+BATCH_QUEUE_DEPTH = 4  # queued keywords per worker, keeps memory flat on long keyword lists
+
+# Adaptive rate limiting per search engine, see utils.rate_limiter
+RATE_LIMITS = {
+    "google": {"rate": 0.5, "max_rate": 2.0, "concurrency": 1, "max_concurrency": 4},
+    "bing": {"rate": 1.0, "max_rate": 4.0, "concurrency": 2, "max_concurrency": 8},
+}
+RATE_LIMIT_DEFAULT = {"rate": 1.0, "max_rate": 4.0, "concurrency": 1, "max_concurrency": 4}
+RATE_LIMIT_MIN_RATE = 0.05  # searches per second, the limiter never backs off below this
+RATE_LIMIT_RATE_STEP = 0.1  # searches per second added after a round of healthy searches
+RATE_LIMIT_TARGET_LATENCY = 8  # seconds, slower searches do not raise the limits
+RATE_LIMIT_MAX_ERROR_RATE = 0.1  # moving average of failed searches that triggers a back off
+RATE_LIMIT_COOLDOWN = 30  # seconds without new searches after a captcha or unusual traffic page
+RATE_LIMIT_REPORT_INTERVAL = 10  # seconds between live rate limit metrics of the batch runner
 
 # Paths
 PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
 
+# Driver binaries pinned by utils.driver_binaries, DRIVER_OFFLINE=1 never calls webdriver-manager
+DRIVER_MANIFEST_PATH = os.path.join(PROJECT_ROOT, ".drivers", "manifest.json")
+DRIVER_OFFLINE = os.getenv("DRIVER_OFFLINE") == "1"
+
+# Durable job queue, see utils.job_queue
+JOB_QUEUE_PATH = os.path.join(PROJECT_ROOT, ".cache", "jobs.sqlite3")
+JOB_LEASE_SECONDS = 300  # a task leased by a crashed worker is handed out again after this
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BACKOFF = 10  # seconds before the first retry, doubled with every attempt
+JOB_RETRY_MAX_BACKOFF = 600
+JOB_POLL_INTERVAL = 2  # seconds an idle worker waits before asking for a task again
+JOB_ENQUEUE_BATCH = 1000  # keywords inserted per transaction when enqueueing a keyword file
+
+# Persistent browser profiles, keep consent cookies and the browser cache between runs, see utils.profiles
+USE_BROWSER_PROFILES = os.getenv("BROWSER_PROFILES", "1") == "1"
+BROWSER_PROFILE_ROOT = os.path.join(PROJECT_ROOT, ".profiles")
+BROWSER_PROFILE_SLOTS = 8  # profiles per browser, bounds the concurrent sessions on one host
+
+# Search result cache
+DEFAULT_LOCALE = "en-US"
+RESULT_CACHE_PATH = os.path.join(PROJECT_ROOT, ".cache", "serp_cache.sqlite3")
+RESULT_CACHE_TTL = 60 * 60  # seconds
+RESULT_CACHE_MAX_ENTRIES = 10000  # cached result pages before least recently used ones are evicted
+
+# Latency instrumentation, opt-in through INSTRUMENTATION=1
+INSTRUMENTATION_ENABLED = os.getenv("INSTRUMENTATION") == "1"
+INSTRUMENTATION_JSON_REPORT = os.path.join(PROJECT_ROOT, "instrumentation.json")
+INSTRUMENTATION_PROMETHEUS_FILE = os.path.join(PROJECT_ROOT, "instrumentation.prom")
+
+# Browser side navigation timing per page load, opt-in through NAV_TIMING=1, see utils.nav_timing
+NAV_TIMING_ENABLED = os.getenv("NAV_TIMING") == "1"
+NAV_TIMING_LOG = os.path.join(PROJECT_ROOT, "nav_timing.jsonl")
+
+# Appium endpoint of the calculator and Teams suites, sessions are shared per process, see utils.appium_session
+APPIUM_ENDPOINT = os.getenv("APPIUM_ENDPOINT", "http://127.0.0.1:4723")
+APPIUM_NEW_COMMAND_TIMEOUT = 600  # seconds the server keeps an idle shared session alive
+APPIUM_SESSION_CHECK_AFTER = 60  # seconds idle after which a shared session is checked before it is reused
+CALCULATOR_APP_ID = "Microsoft.WindowsCalculator_8wekyb3d8bbwe!App"
+CALCULATOR_ENTRY_MODE = "actions"  # actions, clicks or keys, see utils.calculator_engine
+
+# Sharded test runner over several Appium endpoints, see run_tests.py
+TEST_ENDPOINTS = [endpoint.strip() for endpoint in os.getenv("APPIUM_ENDPOINTS", APPIUM_ENDPOINT).split(",")
+                  if endpoint.strip()]
+TEST_PROCESSES_PER_ENDPOINT = 1  # an endpoint drives one desktop, where apps under test share the screen
+TEST_DURATIONS_PATH = os.path.join(PROJECT_ROOT, ".cache", "test_durations.json")
+TEST_DEFAULT_DURATION = 10  # seconds assumed for a test without history
+TEST_DURATION_SMOOTHING = 0.5  # weight of the latest run in the duration history
+
 # Settings for testing Teams App
+TEAMS_APP_ID = os.getenv("TEAMS_APP_ID")  # resolved through PowerShell when not set
 IS_CHAT_INITIATOR = True
 MICROSOFT_TEAMS_USERNAME = ""
 MICROSOFT_TEAMS_PASSWORD = ""
@@ -1,19 +1,25 @@
 import time
 import unittest
-import socket
 import subprocess
 import settings
-from appium import webdriver
 from datetime import datetime
+from functools import lru_cache
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+from utils.appium_session import AppiumSessions, device_name
 
+@lru_cache(maxsize=None)
 def get_teams_app_id():
+    if settings.TEAMS_APP_ID:
+        return settings.TEAMS_APP_ID
+    # Get-StartApps takes seconds, it runs once per process
     cmd = 'powershell "Get-StartApps | Where-Object {$_.Name -eq \'Skype\'} | Select-Object AppId"'
     result = subprocess.run(cmd, capture_output=True, text=True, shell=True)
     app_id = result.stdout.strip().split('\n')[-1]
     return app_id
 
-def get_device_name():
-    return socket.gethostname()
+def dismiss_dialogs(driver):
+    driver.switch_to.active_element.send_keys(Keys.ESCAPE)
 
 def log_to_console(msg):
     time_now = datetime.now().isoformat().replace("T", " ")
@@ -25,44 +31,42 @@ class SimpleTeamsTests(unittest.TestCase):
         desired_caps = {
             "platformName": "Windows",
             "app": get_teams_app_id(),
-            "deviceName": get_device_name(),
+            "deviceName": device_name(),
         }
 
-        self.driver = webdriver.Remote(command_executor="http://127.0.0.1:4723",desired_capabilities=desired_caps)
+        # Teams stays open and signed in between tests, open dialogs are dismissed instead
+        self.driver = AppiumSessions.session(desired_caps, reset=dismiss_dialogs)
         print("CONNECTED")
         self.username = settings.MICROSOFT_TEAMS_USERNAME
         self.password = settings.MICROSOFT_TEAMS_PASSWORD
         self.is_initiator = settings.IS_CHAT_INITIATOR
         print(self.username, self.password)
 
-    def tearDown(self):
-        self.driver.quit()
-
     def login(self):
-        sign_in_button = self.driver.find_element_by_xpath("//button[contains(text(), 'Sign In')]")
+        sign_in_button = self.driver.find_element(By.XPATH, "//button[contains(text(), 'Sign In')]")
         sign_in_button.click()
 
-        email_field = self.driver.find_element_by_xpath("//input[@name='loginfmt']")
+        email_field = self.driver.find_element(By.XPATH, "//input[@name='loginfmt']")
         email_field.send_keys(self.username)
 
-        next_button = self.driver.find_element_by_xpath("//input[@value='Next']")
+        next_button = self.driver.find_element(By.XPATH, "//input[@value='Next']")
         next_button.click()
-        password_field = self.driver.find_element_by_xpath("//input[@name='passwd']")
+        password_field = self.driver.find_element(By.XPATH, "//input[@name='passwd']")
         password_field.send_keys(self.password)
 
-        final_sign_in_button = self.driver.find_element_by_xpath("//input[@value='Sign in']")
+        final_sign_in_button = self.driver.find_element(By.XPATH, "//input[@value='Sign in']")
         final_sign_in_button.click()
 
     def send_message(self, message):
-        channel = self.driver.find_element_by_xpath("//*[@Name='Skype']/Group/Group/Group/Group[starts-with(@Name,'Suhail')]")
+        channel = self.driver.find_element(By.XPATH, "//*[@Name='Skype']/Group/Group/Group/Group[starts-with(@Name,'Suhail')]")
         channel.click()
 
         # Locate the message input field and enter the message
-        message_input = self.driver.find_element_by_xpath("//div[@role='textbox']")
+        message_input = self.driver.find_element(By.XPATH, "//div[@role='textbox']")
         message_input.send_keys(message)
 
         # Send the message
-        send_button = self.driver.find_element_by_xpath("//button[@title='Send']")
+        send_button = self.driver.find_element(By.XPATH, "//button[@title='Send']")
         send_button.click()
 
     def test_login_and_chat(self):
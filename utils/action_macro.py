@@ -0,0 +1,116 @@
+from selenium.webdriver import ActionChains
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.remote.webelement import WebElement
+from settings import ACTION_POINTER_DURATION
+
+
+class ActionMacro:
+    """
+    Queue of pointer and keyboard actions sent to the browser in a single W3C actions
+    request, instead of one round trip per step. Locators are looked up while queueing.
+
+    Usage:
+        with page.actions() as macro:
+            macro.click_and_hold(source).move_to(target).release(target)
+
+        page.actions().send_keys(search_input, "selenium").hit_enter().perform()
+    """
+
+    def __init__(self, page, duration=ACTION_POINTER_DURATION):
+        """
+        :param page: PageBase the locators are resolved on
+        :param duration: milliseconds every pointer move takes in the browser
+        """
+        self._page = page
+        self._chain = ActionChains(page.get_current_driver(), duration=duration)
+        self.steps = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.perform()
+
+    def _element(self, target):
+        if target is None or isinstance(target, WebElement):
+            return target
+        return self._page.find_element(target)
+
+    def _queue(self, action, *args):
+        action(*args)
+        self.steps += 1
+        return self
+
+    def move_to(self, target, x_offset=None, y_offset=None):
+        """
+        Move the pointer to the center of target, or by the offsets from it
+        :param target: locator or WebElement
+        """
+        element = self._element(target)
+        if x_offset is None and y_offset is None:
+            return self._queue(self._chain.move_to_element, element)
+        return self._queue(self._chain.move_to_element_with_offset, element, x_offset or 0, y_offset or 0)
+
+    def move_by(self, x_offset, y_offset):
+        return self._queue(self._chain.move_by_offset, x_offset, y_offset)
+
+    def click(self, target=None):
+        """
+        :param target: locator or WebElement, None clicks at the current pointer position
+        """
+        return self._queue(self._chain.click, self._element(target))
+
+    def double_click(self, target=None):
+        return self._queue(self._chain.double_click, self._element(target))
+
+    def context_click(self, target=None):
+        return self._queue(self._chain.context_click, self._element(target))
+
+    def click_and_hold(self, target=None):
+        return self._queue(self._chain.click_and_hold, self._element(target))
+
+    def release(self, target=None):
+        return self._queue(self._chain.release, self._element(target))
+
+    def drag_and_drop(self, source, target):
+        return self.click_and_hold(source).move_to(target).release(target)
+
+    def send_keys(self, target, *keys):
+        """
+        Click target to focus it and type keys
+        :param target: locator or WebElement
+        """
+        return self._queue(self._chain.send_keys_to_element, self._element(target), *keys)
+
+    def type(self, *keys):
+        """
+        Type keys into the focused element
+        """
+        return self._queue(self._chain.send_keys, *keys)
+
+    def hit_enter(self):
+        return self.type(Keys.ENTER)
+
+    def key_down(self, key, target=None):
+        return self._queue(self._chain.key_down, key, self._element(target))
+
+    def key_up(self, key, target=None):
+        return self._queue(self._chain.key_up, key, self._element(target))
+
+    def scroll_to(self, target):
+        return self._queue(self._chain.scroll_to_element, self._element(target))
+
+    def pause(self, seconds):
+        return self._queue(self._chain.pause, seconds)
+
+    def perform(self):
+        """
+        Send every queued action in one request
+        :return: the page the macro was created on
+        """
+        if self.steps:
+            # perform empties the local queue, reset_actions would cost another round trip
+            self._chain.perform()
+            self.steps = 0
+        return self._page
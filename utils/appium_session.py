@@ -0,0 +1,196 @@
+"""
+Appium sessions shared by the tests of a process. Starting a session launches the app under
+test, which takes far longer than the tests themselves, so a session is created once per
+endpoint and set of capabilities and handed to every following test after its app state
+was reset. Commands go over a keep-alive connection, and a session that died in between
+(server restart, newCommandTimeout) is replaced transparently.
+
+The endpoint comes from APPIUM_ENDPOINT, benchmarks.appium_stand_in serves one locally.
+"""
+
+import atexit
+import json
+import socket
+import threading
+import time
+from functools import lru_cache
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.remote.command import Command
+from utils.general_utils import log_to_console
+from settings import APPIUM_ENDPOINT, APPIUM_NEW_COMMAND_TIMEOUT, APPIUM_SESSION_CHECK_AFTER
+
+try:
+    from appium.options.common import AppiumOptions as Options
+    from appium.webdriver import Remote
+    from appium.webdriver.appium_connection import AppiumConnection as Connection
+except ImportError:
+    # the Appium client only adds mobile specific commands, sessions work the same without it
+    from selenium.webdriver import Remote
+    from selenium.webdriver.common.options import ArgOptions as Options
+    from selenium.webdriver.remote.remote_connection import RemoteConnection as Connection
+
+ACCESSIBILITY_ID = "accessibility id"  # locator strategy of the AutomationId of Windows controls
+# capabilities defined by W3C, every other one needs the appium: vendor prefix
+W3C_CAPABILITIES = ("browserName", "browserVersion", "platformName", "acceptInsecureCerts", "pageLoadStrategy",
+                    "proxy", "setWindowRect", "timeouts", "strictFileInteractability", "unhandledPromptBehavior")
+
+
+@lru_cache(maxsize=None)
+def device_name():
+    """
+    Name of the Windows device the tests run on, resolved once per process
+    """
+    return socket.gethostname()
+
+
+def keep_alive_connection(endpoint):
+    """
+    Command executor reusing one TCP connection for every command of a session
+    """
+    try:
+        from selenium.webdriver.remote.client_config import ClientConfig
+    except ImportError:  # selenium before 4.26 takes the address directly
+        return Connection(endpoint, keep_alive=True)
+    return Connection(client_config=ClientConfig(endpoint, keep_alive=True))
+
+
+def appium_options(capabilities):
+    options = Options()
+    capabilities = dict({"newCommandTimeout": APPIUM_NEW_COMMAND_TIMEOUT}, **capabilities)
+    for name, value in capabilities.items():
+        if name not in W3C_CAPABILITIES and ":" not in name:
+            name = "appium:" + name
+        options.set_capability(name, value)
+    return options
+
+
+class SessionStats:
+    """
+    Process wide counts of created, reused and replaced sessions and the time spent on them
+    """
+    _lock = threading.Lock()
+    counts = {"created": 0, "reused": 0, "replaced": 0, "reset_failed": 0}
+    seconds = {"create": 0.0, "reset": 0.0}
+
+    @classmethod
+    def record(cls, event, seconds=None, phase=None):
+        with cls._lock:
+            if event:
+                cls.counts[event] += 1
+            if phase:
+                cls.seconds[phase] += seconds
+
+    @classmethod
+    def report(cls):
+        with cls._lock:
+            return dict(cls.counts, **{phase + "_seconds": round(seconds, 3) for phase, seconds in cls.seconds.items()})
+
+
+class _Session:
+
+    def __init__(self, driver, reset):
+        self.driver = driver
+        self.reset = reset
+        self.last_used = time.monotonic()
+
+
+class AppiumSessions:
+    """
+    Usage:
+        class SimpleCalculatorTests(unittest.TestCase):
+            def setUp(self):
+                self.driver = AppiumSessions.session({"app": CALCULATOR_APP_ID}, reset=clear_calculator)
+    """
+    endpoint = APPIUM_ENDPOINT  # default endpoint of the process, the sharded runner sets one per worker
+    _lock = threading.Lock()
+    _sessions = {}
+
+    @staticmethod
+    def _key(endpoint, capabilities):
+        return endpoint, json.dumps(capabilities, sort_keys=True, default=str)
+
+    @staticmethod
+    def _create(endpoint, capabilities):
+        started = time.perf_counter()
+        driver = Remote(command_executor=keep_alive_connection(endpoint), options=appium_options(capabilities))
+        SessionStats.record("created", time.perf_counter() - started, "create")
+        return driver
+
+    @staticmethod
+    def _alive(driver):
+        try:
+            driver.execute(Command.W3C_GET_CURRENT_WINDOW_HANDLE)
+        except WebDriverException:
+            return False
+        return True
+
+    @classmethod
+    def session(cls, capabilities, endpoint=None, reset=None):
+        """
+        Shared session for capabilities on endpoint, created on first use
+        :param capabilities: dict of capabilities, app and deviceName for WinAppDriver
+        :param endpoint: url of the Appium server, AppiumSessions.endpoint by default
+        :param reset: callable taking the driver, brings the app back to its start state before a reuse
+        :return: WebDriver object, do not quit it, close() does at exit
+        """
+        endpoint = endpoint or cls.endpoint
+        key = cls._key(endpoint, capabilities)
+        with cls._lock:
+            shared = cls._sessions.get(key)
+            if shared is not None and time.monotonic() - shared.last_used > APPIUM_SESSION_CHECK_AFTER \
+                    and not cls._alive(shared.driver):
+                log_to_console("Appium session {} is gone, starting a new one".format(shared.driver.session_id))
+                SessionStats.record("replaced")
+                cls._quit(shared.driver)
+                shared = None
+            if shared is not None:
+                shared.reset = reset or shared.reset
+                if shared.reset is not None:
+                    started = time.perf_counter()
+                    try:
+                        shared.reset(shared.driver)
+                    except WebDriverException as e:
+                        log_to_console("Resetting the app failed due to {}, starting a new session".format(e))
+                        SessionStats.record("reset_failed")
+                        cls._quit(shared.driver)
+                        shared = None
+                    else:
+                        SessionStats.record(None, time.perf_counter() - started, "reset")
+            if shared is None:
+                shared = cls._sessions[key] = _Session(cls._create(endpoint, capabilities), reset)
+            else:
+                SessionStats.record("reused")
+            shared.last_used = time.monotonic()
+            return shared.driver
+
+    @staticmethod
+    def _quit(driver):
+        try:
+            driver.quit()
+        except WebDriverException:
+            # the server already ended the session
+            pass
+
+    @classmethod
+    def discard(cls, driver):
+        """
+        Quit a shared session, e.g. after a test left the app in an unknown state
+        """
+        with cls._lock:
+            for key, shared in list(cls._sessions.items()):
+                if shared.driver is driver:
+                    del cls._sessions[key]
+        cls._quit(driver)
+
+    @classmethod
+    def close(cls):
+        """
+        Quit every shared session, runs at exit
+        """
+        with cls._lock:
+            sessions, cls._sessions = list(cls._sessions.values()), {}
+        for shared in sessions:
+            cls._quit(shared.driver)
+
+
+atexit.register(AppiumSessions.close)
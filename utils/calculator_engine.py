@@ -0,0 +1,334 @@
+"""
+Data driven test engine for the Windows calculator. Cases come from a table (CSV or JSON
+lines with an expression and an optional expected result) or are generated from a seed,
+expected results are computed left to right like the standard mode of the calculator.
+
+The keypad is resolved once per session into a map of WebElements, every case is then
+entered as one W3C actions request clicking the keys and checked with one read of the
+display, two commands per case however long the expression is.
+"""
+
+import csv
+import json
+import random
+import re
+import threading
+import time
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation, localcontext
+from fractions import Fraction
+from selenium.common.exceptions import StaleElementReferenceException, WebDriverException
+from selenium.webdriver import ActionChains
+from selenium.webdriver.common.keys import Keys
+from utils.appium_session import ACCESSIBILITY_ID
+from utils.general_utils import percentile
+from settings import CALCULATOR_ENTRY_MODE
+
+# automation ids of the keys of the calculator in standard mode
+KEYPAD = dict({str(digit): "num{}Button".format(digit) for digit in range(10)}, **{
+    ".": "decimalSeparatorButton", "+": "plusButton", "-": "minusButton", "*": "multiplyButton",
+    "/": "divideButton", "=": "equalButton", "negate": "negateButton", "clear": "clearButton",
+})
+# keyboard shortcuts of the same keys
+KEYBOARD = dict({str(digit): str(digit) for digit in range(10)}, **{
+    ".": ".", "+": "+", "-": "-", "*": "*", "/": "/", "=": Keys.ENTER, "negate": Keys.F9, "clear": Keys.ESCAPE,
+})
+RESULTS_ID = "CalculatorResults"
+DISPLAY_PREFIX = "Display is "
+DIVIDE_BY_ZERO = "Cannot divide by zero"
+SIGNIFICANT_DIGITS = 16  # digits the display of standard mode shows, larger values in scientific notation
+# relative difference tolerated between the display and the exact result, the display is rounded
+TOLERANCE = Fraction(1, 10 ** 15)
+ENTRY_MODES = ("actions", "clicks", "keys")
+TOKEN = re.compile(r"\s*(?:(\d+(?:\.\d*)?|\.\d+)|([-+*/]))")
+
+Case = namedtuple("Case", ["id", "expression", "expected"])
+
+
+def tokenize(expression):
+    """
+    :return: list of Fraction operands and operator characters, unary minus folded into the operand
+    :raises ValueError: for anything but numbers and + - * /
+    """
+    tokens = []
+    position = 0
+    negative = False
+    expression = expression.strip()
+    while position < len(expression):
+        match = TOKEN.match(expression, position)
+        if match is None:
+            raise ValueError("Can not parse {!r} at {}".format(expression, position))
+        position = match.end()
+        number, operator = match.groups()
+        expects_operand = not tokens or not isinstance(tokens[-1], Fraction)
+        if operator == "-" and expects_operand and not negative:
+            negative = True
+        elif operator:
+            if expects_operand:
+                raise ValueError("Operator {} without an operand in {!r}".format(operator, expression))
+            tokens.append(operator)
+        else:
+            if not expects_operand:
+                raise ValueError("Two operands in a row in {!r}".format(expression))
+            tokens.append(-Fraction(number) if negative else Fraction(number))
+            negative = False
+    if not tokens or not isinstance(tokens[-1], Fraction):
+        raise ValueError("Expression {!r} does not end with an operand".format(expression))
+    return tokens
+
+
+def evaluate(expression):
+    """
+    Result of expression evaluated left to right, like the calculator does in standard mode.
+    A division by zero shows DIVIDE_BY_ZERO and disables the operator keys, the next operand
+    clears the error and the calculation starts over from it.
+    :return: Fraction, or DIVIDE_BY_ZERO when the last operation divided by zero
+    """
+    tokens = tokenize(expression)
+    result = tokens[0]
+    for operator, operand in zip(tokens[1::2], tokens[2::2]):
+        if result == DIVIDE_BY_ZERO:
+            result = operand
+        elif operator == "+":
+            result += operand
+        elif operator == "-":
+            result -= operand
+        elif operator == "*":
+            result *= operand
+        elif operand == 0:
+            result = DIVIDE_BY_ZERO
+        else:
+            result /= operand
+    return result
+
+
+def format_number(value):
+    """
+    Number as shown on the calculator display, rounded to SIGNIFICANT_DIGITS with thousands
+    separators, e.g. 1,234.5 or 1.234567890123457e+20
+    """
+    with localcontext() as context:
+        context.prec = SIGNIFICANT_DIGITS
+        number = (Decimal(value.numerator) / Decimal(value.denominator)).normalize()
+    if number and number.adjusted() >= SIGNIFICANT_DIGITS:
+        return "{:e}".format(number)
+    return "{:,f}".format(number)
+
+
+def key_sequence(expression):
+    """
+    Keys entering expression on a cleared calculator and showing its result
+    """
+    keys = ["clear"]
+    for token in tokenize(expression):
+        if isinstance(token, Fraction):
+            keys.extend(_operand(token))
+        else:
+            keys.append(token)
+    keys.append("=")
+    return keys
+
+
+def _operand(value):
+    # operands come from tokenize, so they are finite decimals and are entered with every digit
+    scale = 0
+    while 10 ** scale % value.denominator:
+        scale += 1
+    text = "{:f}".format(Decimal(abs(value.numerator) * 10 ** scale // value.denominator).scaleb(-scale))
+    return list(text) + (["negate"] if value < 0 else [])
+
+
+def matches(display, expected):
+    """
+    :param display: text of the display without the prefix
+    :param expected: Fraction or DIVIDE_BY_ZERO
+    """
+    if not isinstance(expected, Fraction):
+        return display == expected
+    try:
+        # the display can be in scientific notation, e.g. 1.e+20
+        actual = Fraction(Decimal(display.replace(",", "")))
+    except (InvalidOperation, ValueError):
+        return False
+    return abs(actual - expected) <= abs(expected) * TOLERANCE
+
+
+def read_table(path):
+    """
+    Cases from a CSV file with an expression and an optional expected column, or from JSON
+    lines with the same keys
+    :return: generator of Case
+    """
+    with open(path, encoding="utf-8", newline="") as table:
+        rows = (json.loads(line) for line in table if line.strip()) if path.endswith(".jsonl") \
+            else csv.DictReader(table)
+        for number, row in enumerate(rows, 1):
+            expected = row.get("expected")
+            yield Case(row.get("id") or "{}:{}".format(path, number), row["expression"],
+                       expected if expected not in (None, "") else None)
+
+
+def random_cases(count, seed=0, operands=(2, 4), digits=4, decimals=0, operators="+-*/", negative=False):
+    """
+    Generated cases, the same seed always gives the same cases
+    :param operands: (min, max) number of operands per expression
+    :param digits: max digits of the integer part of an operand
+    :param decimals: max digits after the decimal separator, 0 for integers only
+    :param negative: allow negative operands
+    :return: generator of Case
+    """
+    generator = random.Random(seed)
+    for number in range(count):
+        parts = []
+        for position in range(generator.randint(*operands)):
+            if position:
+                parts.append(generator.choice(operators))
+            operand = str(generator.randint(0, 10 ** generator.randint(1, digits) - 1))
+            if decimals and generator.random() < 0.5:
+                operand += "." + str(generator.randint(1, 10 ** generator.randint(1, decimals) - 1))
+            if negative and generator.random() < 0.25:
+                operand = "-" + operand
+            parts.append(operand)
+        yield Case("random:{}:{}".format(seed, number), " ".join(parts), None)
+
+
+class Keypad:
+    """
+    WebElements of the keys and the display, resolved once per session
+    """
+    _lock = threading.Lock()
+    _sessions = {}
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.elements = {}
+
+    @classmethod
+    def of(cls, driver):
+        with cls._lock:
+            keypad = cls._sessions.get(driver.session_id)
+            if keypad is None:
+                keypad = cls._sessions[driver.session_id] = cls(driver)
+            return keypad
+
+    def element(self, key):
+        """
+        :param key: key of KEYPAD, or RESULTS_ID for the display
+        """
+        element = self.elements.get(key)
+        if element is None:
+            element = self.elements[key] = self.driver.find_element(ACCESSIBILITY_ID, KEYPAD.get(key, key))
+        return element
+
+    def resolve(self, keys=tuple(KEYPAD) + (RESULTS_ID,)):
+        for key in keys:
+            self.element(key)
+        return self
+
+    def forget(self):
+        self.elements.clear()
+
+
+class CalculatorEngine:
+    """
+    Usage:
+        engine = CalculatorEngine(AppiumSessions.session({"app": CALCULATOR_APP_ID}))
+        with open("report.jsonl", "w") as report:
+            summary = engine.run(random_cases(5000, seed=7), report)
+    """
+
+    def __init__(self, driver, mode=CALCULATOR_ENTRY_MODE):
+        """
+        :param driver: WebDriver object of a calculator session
+        :param mode: actions sends every key of a case in one request, clicks one request per key,
+                     keys types the keyboard shortcuts into the display in one request
+        """
+        if mode not in ENTRY_MODES:
+            raise ValueError("Entry mode {} is not one of {}".format(mode, ", ".join(ENTRY_MODES)))
+        self.driver = driver
+        self.mode = mode
+        self.keypad = Keypad.of(driver)
+
+    def enter(self, expression):
+        keys = key_sequence(expression)
+        if self.mode == "keys":
+            self.keypad.element(RESULTS_ID).send_keys("".join(KEYBOARD[key] for key in keys))
+        elif self.mode == "clicks":
+            for key in keys:
+                self.keypad.element(key).click()
+        else:
+            chain = ActionChains(self.driver, duration=0)
+            for key in keys:
+                chain.click(self.keypad.element(key))
+            chain.perform()
+
+    def result(self):
+        """
+        :return: text of the display without its prefix
+        """
+        text = self.keypad.element(RESULTS_ID).text.strip()
+        return text[len(DISPLAY_PREFIX):].strip() if text.startswith(DISPLAY_PREFIX) else text
+
+    def calculate(self, expression):
+        """
+        :return: the display after entering expression
+        """
+        try:
+            self.enter(expression)
+            return self.result()
+        except StaleElementReferenceException:
+            # the app window was recreated, the keys are looked up again once
+            self.keypad.forget()
+            self.enter(expression)
+            return self.result()
+
+    def run_case(self, case):
+        """
+        :return: dict record of the case with its result and latency
+        """
+        expected = evaluate(case.expression) if case.expected is None else case.expected
+        if expected != DIVIDE_BY_ZERO and not isinstance(expected, Fraction):
+            # expected results of a table, e.g. "1,234.5" or a JSON number
+            expected = Fraction(Decimal(str(expected).replace(",", "")))
+        record = {"id": case.id, "expression": case.expression,
+                  "expected": expected if isinstance(expected, str) else format_number(expected)}
+        started = time.perf_counter()
+        try:
+            actual = self.calculate(case.expression)
+        except WebDriverException as e:
+            record.update(passed=False, error=str(e).strip().splitlines()[0] if str(e).strip() else type(e).__name__)
+        else:
+            record.update(actual=actual, passed=matches(actual, expected))
+        record["ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return record
+
+    def run(self, cases, report=None, max_failures=None):
+        """
+        Run cases and stream one JSON line per case to report
+        :param cases: iterable of Case
+        :param report: text stream, e.g. an open file or sys.stdout
+        :param max_failures: stop after this many failed cases
+        :return: summary dict with counts and latency percentiles
+        """
+        self.keypad.resolve()
+        latencies = []
+        failed = 0
+        started = time.perf_counter()
+        for case in cases:
+            record = self.run_case(case)
+            latencies.append(record["ms"])
+            failed += 0 if record["passed"] else 1
+            if report is not None:
+                report.write(json.dumps(record, separators=(",", ":")) + "\n")
+                report.flush()
+            if max_failures is not None and failed >= max_failures:
+                break
+        return {
+            "cases": len(latencies),
+            "passed": len(latencies) - failed,
+            "failed": failed,
+            "mode": self.mode,
+            "seconds": round(time.perf_counter() - started, 3),
+            "p50_ms": percentile(latencies, 0.5) if latencies else None,
+            "p95_ms": percentile(latencies, 0.95) if latencies else None,
+        }
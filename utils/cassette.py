@@ -0,0 +1,280 @@
+"""
+Record and replay of the WebDriver command stream. A RecordingExecutor sits under a real
+driver (browser or Appium) and writes every command with the response of the server to a
+gzipped JSON lines cassette. A replay driver serves the same responses from the cassette
+without a browser, so page objects and the parsing of results can be regression tested
+and benchmarked on any machine.
+
+Record a session, the cassette is written when the driver quits:
+    driver = DriverClass.register_driver(browser=SupportedBrowsers.chrome, cassette="google.cassette")
+
+Replay it:
+    driver = replay_driver("google.cassette")
+    GoogleSearch(driver, url=...).enter_search("selenium").parse_search_results()
+
+    python -m benchmarks.run --driver replay --cassette google.cassette
+"""
+
+import copy
+import gzip
+import json
+import sys
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.common.options import ArgOptions
+from selenium.webdriver.remote.command import Command
+
+CASSETTE_VERSION = 1
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+
+class CassetteMiss(WebDriverException):
+    """
+    Raised on replay for a command that was never recorded
+    """
+
+
+def _normalize_url(url):
+    """
+    Url without its port and with loopback hosts as localhost, a fixture server listens on a
+    different port in every run
+    """
+    parts = urlsplit(url)
+    if not parts.hostname:
+        return url
+    host = "localhost" if parts.hostname in LOOPBACK_HOSTS else parts.hostname
+    return urlunsplit((parts.scheme, host, parts.path, parts.query, parts.fragment))
+
+
+def _key(command, params):
+    """
+    Commands match on their name and parameters, the session id differs from run to run and
+    so does the port in the url of a navigation
+    """
+    params = {name: value for name, value in (params or {}).items() if name != "sessionId"}
+    if command == Command.GET and isinstance(params.get("url"), str):
+        params["url"] = _normalize_url(params["url"])
+    return command, json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+
+
+class Cassette:
+    """
+    Usage:
+        cassette = Cassette.load("google.cassette")
+        response = cassette.play("findElement", {"using": "css selector", "value": "#search"})["r"]
+    """
+
+    def __init__(self, path=None, capabilities=None, session_id=None):
+        """
+        :param path: gzipped JSON lines file the cassette is saved to
+        :param capabilities: capabilities the recorded session was started with
+        """
+        self.path = path
+        self.capabilities = capabilities or {}
+        self.session_id = session_id
+        self.entries = []
+        self._lock = threading.Lock()
+        self._responses = None
+
+    @classmethod
+    def load(cls, path):
+        with gzip.open(path, "rt", encoding="utf-8") as cassette_file:
+            header = json.loads(cassette_file.readline())
+            if header.get("version") != CASSETTE_VERSION:
+                raise ValueError("Cassette {} has version {}, expected {}".format(
+                    path, header.get("version"), CASSETTE_VERSION))
+            cassette = cls(path, header.get("capabilities"), header.get("session_id"))
+            cassette.entries = [json.loads(line) for line in cassette_file if line.strip()]
+        return cassette
+
+    def save(self, path=None):
+        path = path or self.path
+        header = {"version": CASSETTE_VERSION, "capabilities": self.capabilities, "session_id": self.session_id}
+        with self._lock, gzip.open(path, "wt", encoding="utf-8") as cassette_file:
+            cassette_file.write(json.dumps(header, separators=(",", ":")) + "\n")
+            for entry in self.entries:
+                cassette_file.write(json.dumps(entry, separators=(",", ":"), default=str) + "\n")
+        return path
+
+    def record(self, command, params, response, seconds):
+        # the driver replaces the value of the response with WebElements once it returns
+        response = copy.deepcopy(response)
+        with self._lock:
+            if command == Command.NEW_SESSION:
+                value = (response or {}).get("value") or {}
+                self.session_id = value.get("sessionId", self.session_id)
+                self.capabilities = value.get("capabilities", self.capabilities)
+            self.entries.append({"c": command, "p": {name: value for name, value in (params or {}).items()
+                                                     if name != "sessionId"},
+                                 "r": response, "ms": round(seconds * 1000, 3)})
+
+    def _index(self):
+        # responses per command and parameters, each with the position of the next one
+        self._responses = {}
+        for entry in self.entries:
+            self._responses.setdefault(_key(entry["c"], entry["p"]), [0, []])[1].append(entry)
+
+    @staticmethod
+    def _next(cursor):
+        position, entries = cursor
+        # starts over once every response was served, so a cassette can be replayed any number of times
+        cursor[0] = (position + 1) % len(entries)
+        return entries[position]
+
+    def play(self, command, params):
+        """
+        :return: the recorded entry of command, with the response under "r" and its duration under "ms"
+        :raises CassetteMiss: when the command was not recorded with these parameters
+        """
+        with self._lock:
+            if self._responses is None:
+                self._index()
+            cursor = self._responses.get(_key(command, params))
+            if cursor is None:
+                raise CassetteMiss("Command {} with {} is not on cassette {}".format(command, params, self.path))
+            return self._next(cursor)
+
+    def rewind(self):
+        with self._lock:
+            self._responses = None
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class RecordingExecutor:
+    """
+    Command executor writing every command and response to a cassette, everything else is
+    delegated to the wrapped executor
+
+    Usage:
+        record(driver, "session.cassette")
+        driver = webdriver.Remote(command_executor=RecordingExecutor.to_url("http://127.0.0.1:4723", path),
+                                  options=options)
+    """
+
+    def __init__(self, executor, cassette):
+        """
+        :param executor: command executor of a driver, RemoteConnection or a subclass
+        :param cassette: Cassette the commands are recorded to, saved when the executor is closed
+        """
+        self._executor = executor
+        self.cassette = cassette
+
+    @classmethod
+    def to_url(cls, url, path, **kwargs):
+        """
+        Recording executor for a remote end like an Appium or Selenium server
+        """
+        from selenium.webdriver.remote.remote_connection import RemoteConnection
+        return cls(RemoteConnection(url, **kwargs), Cassette(path))
+
+    def execute(self, command, params):
+        # the connection removes the url parameters like the element id from params
+        recorded_params = copy.deepcopy(params)
+        started = time.perf_counter()
+        response = self._executor.execute(command, params)
+        self.cassette.record(command, recorded_params, response, time.perf_counter() - started)
+        return response
+
+    def close(self):
+        try:
+            if self.cassette.path:
+                self.cassette.save()
+        finally:
+            close = getattr(self._executor, "close", None)
+            if close:
+                close()
+
+    def __getattr__(self, name):
+        return getattr(self._executor, name)
+
+
+class ReplayExecutor:
+    """
+    Command executor answering from a cassette, no server is involved
+    """
+
+    def __init__(self, cassette, latency=0):
+        """
+        :param cassette: Cassette or path of one
+        :param latency: fraction of the recorded duration every response is delayed by, 1 replays in real time
+        """
+        self.cassette = Cassette.load(cassette) if isinstance(cassette, str) else cassette
+        self.latency = latency
+        self.commands = 0
+
+    def execute(self, command, params):
+        self.commands += 1
+        if command == Command.NEW_SESSION:
+            try:
+                return dict(self.cassette.play(command, params)["r"])
+            except CassetteMiss:
+                # sessions recorded on an existing driver start without a newSession command
+                return {"value": {"sessionId": self.cassette.session_id or "replay",
+                                  "capabilities": self.cassette.capabilities}}
+        if command == Command.QUIT:
+            return {"value": None}
+        entry = self.cassette.play(command, params)
+        if self.latency:
+            time.sleep(entry["ms"] * self.latency / 1000)
+        # a copy, the driver replaces the value of the response it gets
+        return dict(entry["r"])
+
+    def close(self):
+        pass
+
+
+def is_replay(driver):
+    """
+    Whether driver answers from a cassette, its waits need no quiet periods or polling pauses
+    """
+    return isinstance(getattr(driver, "command_executor", None), ReplayExecutor)
+
+
+def record(driver, path):
+    """
+    Record every further command of driver, the cassette is written when the driver quits
+    :param driver: WebDriver object
+    :param path: cassette file
+    :return: Cassette
+    """
+    cassette = Cassette(path, capabilities=getattr(driver, "capabilities", None),
+                        session_id=getattr(driver, "session_id", None))
+    driver.command_executor = RecordingExecutor(driver.command_executor, cassette)
+    return cassette
+
+
+def replay_driver(cassette, latency=0):
+    """
+    Driver serving the responses of a recorded session
+    :param cassette: Cassette or path of one
+    :return: WebDriver object
+    """
+    executor = ReplayExecutor(cassette, latency=latency)
+    return webdriver.Remote(command_executor=executor, options=ArgOptions())
+
+
+def describe(path):
+    """
+    :return: dict with the command counts and recorded time of a cassette
+    """
+    cassette = Cassette.load(path)
+    commands = {}
+    for entry in cassette.entries:
+        counted = commands.setdefault(entry["c"], {"count": 0, "ms": 0})
+        counted["count"] += 1
+        counted["ms"] = round(counted["ms"] + entry["ms"], 3)
+    return {"path": path, "session_id": cassette.session_id, "commands": len(cassette),
+            "recorded_ms": round(sum(entry["ms"] for entry in cassette.entries), 3), "by_command": commands}
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 2:
+        print(json.dumps(describe(sys.argv[1]), indent=2, sort_keys=True))
+    else:
+        print("Usage: python -m utils.cassette <cassette file>")
+        sys.exit(2)
@@ -0,0 +1,24 @@
+import time
+
+
+class Deadline:
+    """
+    Point in time shared by every lookup and wait of one PageBase action
+    """
+
+    def __init__(self, seconds):
+        """
+        :param seconds: time budget from now
+        """
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return self.expires_at - time.monotonic()
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+    def __repr__(self):
+        return "Deadline({}s, {:.3f}s remaining)".format(self.seconds, self.remaining())
@@ -0,0 +1,167 @@
+"""
+Driver binaries (chromedriver, geckodriver) resolved once through webdriver-manager and
+pinned in a local manifest with their sha256, so later launches skip version discovery
+and network I/O. In offline mode only pinned binaries are used. Otherwise the major version
+of the installed browser is pinned too, and a browser update resolves the driver again.
+
+Pin a binary by hand on an air-gapped worker:
+    python -m utils.driver_binaries pin chrome C:\\drivers\\chromedriver.exe
+Show the manifest:
+    python -m utils.driver_binaries show
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from constants.browser import SupportedBrowsers
+from utils.general_utils import log_to_console
+from settings import DRIVER_MANIFEST_PATH, DRIVER_OFFLINE
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as binary:
+        for chunk in iter(lambda: binary.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _install(browser):
+    """
+    Resolve the driver binary through webdriver-manager, may hit the network
+    """
+    if browser == SupportedBrowsers.chrome:
+        from webdriver_manager.chrome import ChromeDriverManager
+        return ChromeDriverManager().install()
+    if browser == SupportedBrowsers.firefox:
+        from webdriver_manager.firefox import GeckoDriverManager
+        return GeckoDriverManager().install()
+    raise ValueError("Browser {} Not yet supported".format(browser))
+
+
+def browser_major_version(browser):
+    """
+    Major version of the installed browser, as webdriver-manager detects it
+    :return: str like "120", or None when it can not be detected
+    """
+    try:
+        from webdriver_manager.core.os_manager import ChromeType, OperationSystemManager
+        browser_type = ChromeType.GOOGLE if browser == SupportedBrowsers.chrome else browser
+        version = OperationSystemManager().get_browser_version_from_os(browser_type)
+    except Exception:
+        # older webdriver-manager or no browser on the path, the pin is then not checked
+        return None
+    return version.split(".")[0] if version else None
+
+
+class DriverBinaries:
+    """
+    Usage:
+        executable_path = DriverBinaries.resolve(SupportedBrowsers.chrome)
+    """
+    _lock = threading.Lock()
+    launches = 0
+    pinned_hits = 0
+    seconds_saved = 0.0
+
+    @staticmethod
+    def load_manifest(path=DRIVER_MANIFEST_PATH):
+        try:
+            with open(path, encoding="utf-8") as manifest_file:
+                return json.load(manifest_file)
+        except FileNotFoundError:
+            return {}
+
+    @staticmethod
+    def save_manifest(manifest, path=DRIVER_MANIFEST_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(temporary_path, "w", encoding="utf-8") as manifest_file:
+            json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+        # atomic, concurrent workers never read a half written manifest
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def pin(cls, browser, executable_path, install_seconds=0.0, browser_major=None, path=DRIVER_MANIFEST_PATH):
+        """
+        Record a driver binary in the manifest
+        :param browser: browser type from SupportedBrowsers
+        :param executable_path: path of the driver binary
+        :param install_seconds: time it took to resolve the binary, the baseline for the time saved
+        :param browser_major: major version of the browser the driver was resolved for
+        """
+        executable_path = os.path.abspath(executable_path)
+        manifest = cls.load_manifest(path)
+        manifest[browser] = {
+            "path": executable_path,
+            "sha256": file_sha256(executable_path),
+            "install_seconds": round(install_seconds, 3),
+            "browser_major": browser_major,
+            "pinned_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        cls.save_manifest(manifest, path)
+        return manifest[browser]
+
+    @classmethod
+    def resolve(cls, browser, offline=DRIVER_OFFLINE, force=False, path=DRIVER_MANIFEST_PATH):
+        """
+        Return the driver binary for browser, preferring the pinned one
+        :param browser: browser type from SupportedBrowsers
+        :param offline: never fall back to webdriver-manager
+        :param force: resolve again even if the pin looks fine, e.g. after the driver could not start a session
+        :return: path of the driver binary
+        """
+        started = time.perf_counter()
+        entry = cls.load_manifest(path).get(browser)
+        browser_major = None if offline else browser_major_version(browser)
+        problem = None
+        if force and not offline:
+            problem = "pinned {} driver could not start a session".format(browser)
+        elif entry is None:
+            problem = "no driver pinned for {} in {}".format(browser, path)
+        elif not os.path.isfile(entry["path"]):
+            problem = "pinned driver {} does not exist".format(entry["path"])
+        elif file_sha256(entry["path"]) != entry["sha256"]:
+            problem = "checksum of pinned driver {} does not match the manifest".format(entry["path"])
+        elif browser_major is not None and entry.get("browser_major") != browser_major:
+            problem = "pinned driver was resolved for {} {}, installed is {}".format(
+                browser, entry.get("browser_major"), browser_major)
+
+        if problem is None:
+            elapsed = time.perf_counter() - started
+            saved = max(0.0, entry.get("install_seconds", 0.0) - elapsed)
+            with cls._lock:
+                cls.launches += 1
+                cls.pinned_hits += 1
+                cls.seconds_saved += saved
+            log_to_console("Using pinned {} driver, saved {:.2f}s of driver resolution".format(browser, saved))
+            return entry["path"]
+
+        if offline:
+            raise Exception("Could not resolve {} driver in offline mode: {}".format(browser, problem))
+        log_to_console("Resolving {} driver through webdriver-manager: {}".format(browser, problem))
+        executable_path = _install(browser)
+        cls.pin(browser, executable_path, install_seconds=time.perf_counter() - started,
+                browser_major=browser_major, path=path)
+        with cls._lock:
+            cls.launches += 1
+        return executable_path
+
+    @classmethod
+    def report(cls):
+        with cls._lock:
+            return {"launches": cls.launches, "pinned_hits": cls.pinned_hits,
+                    "seconds_saved": round(cls.seconds_saved, 3)}
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == "pin":
+        print(json.dumps(DriverBinaries.pin(sys.argv[2], sys.argv[3]), indent=2))
+    elif len(sys.argv) == 2 and sys.argv[1] == "show":
+        print(json.dumps(DriverBinaries.load_manifest(), indent=2, sort_keys=True))
+    else:
+        print("Usage: python -m utils.driver_binaries pin <browser> <driver path> | show")
+        sys.exit(2)
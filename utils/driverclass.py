@@ -1,32 +1,85 @@
-from webdriver_manager.chrome import ChromeDriverManager
-from webdriver_manager.firefox import GeckoDriverManager
+import time
 from selenium import webdriver
+from selenium.common.exceptions import SessionNotCreatedException
+from selenium.webdriver.chrome.service import Service as ChromeService
+from selenium.webdriver.firefox.service import Service as FirefoxService
 from constants.browser import SupportedBrowsers
-from settings import IMPLICIT_WAIT
+from utils.driver_binaries import DriverBinaries
+from utils.instrumentation import Instrumentation
+from utils.lean_browser import block_urls, lean_chrome_options, lean_firefox_options
+from utils.general_utils import log_to_console
+from settings import DRIVER_OFFLINE, IMPLICIT_WAIT
 
 
 # INITIALIZING WEB DRIVER INSTANCE
 
+def _start(browser, launch):
+    """
+    Launch the browser with the pinned driver, a driver that does not fit the browser any more
+    (e.g. the browser updated itself) is resolved again once
+    :param launch: callable taking the driver path, returns the WebDriver object
+    """
+    try:
+        return launch(DriverBinaries.resolve(browser))
+    except SessionNotCreatedException as e:
+        if DRIVER_OFFLINE:
+            raise
+        log_to_console("Driver could not start {} due to {}, resolving it again".format(
+            browser, str(e).strip().splitlines()[0] if str(e).strip() else type(e).__name__))
+        return launch(DriverBinaries.resolve(browser, force=True))
+
+
 class DriverClass:
     @staticmethod
-    def register_driver(browser=None):
+    def register_driver(browser=None, headless=False, lean=False, profile_dir=None, cassette=None):
         """
         Returns driver object for a browser type
+        :param browser: browser type from SupportedBrowsers
+        :param headless: run the browser without a window
+        :param lean: headless with eager page loads and without images, fonts, media and trackers
+        :param profile_dir: persistent profile directory, lock it through utils.profiles first
+        :param cassette: record the commands of the session to this file for replay, see utils.cassette
         """
-        return DriverClass._get_web_driver(browser=browser)
+        started = time.perf_counter()
+        driver = DriverClass._get_web_driver(browser=browser, headless=headless, lean=lean, profile_dir=profile_dir)
+        if cassette:
+            from utils.cassette import record
+            record(driver, cassette)
+        if Instrumentation.enabled:
+            Instrumentation.record_startup(browser, time.perf_counter() - started)
+            Instrumentation.instrument_driver(driver)
+        return driver
 
-    def _get_web_driver(browser=None):
+    def _get_web_driver(browser=None, headless=False, lean=False, profile_dir=None):
         """
         Sets capabilities and return browser object
         """
         if browser == SupportedBrowsers.chrome:
             chrome_options = webdriver.ChromeOptions()
             chrome_options.add_argument("--start-maximized")
+            if lean:
+                lean_chrome_options(chrome_options)
+            elif headless:
+                chrome_options.add_argument("--headless=new")
             chrome_options.add_experimental_option('excludeSwitches', ['enable-logging'])
-            # Using webdriver manager utitlity to auto detect and select correct web driver exe
-            driver = webdriver.Chrome(ChromeDriverManager().install(), options=chrome_options)
+            if profile_dir:
+                chrome_options.add_argument("--user-data-dir={}".format(profile_dir))
+            # Driver exe pinned in the local manifest, resolved through webdriver manager on first use
+            driver = _start(browser, lambda executable_path: webdriver.Chrome(service=ChromeService(executable_path),
+                                                                              options=chrome_options))
+            if lean:
+                block_urls(driver)
         elif browser == SupportedBrowsers.firefox:
-            driver = webdriver.Firefox(executable_path=GeckoDriverManager().install())
+            firefox_options = webdriver.FirefoxOptions()
+            if lean:
+                lean_firefox_options(firefox_options)
+            elif headless:
+                firefox_options.add_argument("-headless")
+            if profile_dir:
+                firefox_options.add_argument("-profile")
+                firefox_options.add_argument(profile_dir)
+            driver = _start(browser, lambda executable_path: webdriver.Firefox(service=FirefoxService(executable_path),
+                                                                               options=firefox_options))
         else:
             raise ValueError("Browser {} Not yet supported".format(browser))
         driver.implicitly_wait(IMPLICIT_WAIT)
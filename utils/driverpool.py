@@ -0,0 +1,239 @@
+import threading
+import time
+from contextlib import contextmanager
+from queue import Empty, LifoQueue
+from utils.driverclass import DriverClass
+from utils.general_utils import log_to_console
+from utils.lean_browser import block_urls_in_new_tab
+from settings import DRIVER_POOL_SIZE, DRIVER_POOL_MAX_PAGE_LOADS, DRIVER_POOL_MAX_MEMORY_MB
+
+
+# POOL OF WARM WEB DRIVER SESSIONS
+
+_SESSION_STATS_SCRIPT = """
+var heap = (window.performance && performance.memory) ? performance.memory.usedJSHeapSize : null;
+if (arguments[0]) {
+    try { window.localStorage.clear(); window.sessionStorage.clear(); } catch (e) {}
+}
+return [window.history.length, heap];
+"""
+
+
+class PooledSession:
+    """
+    Book keeping for a single driver owned by the pool
+    """
+
+    def __init__(self, driver, profile=None):
+        self.driver = driver
+        self.profile = profile
+        self.created_at = time.monotonic()
+        self.page_loads = 0
+        self.checkouts = 0
+        self.heap_mb = None
+
+
+class DriverPool:
+    """
+    Keeps a bounded set of warm browser sessions so that callers do not pay
+    the browser (and webdriver-manager) start up for every search.
+
+    Usage:
+        pool = DriverPool(browser=SupportedBrowsers.chrome, size=2)
+        with pool.session() as driver:
+            GoogleSearch(driver).enter_search("selenium")
+        pool.close()
+    """
+
+    def __init__(self, browser=None, size=DRIVER_POOL_SIZE, max_page_loads=DRIVER_POOL_MAX_PAGE_LOADS,
+                 max_memory_mb=DRIVER_POOL_MAX_MEMORY_MB, driver_factory=None, profiles=None):
+        """
+        :param browser: browser type from SupportedBrowsers
+        :param size: maximum number of live sessions
+        :param max_page_loads: recycle a session after this many page loads (None to disable)
+        :param max_memory_mb: recycle a session once its JS heap grows past this (None to disable)
+        :param driver_factory: callable returning a new driver, defaults to DriverClass.register_driver.
+            With profiles it is called with the profile_dir keyword argument.
+        :param profiles: ProfileManager, every session gets its own persistent profile whose
+            cookies and cache survive checkins and recycling
+        """
+        if size < 1:
+            raise ValueError("Driver pool size has to be at least 1, got {}".format(size))
+        self.browser = browser
+        self.size = size
+        self.max_page_loads = max_page_loads
+        self.max_memory_mb = max_memory_mb
+        self._driver_factory = driver_factory or (
+            lambda **kwargs: DriverClass.register_driver(browser=browser, **kwargs))
+        self.profiles = profiles
+        self._idle = LifoQueue()
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self.recycled = 0
+
+    def warm_up(self, count=None):
+        """
+        Start sessions ahead of time so the first checkouts are warm
+        :param count: number of sessions to start, defaults to the pool size
+        """
+        count = self.size if count is None else min(count, self.size)
+        while len(self._sessions) < count:
+            session = self._create_session()
+            if session is None:
+                break
+            self._idle.put(session)
+
+    def checkout(self, timeout=None):
+        """
+        Borrow a healthy driver from the pool, starting a new one if there is room
+        :param timeout: seconds to wait for a free session when the pool is exhausted
+        :return: driver instance
+        """
+        if self._closed:
+            raise Exception("Driver pool for {} is closed".format(self.browser))
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except Empty:
+                session = self._create_session()
+                if session is None:
+                    remaining = None if deadline is None else max(0, deadline - time.monotonic())
+                    try:
+                        session = self._idle.get(timeout=remaining)
+                    except Empty:
+                        raise Exception("Timed out after {} seconds waiting for a free driver".format(timeout))
+            if self._is_healthy(session):
+                session.checkouts += 1
+                return session.driver
+            log_to_console("Discarding unhealthy driver session")
+            self._discard(session)
+
+    def checkin(self, driver):
+        """
+        Return a borrowed driver. Its state is reset, or the session is recycled
+        once it has served too many page loads or grown too large.
+        :param driver: driver obtained from checkout
+        """
+        session = self._sessions.get(id(driver))
+        if session is None:
+            raise ValueError("Driver {} does not belong to this pool".format(driver))
+        if self._closed:
+            self._discard(session)
+            return
+        try:
+            self._collect_stats(session)
+            if self._needs_recycle(session):
+                log_to_console("Recycling driver session after {} page loads ({} MB heap)".format(
+                    session.page_loads, session.heap_mb))
+                self.recycled += 1
+                self._discard(session)
+                return
+            self._reset(session)
+        except Exception as e:
+            log_to_console("Could not reset driver session due to {}".format(e))
+            self._discard(session)
+            return
+        self._idle.put(session)
+
+    @contextmanager
+    def session(self, timeout=None):
+        """
+        Context manager around checkout / checkin
+        """
+        driver = self.checkout(timeout=timeout)
+        try:
+            yield driver
+        finally:
+            self.checkin(driver)
+
+    def close(self):
+        """
+        Quit every idle session. Sessions still checked out are quit on checkin.
+        """
+        self._closed = True
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except Empty:
+                break
+            self._discard(session)
+
+    def _create_session(self):
+        with self._lock:
+            if len(self._sessions) >= self.size:
+                return None
+            # reserve the slot before the slow browser start up
+            placeholder = object()
+            self._sessions[id(placeholder)] = placeholder
+        profile = None
+        try:
+            if self.profiles is None:
+                driver = self._driver_factory()
+            else:
+                profile = self.profiles.acquire(self.browser)
+                driver = self._driver_factory(profile_dir=profile.path)
+        except Exception:
+            if profile is not None:
+                profile.unlock()
+            raise
+        finally:
+            with self._lock:
+                del self._sessions[id(placeholder)]
+        session = PooledSession(driver, profile)
+        with self._lock:
+            self._sessions[id(driver)] = session
+        return session
+
+    def _discard(self, session):
+        with self._lock:
+            self._sessions.pop(id(session.driver), None)
+        try:
+            session.driver.quit()
+        except Exception as e:
+            log_to_console("Could not quit driver session due to {}".format(e))
+        if session.profile is not None:
+            session.profile.unlock()
+
+    def _is_healthy(self, session):
+        try:
+            return session.driver.execute_script("return document.readyState") is not None
+        except Exception:
+            return False
+
+    def _collect_stats(self, session):
+        # storage of a persistent profile is kept like its cookies
+        history_length, heap = session.driver.execute_script(_SESSION_STATS_SCRIPT, session.profile is None)
+        # every reset leaves a fresh tab on about:blank with a history length of 1
+        session.page_loads += max(0, int(history_length) - 1)
+        session.heap_mb = None if heap is None else heap / (1024 * 1024)
+
+    def _needs_recycle(self, session):
+        if self.max_page_loads is not None and session.page_loads >= self.max_page_loads:
+            return True
+        if self.max_memory_mb is not None and session.heap_mb is not None \
+                and session.heap_mb >= self.max_memory_mb:
+            return True
+        return False
+
+    def _reset(self, session):
+        driver = session.driver
+        # a persistent profile is there to keep the consent cookies between searches
+        if session.profile is None:
+            if hasattr(driver, "execute_cdp_cmd"):
+                # clears cookies for every domain, not only the current one
+                driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            else:
+                driver.delete_all_cookies()
+        # a brand new tab drops the navigation history and any popups left behind
+        old_handles = driver.window_handles
+        # opened by the driver, window.open() from a script can be stopped by the popup blocker
+        driver.switch_to.new_window("tab")
+        new_handle = driver.current_window_handle
+        block_urls_in_new_tab(driver)
+        for handle in old_handles:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(new_handle)
+        driver._active_window_handle = new_handle
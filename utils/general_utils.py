@@ -1,3 +1,4 @@
+import math
 import os
 from constants.browser import SupportedBrowsers
 from constants.search_engine import SearchEngines
@@ -34,3 +35,18 @@ def get_search_engine_url(search_engine=None):
 def log_to_console(msg):
     time_now = datetime.now().isoformat().replace("T", " ")
     print(f"INFO {time_now}:--------- {msg}")
+
+
+def percentile(values, fraction):
+    """
+    Nearest rank percentile, the smallest value with at least fraction of the values at or below it
+
+    >>> percentile(range(1, 11), 0.5), percentile(range(1, 101), 0.95), percentile(range(1, 101), 0.99)
+    (5, 95, 99)
+    >>> percentile([1, 2], 0.5), percentile([7], 0.99), percentile([1, 2, 3], 0.0), percentile(range(1, 101), 0.07)
+    (1, 7, 1, 7)
+    """
+    ordered = sorted(values)
+    # rounded first, 0.07 * 100 is 7.000000000000001 in floating point
+    index = max(0, min(len(ordered) - 1, math.ceil(round(fraction * len(ordered), 9)) - 1))
+    return ordered[index]
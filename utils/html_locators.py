@@ -0,0 +1,60 @@
+"""
+Evaluate page class locators against static HTML parsed by lxml, without a browser
+"""
+
+from lxml import html
+from selenium.webdriver.common.by import By
+from utils.locator import compile_locator, Locator
+
+
+def parse_html(markup, base_url=None):
+    """
+    Parse markup into an lxml tree, links are made absolute against base_url
+    :param markup: html as str or bytes
+    :param base_url: url the markup was served from
+    :return: root element
+    """
+    root = html.fromstring(markup)
+    if base_url:
+        root.make_links_absolute(base_url, resolve_base_href=True)
+    return root
+
+
+def find_all(root, locator):
+    """
+    Find every element matching locator below root
+    :param root: lxml element
+    :param locator: Locator or "strategy@@value" string
+    :return: list of lxml elements
+    """
+    by, value = locator if isinstance(locator, Locator) else compile_locator(locator)
+    if by == By.XPATH:
+        return [node for node in root.xpath(value) if isinstance(node, html.HtmlElement)]
+    if by == By.CSS_SELECTOR:
+        return root.cssselect(value)
+    if by == By.ID:
+        return root.xpath(".//*[@id=$value]", value=value)
+    if by == By.NAME:
+        return root.xpath(".//*[@name=$value]", value=value)
+    if by == By.TAG_NAME:
+        return root.xpath(".//" + value)
+    raise ValueError("Locator strategy {} is not supported for static html".format(by))
+
+
+def find_first(root, locator):
+    """
+    :return: first element matching locator below root or None
+    """
+    if not locator:
+        return None
+    found = find_all(root, locator)
+    return found[0] if found else None
+
+
+def element_text(element):
+    """
+    Visible text of an element with whitespace collapsed, close to WebElement.text
+    """
+    if element is None:
+        return None
+    return " ".join(element.text_content().split())
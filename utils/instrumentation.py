@@ -0,0 +1,238 @@
+"""
+Opt-in latency instrumentation for PageBase and DriverClass.
+
+Every WebDriver command is timed at driver.execute, every public PageBase method that
+talks to the driver is timed by the instrumented class decorator. Time spent inside PageBase methods is split
+into WebDriver commands, hard sleeps and waiting (polling intervals of explicit waits
+and readiness checks). Enable with INSTRUMENTATION=1 or Instrumentation.enable().
+"""
+
+import functools
+import inspect
+import json
+import threading
+import time
+from settings import INSTRUMENTATION_ENABLED
+
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# PageBase methods whose whole duration is hard sleeping
+_SLEEP_METHODS = {"sleep_in_seconds"}
+# PageBase methods that only build objects or return state, they send no WebDriver command
+_LOCAL_METHODS = {"actions", "becomes", "bind_to_window", "deadline", "get_current_driver", "get_locator_by",
+                  "timing_tags"}
+
+
+class Histogram:
+    """
+    Cumulative latency histogram with Prometheus style buckets
+    """
+
+    def __init__(self, buckets=HISTOGRAM_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+        for index, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[index] += 1
+                break
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield bound, total
+
+    def to_dict(self):
+        return {"count": self.count, "sum": round(self.sum, 6), "max": round(self.max, 6),
+                "buckets": {str(bound): count for bound, count in self.cumulative()}}
+
+
+class Instrumentation:
+    """
+    Process wide latency registry
+    """
+    enabled = INSTRUMENTATION_ENABLED
+    _lock = threading.Lock()
+    _local = threading.local()
+    commands = {}
+    methods = {}
+    locators = {}
+    startup = {}
+    totals = {"command": 0.0, "wait": 0.0, "sleep": 0.0}
+    command_count = 0
+
+    @classmethod
+    def enable(cls):
+        cls.enabled = True
+
+    @classmethod
+    def disable(cls):
+        cls.enabled = False
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls.commands, cls.methods, cls.locators, cls.startup = {}, {}, {}, {}
+            cls.totals = {"command": 0.0, "wait": 0.0, "sleep": 0.0}
+            cls.command_count = 0
+
+    @classmethod
+    def _observe(cls, table, key, seconds):
+        with cls._lock:
+            histogram = table.get(key)
+            if histogram is None:
+                histogram = table[key] = Histogram()
+            histogram.observe(seconds)
+
+    @classmethod
+    def _stack(cls):
+        stack = getattr(cls._local, "stack", None)
+        if stack is None:
+            stack = cls._local.stack = []
+        return stack
+
+    @classmethod
+    def instrument_driver(cls, driver):
+        """
+        Time every command the driver sends. Safe to call more than once per driver.
+        :param driver: WebDriver object
+        :return: driver
+        """
+        if getattr(driver, "_instrumented", False):
+            return driver
+        original_execute = driver.execute
+
+        def execute(command, params=None):
+            if not cls.enabled:
+                return original_execute(command, params)
+            started = time.perf_counter()
+            try:
+                return original_execute(command, params)
+            finally:
+                cls.record_command(command, time.perf_counter() - started)
+
+        driver.execute = execute
+        driver._instrumented = True
+        return driver
+
+    @classmethod
+    def record_command(cls, command, seconds):
+        cls._observe(cls.commands, command, seconds)
+        stack = cls._stack()
+        with cls._lock:
+            cls.command_count += 1
+            if not stack:
+                cls.totals["command"] += seconds
+        if stack:
+            stack[-1][1] += seconds
+
+    @classmethod
+    def record_startup(cls, browser, seconds):
+        cls._observe(cls.startup, str(browser), seconds)
+
+    @classmethod
+    def report(cls):
+        """
+        :return: dict with per category totals and per command, method, locator and startup histograms
+        """
+        with cls._lock:
+            return {
+                "command_count": cls.command_count,
+                "totals_seconds": {name: round(value, 6) for name, value in cls.totals.items()},
+                "commands": {key: histogram.to_dict() for key, histogram in cls.commands.items()},
+                "methods": {key: histogram.to_dict() for key, histogram in cls.methods.items()},
+                "locators": {key: histogram.to_dict() for key, histogram in cls.locators.items()},
+                "startup": {key: histogram.to_dict() for key, histogram in cls.startup.items()},
+            }
+
+    @classmethod
+    def write_json(cls, path):
+        with open(path, "w", encoding="utf-8") as report_file:
+            json.dump(cls.report(), report_file, indent=2, sort_keys=True)
+
+    @classmethod
+    def write_prometheus(cls, path):
+        """
+        Write the histograms in the Prometheus text exposition format
+        """
+        lines = ["# TYPE pagebase_time_seconds_total counter"]
+        with cls._lock:
+            for category, seconds in sorted(cls.totals.items()):
+                lines.append('pagebase_time_seconds_total{{category="{}"}} {}'.format(category, seconds))
+            for metric, label, table in (("webdriver_command_seconds", "command", cls.commands),
+                                         ("pagebase_method_seconds", "method", cls.methods),
+                                         ("pagebase_locator_seconds", "locator", cls.locators),
+                                         ("driver_startup_seconds", "browser", cls.startup)):
+                lines.append("# TYPE {} histogram".format(metric))
+                for key, histogram in sorted(table.items()):
+                    labels = '{}="{}"'.format(label, _escape_label(key))
+                    for bound, count in histogram.cumulative():
+                        lines.append('{}_bucket{{{},le="{}"}} {}'.format(metric, labels, bound, count))
+                    lines.append('{}_bucket{{{},le="+Inf"}} {}'.format(metric, labels, histogram.count))
+                    lines.append("{}_sum{{{}}} {}".format(metric, labels, histogram.sum))
+                    lines.append("{}_count{{{}}} {}".format(metric, labels, histogram.count))
+        with open(path, "w", encoding="utf-8") as metrics_file:
+            metrics_file.write("\n".join(lines) + "\n")
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _timed_method(name, method):
+    parameters = list(inspect.signature(method).parameters)
+    # index into *args (without self) of the locator argument, if the method takes one
+    locator_index = parameters.index("locator") - 1 if "locator" in parameters else None
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not Instrumentation.enabled:
+            return method(self, *args, **kwargs)
+        stack = Instrumentation._stack()
+        # frame: [method, command seconds, sleep seconds]
+        frame = [name, 0.0, 0.0]
+        stack.append(frame)
+        started = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            stack.pop()
+            if name in _SLEEP_METHODS:
+                frame[2] = elapsed - frame[1]
+            Instrumentation._observe(Instrumentation.methods, name, elapsed)
+            locator = kwargs.get("locator")
+            if locator is None and locator_index is not None and len(args) > locator_index:
+                locator = args[locator_index]
+            if isinstance(locator, (str, tuple)):
+                Instrumentation._observe(Instrumentation.locators, str(locator), elapsed)
+            if stack:
+                stack[-1][1] += frame[1]
+                stack[-1][2] += frame[2]
+            else:
+                with Instrumentation._lock:
+                    Instrumentation.totals["command"] += frame[1]
+                    Instrumentation.totals["sleep"] += frame[2]
+                    Instrumentation.totals["wait"] += max(0.0, elapsed - frame[1] - frame[2])
+
+    return wrapper
+
+
+def instrumented(cls):
+    """
+    Class decorator timing every public method of cls that does driver I/O, plus sleep_in_seconds
+    """
+    for name, member in list(vars(cls).items()):
+        if name in _LOCAL_METHODS:
+            continue
+        if inspect.isfunction(member) and (not name.startswith("_") or name in _SLEEP_METHODS):
+            setattr(cls, name, _timed_method(name, member))
+    return cls
@@ -0,0 +1,296 @@
+"""
+Durable queue of search tasks in a sqlite file. A job is a named set of (engine, keyword)
+tasks; workers lease one task at a time, a crashed worker's lease simply expires and the
+task is handed out again, failed tasks are retried with exponential backoff and results
+are written once per task, so a job can be resumed at any point by starting workers again.
+
+The database uses a rollback journal instead of WAL: WAL needs shared memory between the
+processes and does not work when workers on other hosts open the file over a network
+mount. Lease times are wall clock, keep the clocks of those hosts in sync.
+"""
+
+import json
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+from settings import (JOB_QUEUE_PATH, JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS, JOB_RETRY_BACKOFF,
+                      JOB_RETRY_MAX_BACKOFF)
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    job TEXT NOT NULL,
+    engine TEXT NOT NULL,
+    keyword TEXT NOT NULL,
+    max_pages INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires_at REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL,
+    UNIQUE (job, engine, keyword)
+);
+CREATE INDEX IF NOT EXISTS tasks_ready ON tasks (job, status, available_at);
+CREATE TABLE IF NOT EXISTS results (
+    task_id INTEGER PRIMARY KEY REFERENCES tasks (id),
+    payload TEXT NOT NULL,
+    worker TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    written_at REAL NOT NULL
+);
+"""
+
+
+def worker_name():
+    """
+    Lease owner of this process, unique across the hosts sharing the queue
+    """
+    return "{}:{}".format(socket.gethostname(), os.getpid())
+
+
+class Task:
+
+    def __init__(self, task_id, job, engine, keyword, max_pages, attempts, lease_owner):
+        self.id = task_id
+        self.job = job
+        self.engine = engine
+        self.keyword = keyword
+        self.max_pages = max_pages
+        self.attempts = attempts
+        self.lease_owner = lease_owner
+
+    def __repr__(self):
+        return "Task({}, {}, {!r}, attempt {})".format(self.id, self.engine, self.keyword, self.attempts)
+
+
+class JobQueue:
+    """
+    Usage:
+        queue = JobQueue()
+        queue.enqueue("nightly", "google", keywords)
+        task = queue.lease(worker_name())
+        queue.complete(task, [result.to_dict() for result in results], seconds)
+    """
+
+    def __init__(self, path=JOB_QUEUE_PATH, lease_seconds=JOB_LEASE_SECONDS, max_attempts=JOB_MAX_ATTEMPTS,
+                 retry_backoff=JOB_RETRY_BACKOFF, max_backoff=JOB_RETRY_MAX_BACKOFF):
+        """
+        :param path: sqlite database file, may live on a network mount
+        :param lease_seconds: seconds a worker owns a task before it is handed out again
+        :param max_attempts: attempts before a task is marked failed
+        :param retry_backoff: seconds before the first retry, doubled with every attempt
+        :param max_backoff: upper bound of the retry delay
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self._local = threading.local()
+
+    def _connection(self):
+        # sqlite connections must not cross threads or a fork, so keep one per thread and pid
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=DELETE")
+            connection.execute("PRAGMA synchronous=FULL")
+            connection.executescript(_SCHEMA)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _write(self, statements):
+        """
+        Run statements(connection) in one write transaction
+        """
+        connection = self._connection()
+        # take the write lock up front, a deferred transaction can deadlock on the upgrade
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            result = statements(connection)
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return result
+
+    def enqueue(self, job, engine, keywords, max_pages=1):
+        """
+        Add tasks to job, keywords already in the job are skipped so enqueueing can be repeated
+        :param job: job name
+        :param engine: SearchEngines member name
+        :param keywords: iterable of keywords
+        :param max_pages: result pages per keyword
+        :return: number of tasks added
+        """
+        now = time.time()
+        rows = [(job, engine, keyword.strip(), max_pages, PENDING, now, now) for keyword in keywords if keyword.strip()]
+
+        def insert(connection):
+            before = connection.total_changes
+            connection.executemany("INSERT OR IGNORE INTO tasks (job, engine, keyword, max_pages, status, "
+                                   "available_at, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            return connection.total_changes - before
+
+        return self._write(insert)
+
+    def lease(self, owner, job=None):
+        """
+        Lease the next ready task, including tasks whose previous lease expired
+        :param owner: lease owner, see worker_name
+        :param job: only lease tasks of this job
+        :return: Task or None when no task is ready
+        """
+        now = time.time()
+
+        def take(connection):
+            # a task whose worker crashed or hung on every attempt never reaches fail(), it gives up here
+            connection.execute("UPDATE tasks SET status=?, finished_at=?, lease_owner=NULL, lease_expires_at=NULL, "
+                               "last_error=COALESCE(last_error, ?) WHERE status=? AND lease_expires_at<? "
+                               "AND attempts>=?", (FAILED, now, "lease expired on every attempt", LEASED, now,
+                                                   self.max_attempts))
+            query = ("SELECT id, job, engine, keyword, max_pages, attempts FROM tasks "
+                     "WHERE ((status=? AND available_at<=?) OR (status=? AND lease_expires_at<? AND attempts<?))")
+            parameters = [PENDING, now, LEASED, now, self.max_attempts]
+            if job is not None:
+                query += " AND job=?"
+                parameters.append(job)
+            row = connection.execute(query + " ORDER BY available_at, id LIMIT 1", parameters).fetchone()
+            if row is None:
+                return None
+            connection.execute("UPDATE tasks SET status=?, attempts=attempts+1, lease_owner=?, lease_expires_at=? "
+                               "WHERE id=?", (LEASED, owner, now + self.lease_seconds, row[0]))
+            return Task(row[0], row[1], row[2], row[3], row[4], row[5] + 1, owner)
+
+        return self._write(take)
+
+    def extend_lease(self, task):
+        """
+        Keep a long running task
+        :return: False when the lease was lost to another worker
+        """
+        def extend(connection):
+            cursor = connection.execute("UPDATE tasks SET lease_expires_at=? WHERE id=? AND status=? AND lease_owner=?",
+                                        (time.time() + self.lease_seconds, task.id, LEASED, task.lease_owner))
+            return cursor.rowcount == 1
+
+        return self._write(extend)
+
+    def complete(self, task, results, seconds):
+        """
+        Store the results of task and mark it done. Writing the results of a task twice, e.g.
+        after its lease expired and another worker finished it as well, keeps the first write.
+        :param results: list of result dicts
+        :param seconds: duration of the search
+        """
+        now = time.time()
+
+        def finish(connection):
+            connection.execute("INSERT OR IGNORE INTO results VALUES (?, ?, ?, ?, ?)",
+                               (task.id, json.dumps(results, separators=(",", ":")), task.lease_owner, seconds, now))
+            connection.execute("UPDATE tasks SET status=?, finished_at=?, lease_owner=NULL, lease_expires_at=NULL, "
+                               "last_error=NULL WHERE id=? AND status!=?", (DONE, now, task.id, DONE))
+
+        self._write(finish)
+
+    def fail(self, task, error):
+        """
+        Schedule a retry of task with exponential backoff, or mark it failed after max_attempts
+        :param error: error message
+        :return: True when the task will be retried, False when it failed for good or the lease was lost
+        """
+        now = time.time()
+        retry = task.attempts < self.max_attempts
+        delay = min(self.max_backoff, self.retry_backoff * 2 ** (task.attempts - 1))
+        # jitter keeps tasks failing together from being retried together
+        delay *= random.uniform(0.5, 1.0)
+
+        def reschedule(connection):
+            cursor = connection.execute("UPDATE tasks SET status=?, available_at=?, finished_at=?, lease_owner=NULL, "
+                                        "lease_expires_at=NULL, last_error=? WHERE id=? AND status=? AND lease_owner=?",
+                                        (PENDING if retry else FAILED, now + delay, None if retry else now,
+                                         str(error), task.id, LEASED, task.lease_owner))
+            return cursor.rowcount == 1
+
+        # the lease was lost to another worker, which decides about the task now
+        return self._write(reschedule) and retry
+
+    def retry_failed(self, job):
+        """
+        Give every failed task of job a fresh set of attempts
+        :return: number of tasks queued again
+        """
+        def requeue(connection):
+            return connection.execute("UPDATE tasks SET status=?, attempts=0, available_at=?, finished_at=NULL "
+                                      "WHERE job=? AND status=?", (PENDING, time.time(), job, FAILED)).rowcount
+
+        return self._write(requeue)
+
+    def is_finished(self, job=None):
+        """
+        :return: True when no task of job is pending or leased any more
+        """
+        query = "SELECT COUNT(*) FROM tasks WHERE status IN (?, ?)"
+        parameters = [PENDING, LEASED]
+        if job is not None:
+            query += " AND job=?"
+            parameters.append(job)
+        return self._connection().execute(query, parameters).fetchone()[0] == 0
+
+    def results(self, job):
+        """
+        :return: generator of dicts with engine, keyword and the results of every finished task of job
+        """
+        rows = self._connection().execute(
+            "SELECT tasks.engine, tasks.keyword, results.payload, results.worker, results.seconds FROM results "
+            "JOIN tasks ON tasks.id = results.task_id WHERE tasks.job=? ORDER BY tasks.id", (job,))
+        for engine, keyword, payload, worker, seconds in rows:
+            yield {"engine": engine, "keyword": keyword, "worker": worker, "seconds": seconds,
+                   "results": json.loads(payload)}
+
+    def report(self, job=None, window=60):
+        """
+        :param job: report on this job only
+        :param window: seconds over which the recent throughput is measured
+        :return: task counts per status, queue depth and throughput
+        """
+        now = time.time()
+        condition, parameters = ("WHERE job=?", [job]) if job is not None else ("", [])
+        connection = self._connection()
+        counts = dict(connection.execute("SELECT status, COUNT(*) FROM tasks {} GROUP BY status".format(condition),
+                                         parameters).fetchall())
+        ready, retrying, expired = connection.execute(
+            "SELECT SUM(status=? AND available_at<=?), SUM(status=? AND available_at>? AND attempts>0), "
+            "SUM(status=? AND lease_expires_at<?) FROM tasks {}".format(condition),
+            [PENDING, now, PENDING, now, LEASED, now] + parameters).fetchone()
+        first_finished, last_finished, recent = connection.execute(
+            "SELECT MIN(finished_at), MAX(finished_at), SUM(finished_at>=?) FROM tasks {} {} status=?".format(
+                condition, "AND" if condition else "WHERE"), [now - window] + parameters + [DONE]).fetchone()
+        done = counts.get(DONE, 0)
+        elapsed = (last_finished - first_finished) if done > 1 else 0
+        return {
+            "pending": counts.get(PENDING, 0),
+            "leased": counts.get(LEASED, 0),
+            "done": done,
+            "failed": counts.get(FAILED, 0),
+            "queue_depth": ready or 0,
+            "retrying": retrying or 0,
+            "expired_leases": expired or 0,
+            "tasks_per_minute": round((recent or 0) * 60 / window, 2),
+            "overall_tasks_per_minute": round((done - 1) * 60 / elapsed, 2) if elapsed else None,
+        }
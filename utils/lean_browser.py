@@ -0,0 +1,128 @@
+"""
+Lean browser profile for scraping: headless, eager page load strategy and no images,
+fonts, media or third party trackers. Chrome blocks requests through the DevTools
+protocol and reports them in its performance log, which LeanStats turns into blocked
+request counts and an estimate of the bytes saved.
+"""
+
+import json
+import threading
+from utils.general_utils import log_to_console
+from settings import LEAN_BLOCKED_URL_PATTERNS, LEAN_ESTIMATED_BYTES
+
+_FIREFOX_LEAN_PREFERENCES = {
+    "permissions.default.image": 2,
+    "gfx.downloadable_fonts.enabled": False,
+    "media.autoplay.default": 5,
+    "media.play-stand-alone": False,
+    "browser.cache.disk.enable": True,
+}
+
+
+def lean_chrome_options(chrome_options):
+    """
+    Switch chrome options to the lean profile
+    :param chrome_options: webdriver.ChromeOptions
+    """
+    chrome_options.add_argument("--headless=new")
+    chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+    chrome_options.add_argument("--mute-audio")
+    chrome_options.add_argument("--disable-extensions")
+    chrome_options.set_capability("pageLoadStrategy", "eager")
+    # blocked requests show up as Network.loadingFailed events in the performance log
+    chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    return chrome_options
+
+
+def lean_firefox_options(firefox_options):
+    """
+    Switch firefox options to the lean profile. Firefox has no request blocking by url
+    pattern, so only images, fonts and media are switched off.
+    :param firefox_options: webdriver.FirefoxOptions
+    """
+    firefox_options.add_argument("-headless")
+    firefox_options.set_capability("pageLoadStrategy", "eager")
+    for name, value in _FIREFOX_LEAN_PREFERENCES.items():
+        firefox_options.set_preference(name, value)
+    return firefox_options
+
+
+def block_urls(driver, patterns=None):
+    """
+    Block requests matching the url patterns in the current tab of a chrome session.
+    Network.setBlockedURLs only applies to the tab it is sent to, the patterns are kept on
+    the driver so block_urls_in_new_tab can apply them to every tab opened later.
+    :param driver: chrome driver
+    :param patterns: url patterns with * wildcards, defaults to LEAN_BLOCKED_URL_PATTERNS
+    """
+    driver._blocked_url_patterns = list(patterns or LEAN_BLOCKED_URL_PATTERNS)
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": driver._blocked_url_patterns})
+
+
+def block_urls_in_new_tab(driver):
+    """
+    Apply the blocked url patterns of driver to the tab it just switched to, does nothing for a
+    driver block_urls was never called on. Call it after every switch_to.new_window.
+    :param driver: WebDriver object
+    """
+    patterns = getattr(driver, "_blocked_url_patterns", None)
+    if patterns is not None:
+        block_urls(driver, patterns)
+
+
+class LeanStats:
+    """
+    Process wide totals of requests blocked by the lean profile
+    """
+    _lock = threading.Lock()
+    collections = 0
+    blocked_requests = 0
+    blocked_by_type = {}
+    bytes_saved_estimate = 0
+    transferred_bytes = 0
+
+    @classmethod
+    def collect(cls, driver):
+        """
+        Drain the chrome performance log of driver into the totals. Call it once per query,
+        the log is buffered by chromedriver until it is read.
+        :return: dict with the blocked requests and transferred bytes of this collection
+        """
+        try:
+            entries = driver.get_log("performance")
+        except Exception as e:
+            log_to_console("Could not read the performance log due to {}".format(e))
+            return None
+        blocked = {}
+        transferred = 0
+        for entry in entries:
+            message = json.loads(entry["message"])["message"]
+            params = message.get("params", {})
+            if message["method"] == "Network.loadingFailed" and params.get("blockedReason"):
+                resource_type = params.get("type", "Other")
+                blocked[resource_type] = blocked.get(resource_type, 0) + 1
+            elif message["method"] == "Network.loadingFinished":
+                transferred += int(params.get("encodedDataLength", 0))
+        saved = sum(count * LEAN_ESTIMATED_BYTES.get(resource_type, LEAN_ESTIMATED_BYTES["Other"])
+                    for resource_type, count in blocked.items())
+        with cls._lock:
+            cls.collections += 1
+            cls.blocked_requests += sum(blocked.values())
+            for resource_type, count in blocked.items():
+                cls.blocked_by_type[resource_type] = cls.blocked_by_type.get(resource_type, 0) + count
+            cls.bytes_saved_estimate += saved
+            cls.transferred_bytes += transferred
+        return {"blocked_requests": sum(blocked.values()), "bytes_saved_estimate": saved,
+                "transferred_bytes": transferred}
+
+    @classmethod
+    def report(cls):
+        with cls._lock:
+            return {
+                "collections": cls.collections,
+                "blocked_requests": cls.blocked_requests,
+                "blocked_by_type": dict(cls.blocked_by_type),
+                "bytes_saved_estimate": cls.bytes_saved_estimate,
+                "transferred_bytes": cls.transferred_bytes,
+            }
@@ -0,0 +1,224 @@
+"""
+Locators in the "strategy@@value" notation compiled into immutable By tuples.
+Page classes get their locator attributes compiled once when the class is defined,
+see PageBase.__init_subclass__.
+"""
+
+import re
+import threading
+from enum import Enum
+from functools import lru_cache
+from selenium.webdriver.common.by import By
+
+LOCATOR_SEPARATOR = "@@"
+
+
+class Strategy(Enum):
+    """
+    Locator Strategy Constants
+    """
+    XPATH = "xpath"
+    ID = "id"
+    CSS = "css"
+    TAGNAME = "tag name"
+    NAME = "name"
+
+
+_STRATEGY_TO_BY = {
+    Strategy.XPATH.value: By.XPATH,
+    Strategy.ID.value: By.ID,
+    Strategy.CSS.value: By.CSS_SELECTOR,
+    Strategy.TAGNAME.value: By.TAG_NAME,
+    Strategy.NAME.value: By.NAME,
+}
+_BY_TO_STRATEGY = {by: strategy for strategy, by in _STRATEGY_TO_BY.items()}
+
+
+class Locator(tuple):
+    """
+    Immutable (By, value) pair, usable wherever selenium expects a locator tuple
+    """
+    __slots__ = ()
+
+    def __new__(cls, by, value):
+        if by not in _BY_TO_STRATEGY:
+            raise ValueError("Unsupported locator strategy {} for locator {}".format(by, value))
+        return tuple.__new__(cls, (by, value))
+
+    @property
+    def by(self):
+        return self[0]
+
+    @property
+    def value(self):
+        return self[1]
+
+    @property
+    def stats(self):
+        """
+        Lookup statistics collected for this locator
+        """
+        return LocatorStats.for_locator(self)
+
+    def __str__(self):
+        return _BY_TO_STRATEGY[self[0]] + LOCATOR_SEPARATOR + self[1]
+
+    def __repr__(self):
+        return "Locator({!r})".format(str(self))
+
+
+@lru_cache(maxsize=1024)
+def compile_locator(locator_with_strategy):
+    """
+    Parse a "strategy@@value" string into a Locator, values without a strategy are ids
+    :param locator_with_strategy: Element locator strategy
+    :return: Locator
+    """
+    if LOCATOR_SEPARATOR not in locator_with_strategy:
+        return Locator(By.ID, locator_with_strategy)
+    strategy, locator = locator_with_strategy.split(LOCATOR_SEPARATOR, 1)
+    by = _STRATEGY_TO_BY.get(strategy)
+    if by is None:
+        raise ValueError(
+            " Incorrect locator specified . Locator has to be either xpath,id,css,tagname -->" + locator_with_strategy)
+    return Locator(by, locator)
+
+
+def compile_class_locators(cls):
+    """
+    Replace every "strategy@@value" string attribute declared on cls by its Locator
+    :param cls: page class
+    """
+    for name, value in list(vars(cls).items()):
+        if isinstance(value, str) and LOCATOR_SEPARATOR in value:
+            try:
+                setattr(cls, name, compile_locator(value))
+            except ValueError as e:
+                raise ValueError("Invalid locator {}.{}: {}".format(cls.__name__, name, e)) from None
+
+
+_XPATH_STEP = re.compile(r"(?P<tag>\*|[A-Za-z][\w-]*)(?P<predicates>(?:\[[^\]]*\])*)$")
+_XPATH_PREDICATE = re.compile(
+    r"\[\s*(?:@(?P<attribute>[\w-]+)(?:\s*=\s*(?P<quote>['\"])(?P<value>.*?)(?P=quote))?"
+    r"|(?P<function>contains|starts-with)\(\s*@(?P<function_attribute>[\w-]+)\s*,\s*"
+    r"(?P<function_quote>['\"])(?P<function_value>.*?)(?P=function_quote)\s*\))\s*\]")
+_CSS_IDENTIFIER = re.compile(r"-?[A-Za-z_][\w-]*$")
+
+
+def _split_union(xpath):
+    paths, depth, quote, start = [], 0, None, 0
+    for index, char in enumerate(xpath):
+        if quote:
+            quote = None if char == quote else quote
+        elif char in "'\"":
+            quote = char
+        elif char in "[(":
+            depth += 1
+        elif char in "])":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            paths.append(xpath[start:index])
+            start = index + 1
+    return paths + [xpath[start:]]
+
+
+def _css_string(value):
+    return '"{}"'.format(value.replace("\\", "\\\\").replace('"', '\\"'))
+
+
+def _step_to_css(step, exact_class):
+    match = _XPATH_STEP.match(step.strip())
+    if match is None:
+        raise ValueError("step {!r} has no CSS equivalent".format(step))
+    css = "" if match.group("tag") == "*" else match.group("tag")
+    predicates = match.group("predicates")
+    position = 0
+    for predicate in _XPATH_PREDICATE.finditer(predicates):
+        if predicate.start() != position:
+            break
+        position = predicate.end()
+        attribute, value = predicate.group("attribute"), predicate.group("value")
+        if predicate.group("function"):
+            operator = "*=" if predicate.group("function") == "contains" else "^="
+            css += "[{}{}{}]".format(predicate.group("function_attribute"), operator,
+                                     _css_string(predicate.group("function_value")))
+        elif value is None:
+            css += "[{}]".format(attribute)
+        elif attribute == "class" and not exact_class and value.split() \
+                and all(_CSS_IDENTIFIER.match(token) for token in value.split()):
+            css += "".join("." + token for token in value.split())
+        elif attribute == "id" and _CSS_IDENTIFIER.match(value):
+            css += "#" + value
+        else:
+            css += "[{}={}]".format(attribute, _css_string(value))
+    if position != len(predicates):
+        raise ValueError("predicate {!r} has no CSS equivalent".format(predicates[position:]))
+    return css or "*"
+
+
+def _path_to_css(path, exact_class):
+    path = path.strip()
+    relative = path.startswith(".")
+    if relative:
+        path = path[1:]
+    if not path.startswith("//") and not relative:
+        raise ValueError("paths from the document root have no CSS equivalent")
+    parts = re.split(r"(//?)", path)[1:]
+    css = ""
+    for axis, step in zip(parts[0::2], parts[1::2]):
+        if css:
+            css += " > " if axis == "/" else " "
+        elif relative and axis == "/":
+            css = ":scope > "
+        css += _step_to_css(step, exact_class)
+    return css
+
+
+def xpath_to_css(xpath, exact_class=False):
+    """
+    Translate the common subset of XPath used by page classes into a CSS selector: descendant
+    and child steps, tag names and predicates on attributes, contains and starts-with.
+    Paths relative to an element ("./a", ".//h3") translate to selectors for querySelectorAll
+    on that element.
+    :param xpath: XPath expression
+    :param exact_class: keep @class='a b' an exact attribute match instead of the class
+        selector .a.b, which also matches elements with more classes
+    :return: CSS selector
+    :raises ValueError: when the expression has no CSS equivalent, e.g. parent steps or text()
+    """
+    return ", ".join(_path_to_css(path, exact_class) for path in _split_union(xpath))
+
+
+class LocatorStats:
+    """
+    Per locator lookup counters
+    """
+    _registry = {}
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.lookups = 0
+        self.failures = 0
+        self.seconds = 0.0
+
+    def record(self, seconds, failed=False):
+        self.lookups += 1
+        self.failures += 1 if failed else 0
+        self.seconds += seconds
+
+    @classmethod
+    def for_locator(cls, locator):
+        stats = cls._registry.get(locator)
+        if stats is None:
+            with cls._lock:
+                stats = cls._registry.setdefault(locator, cls())
+        return stats
+
+    @classmethod
+    def report(cls):
+        """
+        :return: dict of locator string to lookups, failures and seconds
+        """
+        return {str(locator): {"lookups": stats.lookups, "failures": stats.failures,
+                               "seconds": round(stats.seconds, 4)}
+                for locator, stats in list(cls._registry.items())}
@@ -0,0 +1,65 @@
+"""
+Push based element waits. A DOM mutation observer installed by a single async script
+resolves as soon as the locator is present, visible or clickable, instead of polling
+the driver every 500 ms. Drivers that can not run async scripts fall back to polling.
+"""
+
+from selenium.common.exceptions import WebDriverException
+from utils.page_scripts import WAIT_FOR_ELEMENT
+
+WAIT_CONDITIONS = ("present", "visible", "clickable")
+
+# error fragments of drivers that do not implement async scripts at all (e.g. WinAppDriver)
+_UNSUPPORTED_ERRORS = ("unknown command", "not implemented", "not supported", "unsupported")
+
+# extra seconds the driver script timeout allows on top of the in page timeout
+_SCRIPT_TIMEOUT_MARGIN = 2
+
+
+class MutationWaitUnavailable(Exception):
+    """
+    Raised when the wait could not run in the page and the caller has to poll instead
+    """
+
+
+class MutationWait:
+    """
+    Usage:
+        element = MutationWait(driver).until((By.NAME, "q"), "clickable", timeout=5)
+    """
+
+    def __init__(self, driver):
+        self._driver = driver
+
+    @staticmethod
+    def is_supported(driver):
+        return getattr(driver, "_mutation_waits_supported", True) \
+            and getattr(driver, "execute_async_script", None) is not None
+
+    def until(self, locator_by, condition, timeout):
+        """
+        Wait in the page till locator_by matches condition
+        :param locator_by: (By, value) tuple
+        :param condition: one of WAIT_CONDITIONS
+        :param timeout: seconds
+        :return: the element or None on timeout
+        """
+        if condition not in WAIT_CONDITIONS:
+            raise ValueError("Wait condition has to be one of {}, got {}".format(WAIT_CONDITIONS, condition))
+        if not self.is_supported(self._driver):
+            raise MutationWaitUnavailable("Driver does not support async scripts")
+        by, value = locator_by
+        try:
+            self._ensure_script_timeout(timeout + _SCRIPT_TIMEOUT_MARGIN)
+            return self._driver.execute_async_script(WAIT_FOR_ELEMENT, by, value, condition, int(timeout * 1000))
+        except WebDriverException as e:
+            if any(fragment in str(e).lower() for fragment in _UNSUPPORTED_ERRORS):
+                self._driver._mutation_waits_supported = False
+            # e.g. the document unloaded during the wait, polling takes over for this call
+            raise MutationWaitUnavailable(str(e))
+
+    def _ensure_script_timeout(self, seconds):
+        # the script timeout is a session setting, only raise it when a longer wait needs it
+        if getattr(self._driver, "_script_timeout", 0) < seconds:
+            self._driver.set_script_timeout(seconds)
+            self._driver._script_timeout = seconds
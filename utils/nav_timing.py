@@ -0,0 +1,135 @@
+"""
+Browser side timing of page loads. With NAV_TIMING=1 every page load of a page object
+appends the Navigation / Resource Timing of the document, split into phases (dns, connect,
+tls, ttfb, download, dom processing, load) and tagged with engine and keyword, as one JSON
+line to NAV_TIMING_LOG. This tells slow DNS or a slow search engine apart from heavy
+rendering, which the client side timers of utils.instrumentation can not.
+
+Percentiles per engine and phase:
+    python -m utils.nav_timing summary
+    python -m utils.nav_timing summary --engine google --log nav_timing.jsonl
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from utils.general_utils import log_to_console, percentile
+from utils.page_scripts import NAVIGATION_TIMING
+from settings import NAV_TIMING_ENABLED, NAV_TIMING_LOG
+
+PHASES = ("redirect", "dns", "connect", "tls", "ttfb", "download", "dom_processing", "dom_content_loaded", "load")
+PERCENTILES = (0.5, 0.9, 0.99)
+
+
+class NavigationTiming:
+    """
+    Usage:
+        NavigationTiming.capture(driver, {"engine": "google", "keyword": "selenium"})
+    """
+    enabled = NAV_TIMING_ENABLED
+    _lock = threading.Lock()
+
+    @classmethod
+    def enable(cls):
+        cls.enabled = True
+
+    @classmethod
+    def disable(cls):
+        cls.enabled = False
+
+    @classmethod
+    def capture(cls, driver, tags, path=NAV_TIMING_LOG):
+        """
+        Read the timing of the document shown by driver and append it to the log
+        :param driver: WebDriver object
+        :param tags: dict stored with the timing, e.g. engine, keyword and page
+        :param path: append only JSON lines log
+        :return: the logged record, None when the browser did not report a timing
+        """
+        try:
+            timing = driver.execute_script(NAVIGATION_TIMING)
+            url = driver.current_url
+        except Exception as e:
+            log_to_console("Could not read the navigation timing due to {}".format(e))
+            return None
+        if not timing:
+            return None
+        record = dict(tags, url=url, at=round(time.time(), 3), **timing)
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # a single write to a file opened for appending keeps the lines of concurrent workers whole
+        with cls._lock, open(path, "a", encoding="utf-8") as log:
+            log.write(line)
+        return record
+
+
+def read_log(path=NAV_TIMING_LOG):
+    """
+    :return: generator of timing records, skipping a torn last line
+    """
+    with open(path, encoding="utf-8") as log:
+        for line in log:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def summarize(records, group_by="engine"):
+    """
+    :param records: timing records from read_log
+    :param group_by: tag the records are grouped by
+    :return: dict of group to phase to count and percentiles in ms
+    """
+    values = {}
+    for record in records:
+        phases = values.setdefault(record.get(group_by) or "-", {})
+        for phase in PHASES:
+            if record.get(phase) is not None:
+                phases.setdefault(phase, []).append(record[phase])
+    return {group: {phase: dict({"count": len(samples)},
+                                **{"p{}".format(int(fraction * 100)): percentile(samples, fraction)
+                                   for fraction in PERCENTILES})
+                    for phase, samples in phases.items()}
+            for group, phases in values.items()}
+
+
+def print_summary(summary, stream=sys.stdout):
+    columns = ["p{}".format(int(fraction * 100)) for fraction in PERCENTILES]
+    for group, phases in sorted(summary.items()):
+        stream.write("{}\n".format(group))
+        stream.write("  {:<20}{:>8}".format("phase (ms)", "count") + "".join("{:>10}".format(c) for c in columns) + "\n")
+        for phase in PHASES:
+            if phase in phases:
+                stream.write("  {:<20}{:>8}".format(phase, phases[phase]["count"])
+                             + "".join("{:>10}".format(phases[phase][c]) for c in columns) + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser("summary", help="percentiles per phase")
+    command.add_argument("--log", default=NAV_TIMING_LOG)
+    command.add_argument("--engine", help="only summarize this engine")
+    command.add_argument("--group-by", default="engine", help="tag to group by, e.g. engine, keyword or page")
+    command.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    records = read_log(args.log)
+    if args.engine:
+        records = (record for record in records if record.get("engine") == args.engine)
+    summary = summarize(records, group_by=args.group_by)
+    if args.json:
+        print(json.dumps(summary, indent=2, sort_keys=True))
+    else:
+        print_summary(summary)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
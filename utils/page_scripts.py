@@ -0,0 +1,167 @@
+# JavaScript snippets executed inside the browser through execute_script
+# Locators are passed in as the (By, value) pair returned by PageBase.get_locator_by
+
+FIND_ALL_FUNCTION = """
+function findAll(root, by, value) {
+    var found = [];
+    if (by === 'xpath') {
+        var snapshot = document.evaluate(value, root, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        for (var i = 0; i < snapshot.snapshotLength; i++) {
+            found.push(snapshot.snapshotItem(i));
+        }
+        return found;
+    }
+    var selector = value;
+    if (by === 'id') {
+        selector = '[id="' + CSS.escape(value) + '"]';
+    } else if (by === 'name') {
+        selector = '[name="' + CSS.escape(value) + '"]';
+    }
+    return Array.prototype.slice.call(root.querySelectorAll(selector));
+}
+"""
+
+# arguments: results by, results value, then (by, value) for title, url and description
+BULK_EXTRACT_RESULTS = FIND_ALL_FUNCTION + """
+var args = arguments;
+function firstChild(root, by, value) {
+    if (!by) { return null; }
+    var children = findAll(root, by, value);
+    return children.length ? children[0] : null;
+}
+function text(element) {
+    if (!element) { return null; }
+    return (element.innerText || element.textContent || '').trim();
+}
+return findAll(document, args[0], args[1]).map(function (result) {
+    var link = firstChild(result, args[4], args[5]);
+    return {
+        title: text(firstChild(result, args[2], args[3])),
+        url: link ? (link.href || link.getAttribute('href')) : null,
+        description: text(firstChild(result, args[6], args[7]))
+    };
+});
+"""
+
+# arguments: (By, value) of the link to the next page
+# navigates asynchronously so the caller can keep working while the page loads
+PREFETCH_NEXT_PAGE = FIND_ALL_FUNCTION + """
+var links = findAll(document, arguments[0], arguments[1]);
+if (!links.length || !links[0].href) { return null; }
+var href = links[0].href;
+window.__prefetchStarted = true;
+setTimeout(function () { window.location.href = href; }, 0);
+return href;
+"""
+
+PREFETCH_DONE = """
+return !window.__prefetchStarted && document.readyState !== 'loading';
+"""
+
+# async script, arguments: (By, value), condition (present, visible or clickable), timeout in ms, callback
+# resolves with the first matching element as soon as a DOM mutation makes it match, or null on timeout
+WAIT_FOR_ELEMENT = FIND_ALL_FUNCTION + """
+var by = arguments[0], value = arguments[1], condition = arguments[2], timeoutMs = arguments[3];
+var done = arguments[arguments.length - 1];
+function visible(element) {
+    var style = window.getComputedStyle(element);
+    var rect = element.getBoundingClientRect();
+    return style.visibility !== 'hidden' && style.display !== 'none' && (rect.width > 0 || rect.height > 0);
+}
+function matching() {
+    var found = findAll(document, by, value);
+    for (var i = 0; i < found.length; i++) {
+        var element = found[i];
+        if (condition === 'present') { return element; }
+        if (visible(element) && (condition === 'visible' || !element.disabled)) { return element; }
+    }
+    return null;
+}
+var element = matching();
+if (element) { done(element); return; }
+var finished = false, timer = null;
+var observer = new MutationObserver(function () {
+    var element = matching();
+    if (element) { finish(element); }
+});
+function finish(result) {
+    if (finished) { return; }
+    finished = true;
+    observer.disconnect();
+    clearTimeout(timer);
+    done(result);
+}
+observer.observe(document, {childList: true, subtree: true, attributes: true});
+timer = setTimeout(function () { finish(null); }, timeoutMs);
+"""
+
+# arguments: url, navigates the current tab without waiting for the load
+NAVIGATE_WITHOUT_WAITING = """
+window.__navigationPending = true;
+window.location.href = arguments[0];
+"""
+
+# arguments: (By, value) of the element the loaded page has to contain
+# returns [loaded, found], the pending marker only disappears with the new document
+LOAD_STATE = FIND_ALL_FUNCTION + """
+var loaded = !window.__navigationPending && document.readyState === 'complete';
+return [loaded, loaded && findAll(document, arguments[0], arguments[1]).length > 0];
+"""
+
+# Navigation and Resource Timing of the current document in milliseconds, phases that did not
+# happen yet (e.g. the load event on an eager page load) are null
+NAVIGATION_TIMING = """
+var nav = performance.getEntriesByType ? performance.getEntriesByType('navigation')[0] : null;
+if (!nav) {
+    var legacy = performance.timing, origin = legacy.navigationStart;
+    nav = {};
+    for (var key in legacy) {
+        if (typeof legacy[key] === 'number') { nav[key] = legacy[key] ? legacy[key] - origin : 0; }
+    }
+    nav.startTime = 0;
+    nav.duration = nav.loadEventEnd;
+}
+function span(start, end) {
+    return (nav[start] > 0 || start === 'startTime') && nav[end] > 0 ? Math.round(nav[end] - nav[start]) : null;
+}
+var resources = performance.getEntriesByType ? performance.getEntriesByType('resource') : [];
+var byType = {}, slowest = 0, resourceBytes = 0;
+resources.forEach(function (entry) {
+    var type = entry.initiatorType || 'other';
+    byType[type] = (byType[type] || 0) + 1;
+    slowest = Math.max(slowest, entry.duration);
+    resourceBytes += entry.transferSize || 0;
+});
+return {
+    redirect: span('redirectStart', 'redirectEnd'),
+    dns: span('domainLookupStart', 'domainLookupEnd'),
+    connect: span('connectStart', 'connectEnd'),
+    tls: nav.secureConnectionStart > 0 ? span('secureConnectionStart', 'connectEnd') : null,
+    ttfb: span('requestStart', 'responseStart'),
+    download: span('responseStart', 'responseEnd'),
+    dom_processing: span('responseEnd', 'domInteractive'),
+    dom_content_loaded: span('startTime', 'domContentLoadedEventEnd'),
+    load: span('startTime', 'loadEventEnd'),
+    transfer_bytes: nav.transferSize || null,
+    resources: resources.length,
+    resource_bytes: resourceBytes,
+    resources_by_type: byType,
+    slowest_resource: Math.round(slowest)
+};
+"""
+
+# arguments: (By, value) to time, (By, value) of the elements it is relative to or nulls, iterations
+# returns [milliseconds per evaluation, matched elements]
+LOCATOR_BENCHMARK = FIND_ALL_FUNCTION + """
+var by = arguments[0], value = arguments[1], iterations = arguments[4];
+var roots = arguments[2] ? findAll(document, arguments[2], arguments[3]) : [document];
+function evaluate() {
+    var found = [];
+    for (var i = 0; i < roots.length; i++) { found = found.concat(findAll(roots[i], by, value)); }
+    return found;
+}
+var matches = evaluate();
+var started = performance.now();
+for (var i = 0; i < iterations; i++) { evaluate(); }
+return [(performance.now() - started) / iterations, matches];
+"""
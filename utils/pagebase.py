@@ -4,45 +4,171 @@ This is the base class that all the classes representing various pages
 of application inherit from. This class contains all selenium actions.
 """
 
-from enum import Enum
-from time import sleep
+from contextlib import contextmanager
+from time import perf_counter, sleep
 from selenium.common.exceptions import NoAlertPresentException
 from selenium.common.exceptions import TimeoutException
-from selenium.webdriver import ActionChains
-from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import Select
 from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support.wait import POLL_FREQUENCY
 from selenium.webdriver.remote.webelement import WebElement
-from settings import GLOBAL_TIMEOUT
-
-
+from utils.action_macro import ActionMacro
+from utils.cassette import is_replay
+from utils.instrumentation import Instrumentation, instrumented
+from utils.deadline import Deadline
+from utils.mutation_wait import MutationWait, MutationWaitUnavailable
+from utils.nav_timing import NavigationTiming
+from utils.locator import Locator, LocatorStats, Strategy, compile_class_locators, compile_locator
+from utils.readiness import PageReadiness, ReadinessStats
+from settings import (ACTION_POINTER_DURATION, ACTION_TIMEOUT, GLOBAL_TIMEOUT, REPLAY_POLL_INTERVAL, USE_FIXED_SLEEPS,
+                      WAIT_BACKEND)
+
+
+@instrumented
 class PageBase(object):
     """
     Base Class for web related operations using Selenium WebDriver
     """
+    _deadline = None
+    _window_handle = None
+
+    def __init_subclass__(cls, **kwargs):
+        """
+        Compile the "strategy@@value" locators declared on page classes once, at import time
+        """
+        super().__init_subclass__(**kwargs)
+        compile_class_locators(cls)
 
-    def __init__(self, driver, url):
+    def __init__(self, driver, url, window_handle=None):
         """
         Provides webdriver instance to the classes inheriting it
         :param browser_type: browser, e.g. IE, Firefox, Chrome
         :param driver: WebDriver object
+        :param window_handle: bind the page to this tab, commands switch to it when needed
         """
         self._driver = driver
+        self._window_handle = window_handle
+        if Instrumentation.enabled:
+            Instrumentation.instrument_driver(driver)
         if url:
             self.open(url)
 
-    def open(self, url, wait_time=2):
+    @property
+    def _driver(self):
+        """
+        The driver, switched to the tab this page is bound to. The active tab is
+        remembered on the driver so switching only costs a round trip when it changes.
+        """
+        driver = self.__driver
+        handle = self._window_handle
+        if handle is not None and getattr(driver, "_active_window_handle", None) != handle:
+            driver.switch_to.window(handle)
+            driver._active_window_handle = handle
+        return driver
+
+    @_driver.setter
+    def _driver(self, driver):
+        self.__driver = driver
+
+    def bind_to_window(self, window_handle):
+        """
+        Bind this page to a tab, None unbinds it
+        :param window_handle: handle from get_window_handles
+        """
+        self._window_handle = window_handle
+        return self
+
+    def open(self, url, wait_time=2, locator=None):
         """
         Visit the page base_url + url
         :param url: URL to be opened
-        :param wait_time: time to wait till url opens
+        :param wait_time: maximum time to wait till url opens
+        :param locator: optional locator that has to be present before the page counts as ready
         :return:
         """
         if self._driver.current_url != url:
             self._driver.get(url)
-        self.sleep_in_seconds(wait_time)
+        self.wait_till_page_is_ready(wait_time, locator=locator)
+        self.record_navigation_timing()
+
+    def timing_tags(self):
+        """
+        Tags stored with the navigation timing of this page, extended by subclasses
+        """
+        return {"page": type(self).__name__}
+
+    def record_navigation_timing(self, **tags):
+        """
+        Log the browser side timing of the current page load when NAV_TIMING is enabled.
+        Call it after every navigation, e.g. after submitting a form or following a link.
+        :param tags: tags added to timing_tags
+        :return: the logged record or None
+        """
+        if not NavigationTiming.enabled:
+            return None
+        return NavigationTiming.capture(self._driver, dict(self.timing_tags(), **tags))
+
+    def wait_till_page_is_ready(self, wait_time, locator=None):
+        """
+        Wait till the document is complete and the network is idle, at most wait_time.
+        Falls back to a hard sleep of wait_time when USE_FIXED_SLEEPS is set.
+        :param wait_time: upper bound in seconds, the old fixed sleep
+        :param locator: optional locator that has to be present
+        :return: True if the page became ready before wait_time
+        """
+        if self._deadline is not None:
+            wait_time = max(0, min(wait_time, self._deadline.remaining()))
+        if USE_FIXED_SLEEPS:
+            self.sleep_in_seconds(wait_time)
+            return True
+        locator_by = self.__get_by(locator) if locator else None
+        ready, elapsed = PageReadiness(self._driver).wait(wait_time, locator_by=locator_by)
+        ReadinessStats.record(ready, elapsed, wait_time)
+        return ready
+
+    @contextmanager
+    def deadline(self, seconds=ACTION_TIMEOUT):
+        """
+        Share one time budget between every lookup and wait inside the block.
+        Nested blocks never extend the budget of an enclosing block.
+        Usage:
+            with self.deadline(5):
+                self.click(menu)
+                self.click(menu_item)
+        :param seconds: time budget of the block
+        :return: Deadline
+        """
+        outer = self._deadline
+        deadline = Deadline(seconds)
+        if outer is not None and outer.remaining() < seconds:
+            deadline = outer
+        self._deadline = deadline
+        try:
+            yield deadline
+        finally:
+            self._deadline = outer
+
+    def _wait(self, timeout):
+        """
+        WebDriverWait on the driver of this page, polling without pauses on a replayed session
+        """
+        return WebDriverWait(self._driver, timeout,
+                             poll_frequency=REPLAY_POLL_INTERVAL if is_replay(self._driver) else POLL_FREQUENCY)
+
+    def _timeout(self, timeout):
+        """
+        Clamp the timeout of a single lookup or wait to the remaining action budget
+        :param timeout: timeout requested by the caller
+        :return: timeout to use
+        """
+        if self._deadline is None:
+            return timeout
+        remaining = self._deadline.remaining()
+        if remaining <= 0:
+            raise TimeoutException("Action deadline of {} seconds exceeded".format(self._deadline.seconds))
+        return min(timeout, remaining)
 
     def get_current_driver(self):
         """
@@ -89,23 +215,21 @@ class PageBase(object):
         :param locator: Element locator strategy
         :return: element
         """
-
-        element = None
-        if isinstance(locator, str):
-            element = self.find_element(locator)
-        elif isinstance(locator, WebElement):
-            element = locator
-
-        if element is not None:
-            self.wait_till_element_is_clickable(locator)
-            element.click()
-        else:
+        if isinstance(locator, WebElement):
+            locator.click()
+            return locator
+        if not isinstance(locator, (str, Locator)):
             raise Exception("Could not click on the element with locator {}".
                             format(locator))
+        with self.deadline():
+            # a single lookup that waits straight for the clickable state
+            element = self.wait_till_element_is_clickable(locator, timeout=ACTION_TIMEOUT)
+            element.click()
+        return element
 
     def javascript_click(self, locator):  # click using browser javascipt
         element = None
-        if isinstance(locator, str):
+        if isinstance(locator, (str, Locator)):
             element = self.find_element(locator)
         elif isinstance(locator, WebElement):
             element = locator
@@ -113,7 +237,7 @@ class PageBase(object):
         if element is not None:
             self._driver.execute_script("arguments[0].click();", element)
         else:
-            raise Exception("Could not click on locator " + locator)
+            raise Exception("Could not click on locator {}".format(locator))
 
     def set_field(self, locator, element_value):  # to enter text in input box
         """
@@ -122,13 +246,13 @@ class PageBase(object):
         :param element_value: value to be written
         :return: element
         """
-        webelement = self.find_element(locator)
-        try:
-            self.wait_till_element_is_clickable(locator)
-            webelement.send_keys(element_value)
-        except Exception as e:
-            raise Exception("Could not write on the the element {} due to {}".
-                            format(webelement, e))
+        with self.deadline():
+            webelement = self.wait_till_element_is_clickable(locator, timeout=ACTION_TIMEOUT)
+            try:
+                webelement.send_keys(element_value)
+            except Exception as e:
+                raise Exception("Could not write on the the element {} due to {}".
+                                format(webelement, e))
 
         return webelement
 
@@ -193,20 +317,25 @@ class PageBase(object):
         """
         element = self.find_element(locator)
         try:
-            action = ActionChains(self._driver)
-            action.move_to_element(element).click().perform()
+            self.actions().move_to(element).click().perform()
         except Exception as e:
             raise Exception("Could Not click locator {} due to {}".format(element, e))
         return element
 
     def click_and_move_by_offset(self, locator, offset):
         element = self.find_element(locator)
-        drawing = ActionChains(self._driver) \
-            .move_to_element(element) \
-            .click_and_hold(element) \
-            .move_by_offset(*offset) \
-            .release()
-        drawing.perform()
+        self.actions().move_to(element).click_and_hold(element).move_by(*offset).release().perform()
+
+    def actions(self, duration=ACTION_POINTER_DURATION):
+        """
+        Queue pointer and keyboard actions and send them in one request
+        Usage:
+            with self.actions() as macro:
+                macro.click(menu).move_to(menu_item).click()
+        :param duration: milliseconds every pointer move takes in the browser
+        :return: ActionMacro
+        """
+        return ActionMacro(self, duration=duration)
 
     def find_element(self, locator, timeout=5):
         """
@@ -215,42 +344,60 @@ class PageBase(object):
         :param locator: Element locator strategy
         :return: Element
         """
+        by = self.__get_by(locator_with_strategy=locator)
+        started = perf_counter()
         try:
-            return WebDriverWait(self._driver, timeout=timeout) \
-                .until(EC.presence_of_element_located(self.__get_by(locator_with_strategy=locator)),
-                       message="Timed out after {} seconds while waiting to find the element with locator {} ".format(
-                           timeout, locator))
+            element = self._wait_for_element(
+                by, "present", self._timeout(timeout),
+                message="Timed out after {} seconds while waiting to find the element with locator {} ".format(
+                    timeout, locator))
         except Exception as e:
+            LocatorStats.for_locator(by).record(perf_counter() - started, failed=True)
             raise Exception("Could Not Find Element with locator {} due to error {} ".format(locator, str(e)))
+        LocatorStats.for_locator(by).record(perf_counter() - started)
+        return element
+
+    def _wait_for_element(self, by, condition, timeout, message=""):
+        """
+        Wait till the element is present, visible or clickable. Waits in the page with a
+        mutation observer when WAIT_BACKEND is "mutation" and the driver supports async
+        scripts, polls with WebDriverWait otherwise.
+        :param by: Locator
+        :param condition: present, visible or clickable
+        :param timeout: timeout
+        :return: element
+        """
+        if WAIT_BACKEND == "mutation" and MutationWait.is_supported(self._driver):
+            started = perf_counter()
+            try:
+                element = MutationWait(self._driver).until(by, condition, timeout)
+            except MutationWaitUnavailable:
+                # polling only gets what is left of the budget, the wait must not outlive a deadline()
+                timeout = max(0, timeout - (perf_counter() - started))
+            else:
+                if element is None:
+                    raise TimeoutException(message or "Timed out after {} seconds while waiting for {} to be {}".format(
+                        timeout, by, condition))
+                return element
+        return self._wait(timeout).until(_POLLING_CONDITIONS[condition](by), message=message)
 
     def __get_by(self, locator_with_strategy):  # to locate element by id/xpath etc
         """
         Get and return By instance based on the locator strategy
-        :param locator_with_strategy: Element locator strategy
-        :return: By instance of the element
-        """
-
-        if "@@" not in locator_with_strategy:
-            locator_with_strategy = Strategy.ID.value + "@@" + locator_with_strategy
-
-        strategy_and_locator = str(locator_with_strategy).split("@@")
-        strategy = strategy_and_locator[0]
-        locator = strategy_and_locator[1]
-        by = None
-        if strategy == Strategy.XPATH.value:
-            by = (By.XPATH, locator)
-        elif strategy == Strategy.ID.value:
-            by = (By.ID, locator)
-        elif strategy == Strategy.CSS.value:
-            by = (By.CSS_SELECTOR, locator)
-        elif strategy == Strategy.TAGNAME.value:
-            by = (By.TAG_NAME, locator)
-        elif strategy == Strategy.NAME.value:
-            by = (By.NAME, locator)
-        else:
-            raise Exception(
-                " Incorrect locator specified . Locator has to be either xpath,id,css,tagname -->" + locator_with_strategy)
-        return by
+        :param locator_with_strategy: Element locator strategy, either a compiled Locator or a string
+        :return: Locator, a (By, value) tuple
+        """
+        if isinstance(locator_with_strategy, Locator):
+            return locator_with_strategy
+        return compile_locator(locator_with_strategy)
+
+    def get_locator_by(self, locator):
+        """
+        Public access to the By instance of a locator, e.g. to pass it into browser side scripts
+        :param locator: Element locator strategy
+        :return: (By, value) tuple
+        """
+        return self.__get_by(locator_with_strategy=locator)
 
     def find_elements(self, locator):
         """
@@ -258,10 +405,15 @@ class PageBase(object):
         :param locator: Element locator strategy
         :return: list of the elements
         """
+        by = self.__get_by(locator_with_strategy=locator)
+        started = perf_counter()
         try:
-            return self._driver.find_elements(*self.__get_by(locator_with_strategy=locator))
+            elements = self._driver.find_elements(*by)
         except Exception as e:
+            LocatorStats.for_locator(by).record(perf_counter() - started, failed=True)
             raise Exception("Could Not Find Elements with locator {} due to error {}".format(locator, str(e)))
+        LocatorStats.for_locator(by).record(perf_counter() - started)
+        return elements
 
     def get_el_attribute(self, locator, attribute):
         """
@@ -278,18 +430,12 @@ class PageBase(object):
 
     def drag_and_drop(self, draggable, droppable):
         """
-        Performs drag and drop action using selenium action class
+        Drag draggable onto droppable in a single actions request
         :param draggable: draggable element
         :param droppable: droppable element
         :return:
         """
-        try:
-            action = ActionChains(self._driver)
-            action.click_and_hold(draggable).perform()
-            action.move_to_element(droppable).perform()
-            action.release(droppable).perform()
-        except Exception as e:
-            raise e
+        self.actions().drag_and_drop(draggable, droppable).perform()
 
     def sleep_in_seconds(self, seconds=1):
         """
@@ -297,7 +443,8 @@ class PageBase(object):
         :param seconds: time in seconds
         :return:
         """
-        sleep(seconds)
+        if not is_replay(self.__driver):
+            sleep(seconds)
 
     def select_value_from_dropdown(self, locator, value):
         """
@@ -315,9 +462,8 @@ class PageBase(object):
         :param locator: Element locator strategy
         :return: Found Element
         """
-        element = self.find_element(locator)
         try:
-            element = WebDriverWait(self._driver, timeout).until(EC.element_to_be_clickable(element))
+            element = self._wait_for_element(self.__get_by(locator), "clickable", self._timeout(timeout))
         except Exception as e:
             raise e
         return element
@@ -329,7 +475,7 @@ class PageBase(object):
         :return: Found Element
         """
         try:
-            element = WebDriverWait(self._driver, timeout).until(EC.alert_is_present())
+            element = self._wait(timeout).until(EC.alert_is_present())
         except Exception as e:
             raise e
         return element
@@ -383,7 +529,7 @@ class PageBase(object):
         element = self.find_element(locator)
         try:
             element.send_keys(Keys.PAGE_DOWN)
-            self.sleep_in_seconds(wait_time)
+            self.wait_till_page_is_ready(wait_time)
         except Exception as e:
             raise e
 
@@ -394,11 +540,8 @@ class PageBase(object):
         :param wait_seconds: time to wait
         :return:
         """
-        element = self.find_element(locator)
-        action_obj = ActionChains(self._driver)
-        action_obj.move_to_element(element)
-        action_obj.perform()
-        self.sleep_in_seconds(wait_seconds)
+        self.actions().move_to(locator).perform()
+        self.wait_till_page_is_ready(wait_seconds)
 
     def read_browser_console_log(self, log_type='browser'):
         """
@@ -450,8 +593,7 @@ class PageBase(object):
         :return:
         """
         try:
-            element = WebDriverWait(self._driver, timeout). \
-                until(EC.presence_of_element_located(self.__get_by(locator)))
+            element = self._wait_for_element(self.__get_by(locator), "present", self._timeout(timeout))
             return element
         except Exception as e:
             raise e
@@ -464,7 +606,7 @@ class PageBase(object):
         :return:
         """
 
-        WebDriverWait(self._driver, timeout). \
+        self._wait(self._timeout(timeout)). \
             until(EC.invisibility_of_element_located(self.__get_by(locator)))
 
     def wait_till_element_is_visible(self, locator, timeout=GLOBAL_TIMEOUT):
@@ -475,8 +617,7 @@ class PageBase(object):
         :return:
         """
         try:
-            element = WebDriverWait(self._driver, timeout). \
-                until(EC.visibility_of_element_located(self.__get_by(locator)))
+            element = self._wait_for_element(self.__get_by(locator), "visible", self._timeout(timeout))
             return element
         except Exception as e:
             raise e
@@ -489,17 +630,16 @@ class PageBase(object):
         :return:
         """
         try:
-            element = WebDriverWait(self._driver, timeout). \
-                until(EC.element_to_be_clickable(self.__get_by(locator)))
+            element = self._wait_for_element(self.__get_by(locator), "clickable", self._timeout(timeout))
             return element
         except Exception as e:
             raise e
 
     def enter_value_and_select_from_dropdown(self, dropdown_locator, dropdown_input_box_locator, value):
-        self.click(dropdown_locator)
-        # self.sleep_in_seconds(2)
-        self.set_field(dropdown_input_box_locator, value)
-        self.hit_enter(dropdown_input_box_locator)
+        with self.deadline():
+            self.click(dropdown_locator)
+            # typing and Enter go to the input box found by set_field, no second lookup
+            self.set_field(dropdown_input_box_locator, value).send_keys(Keys.ENTER)
 
     def teardown_browser(self):
         """
@@ -535,8 +675,7 @@ class PageBase(object):
         :return: Boolean
         """
         try:
-            WebDriverWait(self._driver, timeout=timeout) \
-                .until(EC.presence_of_element_located(self.__get_by(locator)))
+            self._wait_for_element(self.__get_by(locator), "present", self._timeout(timeout))
         except TimeoutException:
             return False
         except Exception as e:
@@ -576,7 +715,9 @@ class PageBase(object):
         Switch to window corresponding to windows handle id
         :return:
         """
-        self._driver.switch_to_window(win_handle)
+        driver = self._driver
+        driver.switch_to.window(win_handle)
+        driver._active_window_handle = win_handle
 
     def refresh_browser(self):
         """
@@ -587,7 +728,7 @@ class PageBase(object):
 
     def wait_till_text_present_in_input_field(self, locator, text, timeout=GLOBAL_TIMEOUT):
         try:
-            element = WebDriverWait(self._driver, timeout). \
+            element = self._wait(self._timeout(timeout)). \
                 until(EC.text_to_be_present_in_element(self.__get_by(locator), text))
             return element
         except Exception as e:
@@ -602,12 +743,8 @@ class PageBase(object):
         return class_constructor(self._driver, *args, **kwargs)
 
 
-class Strategy(Enum):
-    """
-    Locator Strategy Constants
-    """
-    XPATH = "xpath"
-    ID = "id"
-    CSS = "css"
-    TAGNAME = "tag name"
-    NAME = "name"
+_POLLING_CONDITIONS = {
+    "present": EC.presence_of_element_located,
+    "visible": EC.visibility_of_element_located,
+    "clickable": EC.element_to_be_clickable,
+}
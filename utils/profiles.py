@@ -0,0 +1,195 @@
+"""
+Persistent browser profiles, one per concurrent session. A profile keeps cookies (and with
+them the consent state of the search engines), the http cache and the DNS / TLS state of
+the browser across runs, so searches do not start cold. An operating system lock on a
+file next to the profile makes sure it is never opened by two sessions at the same time,
+and is released by the operating system when a session crashes.
+
+    python -m utils.profiles list
+    python -m utils.profiles reset chrome            # every chrome profile
+    python -m utils.profiles reset chrome profile-0
+"""
+
+import json
+import os
+import shutil
+import socket
+import sys
+import time
+from settings import BROWSER_PROFILE_ROOT, BROWSER_PROFILE_SLOTS
+
+
+class ProfileInUse(Exception):
+    """
+    Raised when a profile is locked by another live session
+    """
+
+
+def _try_lock(descriptor):
+    """
+    Non blocking exclusive lock held by the operating system, released when the process dies
+    :return: False when another open file already holds it
+    """
+    try:
+        if os.name == "nt":
+            import msvcrt
+            msvcrt.locking(descriptor, msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(descriptor, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+class Profile:
+
+    def __init__(self, manager, browser, name):
+        self.manager = manager
+        self.browser = browser
+        self.name = name
+        self.path = os.path.join(manager.root, browser, name)
+        self.lock_path = os.path.join(manager.root, browser, name + ".lock")
+        self._lock_descriptor = None
+
+    def owner(self):
+        """
+        :return: dict with host and pid of the session that locked the profile last
+        """
+        try:
+            with open(self.lock_path, encoding="utf-8") as lock:
+                return json.loads(lock.read()[1:] or "null")
+        except (OSError, ValueError):
+            # missing, or the locked first byte can not be read on Windows
+            return None
+
+    def is_locked(self):
+        if self._lock_descriptor is not None:
+            return True
+        if not os.path.exists(self.lock_path):
+            return False
+        descriptor = os.open(self.lock_path, os.O_RDWR)
+        try:
+            # closing the descriptor releases the probe lock again
+            return not _try_lock(descriptor)
+        finally:
+            os.close(descriptor)
+
+    def lock(self):
+        if self._lock_descriptor is not None:
+            raise ProfileInUse("Profile {} is already locked by this process".format(self.path))
+        os.makedirs(self.path, exist_ok=True)
+        descriptor = os.open(self.lock_path, os.O_CREAT | os.O_RDWR)
+        if not _try_lock(descriptor):
+            os.close(descriptor)
+            raise ProfileInUse("Profile {} is in use by {}".format(self.path, self.owner()))
+        # the first byte is the locked region on Windows, the owner is written after it
+        owner = json.dumps({"host": socket.gethostname(), "pid": os.getpid(), "since": time.time()})
+        os.ftruncate(descriptor, 0)
+        os.lseek(descriptor, 0, os.SEEK_SET)
+        os.write(descriptor, (" " + owner).encode("utf-8"))
+        self._lock_descriptor = descriptor
+        return self
+
+    def unlock(self):
+        if self._lock_descriptor is not None:
+            os.close(self._lock_descriptor)
+            self._lock_descriptor = None
+
+    def __enter__(self):
+        return self.lock()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.unlock()
+
+    def __repr__(self):
+        return "Profile({})".format(self.path)
+
+
+class ProfileManager:
+    """
+    Usage:
+        profiles = ProfileManager()
+        with profiles.acquire(SupportedBrowsers.chrome) as profile:
+            driver = DriverClass.register_driver(browser=SupportedBrowsers.chrome, profile_dir=profile.path)
+    """
+
+    def __init__(self, root=BROWSER_PROFILE_ROOT, slots=BROWSER_PROFILE_SLOTS):
+        """
+        :param root: directory holding a directory of profiles per browser
+        :param slots: number of profiles per browser, bounds the concurrent sessions
+        """
+        self.root = root
+        self.slots = slots
+
+    def profile(self, browser, name):
+        return Profile(self, browser, name)
+
+    def profiles(self, browser):
+        return [self.profile(browser, "profile-{}".format(slot)) for slot in range(self.slots)]
+
+    def acquire(self, browser, name=None):
+        """
+        Lock a profile for a new session
+        :param browser: browser type from SupportedBrowsers
+        :param name: lock this profile, by default the first free one is taken
+        :return: locked Profile
+        """
+        if name is not None:
+            return self.profile(browser, name).lock()
+        for profile in self.profiles(browser):
+            try:
+                return profile.lock()
+            except ProfileInUse:
+                continue
+        raise ProfileInUse("All {} {} profiles in {} are in use".format(self.slots, browser, self.root))
+
+    def reset(self, browser, name=None):
+        """
+        Delete profiles, they start empty on the next acquire
+        :param name: reset only this profile
+        :return: list of the profiles that were reset
+        :raises ProfileInUse: when a profile is locked by a running session
+        """
+        targets = [self.profile(browser, name)] if name else self.profiles(browser)
+        reset = []
+        for profile in targets:
+            if profile.is_locked():
+                raise ProfileInUse("Can not reset profile {} in use by {}".format(profile.path, profile.owner()))
+            if os.path.isdir(profile.path):
+                shutil.rmtree(profile.path)
+                reset.append(profile)
+        return reset
+
+    def report(self):
+        """
+        :return: dict of profile path to size in MB and lock owner
+        """
+        report = {}
+        for browser in sorted(os.listdir(self.root)) if os.path.isdir(self.root) else []:
+            for name in sorted(os.listdir(os.path.join(self.root, browser))):
+                profile = self.profile(browser, name)
+                if not os.path.isdir(profile.path):
+                    continue
+                size = 0
+                for directory, _, files in os.walk(profile.path):
+                    for file in files:
+                        try:
+                            size += os.path.getsize(os.path.join(directory, file))
+                        except OSError:
+                            # a running browser creates and removes files all the time
+                            continue
+                report[os.path.join(browser, name)] = {"size_mb": round(size / (1024 * 1024), 1),
+                                                       "owner": profile.owner() if profile.is_locked() else None}
+        return report
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 2 and sys.argv[1] == "list":
+        print(json.dumps(ProfileManager().report(), indent=2, sort_keys=True))
+    elif len(sys.argv) in (3, 4) and sys.argv[1] == "reset":
+        for reset_profile in ProfileManager().reset(*sys.argv[2:]):
+            print("Reset {}".format(reset_profile.path))
+    else:
+        print("Usage: python -m utils.profiles list | reset <browser> [profile name]")
+        sys.exit(2)
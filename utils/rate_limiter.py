@@ -0,0 +1,247 @@
+"""
+Adaptive rate limiting per search engine. Every engine gets a token bucket for the
+request rate and a concurrency limit for the searches in flight. Both grow additively
+while searches stay fast and error free and are cut in half on timeouts, interstitials
+(captcha / unusual traffic pages) or a rising error rate, which keeps throughput close
+to what an engine tolerates without tripping its throttling.
+"""
+
+import threading
+import time
+from settings import (RATE_LIMITS, RATE_LIMIT_DEFAULT, RATE_LIMIT_MIN_RATE, RATE_LIMIT_RATE_STEP,
+                      RATE_LIMIT_TARGET_LATENCY, RATE_LIMIT_MAX_ERROR_RATE, RATE_LIMIT_COOLDOWN)
+
+# outcomes of a search reported to release
+OK = "ok"
+ERROR = "error"
+TIMEOUT = "timeout"
+INTERSTITIAL = "interstitial"
+
+_EWMA_WEIGHT = 0.2
+
+
+class TokenBucket:
+    """
+    Not thread safe on its own, EngineLimiter serializes access
+    """
+
+    def __init__(self, rate, burst=1):
+        """
+        :param rate: tokens per second
+        :param burst: tokens that can be saved up while idle
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def set_rate(self, rate, now):
+        self._refill(now)
+        self.rate = rate
+
+    def drain(self, now):
+        self._refill(now)
+        self.tokens = 0
+
+    def take(self, now):
+        """
+        Take a token if one is available
+        :return: 0 when a token was taken, otherwise seconds until the next one
+        """
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class EngineLimiter:
+    """
+    Usage:
+        limiter.acquire()
+        started = time.monotonic()
+        ... search ...
+        limiter.release(time.monotonic() - started, OK)
+    """
+
+    def __init__(self, engine, rate, max_rate, concurrency, max_concurrency, min_rate=RATE_LIMIT_MIN_RATE,
+                 target_latency=RATE_LIMIT_TARGET_LATENCY, max_error_rate=RATE_LIMIT_MAX_ERROR_RATE,
+                 cooldown=RATE_LIMIT_COOLDOWN):
+        """
+        :param engine: SearchEngines member name
+        :param rate: initial searches per second
+        :param max_rate: the rate never grows past this
+        :param concurrency: initial searches in flight
+        :param max_concurrency: the concurrency never grows past this
+        :param min_rate: the rate never backs off below this
+        :param target_latency: seconds, slower searches do not count as healthy
+        :param max_error_rate: moving average of failed searches that triggers a back off
+        :param cooldown: seconds no search is started after an interstitial
+        """
+        self.engine = engine
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, rate)
+        self.max_concurrency = max(1, max_concurrency)
+        self.concurrency = max(1, min(concurrency, self.max_concurrency))
+        self.target_latency = target_latency
+        self.max_error_rate = max_error_rate
+        self.cooldown = cooldown
+        self.bucket = TokenBucket(rate)
+        self._condition = threading.Condition()
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.error_rate = 0.0
+        self.latency = None
+        self._healthy_streak = 0
+        self._backed_off_at = None
+        self.started = 0
+        self.completed = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.interstitials = 0
+        self.back_offs = 0
+
+    def acquire(self, timeout=None):
+        """
+        Block till a search may start
+        :param timeout: seconds to wait, None waits forever
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                if self.in_flight >= self.concurrency:
+                    wait = None  # woken up by release
+                elif now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    wait = self.bucket.take(now)
+                    if wait == 0:
+                        self.in_flight += 1
+                        self.started += 1
+                        return
+                if deadline is not None:
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise Exception("Timed out after {} seconds waiting for the {} rate limit".format(
+                            timeout, self.engine))
+                    wait = remaining if wait is None else min(wait, remaining)
+                self._condition.wait(wait)
+
+    def release(self, seconds, outcome=OK):
+        """
+        Report a finished search and adapt rate and concurrency to it
+        :param seconds: duration of the search
+        :param outcome: OK, ERROR, TIMEOUT or INTERSTITIAL
+        """
+        with self._condition:
+            now = time.monotonic()
+            self.in_flight = max(0, self.in_flight - 1)
+            self.completed += 1
+            failed = outcome != OK
+            self.error_rate = _EWMA_WEIGHT * failed + (1 - _EWMA_WEIGHT) * self.error_rate
+            self.latency = seconds if self.latency is None else \
+                _EWMA_WEIGHT * seconds + (1 - _EWMA_WEIGHT) * self.latency
+            if outcome == INTERSTITIAL:
+                self.interstitials += 1
+                self.paused_until = max(self.paused_until, now + self.cooldown)
+                self._back_off(now, force=True)
+            elif outcome == TIMEOUT:
+                self.timeouts += 1
+                self._back_off(now)
+            elif failed:
+                self.errors += 1
+                if self.error_rate > self.max_error_rate:
+                    self._back_off(now)
+            elif seconds <= self.target_latency and self.error_rate <= self.max_error_rate:
+                self._healthy_streak += 1
+                # one step up per round of healthy searches at the current concurrency
+                if self._healthy_streak >= self.concurrency:
+                    self._speed_up(now)
+            else:
+                self._healthy_streak = 0
+            self._condition.notify_all()
+
+    def _back_off(self, now, force=False):
+        self._healthy_streak = 0
+        self.bucket.drain(now)
+        # searches already in flight when the engine slowed down report the same problem,
+        # halve once for all of them
+        if not force and self._backed_off_at is not None and now - self._backed_off_at < (self.latency or 0):
+            return
+        self._backed_off_at = now
+        self.back_offs += 1
+        self.concurrency = max(1, self.concurrency // 2)
+        self.bucket.set_rate(max(self.min_rate, self.bucket.rate / 2), now)
+
+    def _speed_up(self, now):
+        self._healthy_streak = 0
+        self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+        self.bucket.set_rate(min(self.max_rate, self.bucket.rate + RATE_LIMIT_RATE_STEP), now)
+
+    def snapshot(self):
+        with self._condition:
+            return {
+                "rate": round(self.bucket.rate, 3),
+                "concurrency": self.concurrency,
+                "in_flight": self.in_flight,
+                "paused_seconds": round(max(0.0, self.paused_until - time.monotonic()), 1),
+                "error_rate": round(self.error_rate, 3),
+                "latency_seconds": None if self.latency is None else round(self.latency, 3),
+                "started": self.started,
+                "completed": self.completed,
+                "errors": self.errors,
+                "timeouts": self.timeouts,
+                "interstitials": self.interstitials,
+                "back_offs": self.back_offs,
+            }
+
+
+class RateLimiter:
+    """
+    One EngineLimiter per engine, configured from RATE_LIMITS
+
+    Usage:
+        limiter = RateLimiter(max_concurrency=workers)
+        limiter.acquire("google")
+        ...
+        limiter.release("google", seconds, outcome)
+    """
+
+    def __init__(self, limits=RATE_LIMITS, max_concurrency=None):
+        """
+        :param limits: dict of engine name to EngineLimiter keyword arguments
+        :param max_concurrency: upper bound for every engine, e.g. the number of workers
+        """
+        self.limits = limits
+        self.max_concurrency = max_concurrency
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def for_engine(self, engine):
+        with self._lock:
+            limiter = self._limiters.get(engine)
+            if limiter is None:
+                config = dict(self.limits.get(engine, RATE_LIMIT_DEFAULT))
+                if self.max_concurrency is not None:
+                    config["max_concurrency"] = min(config["max_concurrency"], self.max_concurrency)
+                limiter = self._limiters[engine] = EngineLimiter(engine, **config)
+            return limiter
+
+    def acquire(self, engine, timeout=None):
+        self.for_engine(engine).acquire(timeout=timeout)
+
+    def release(self, engine, seconds, outcome=OK):
+        self.for_engine(engine).release(seconds, outcome)
+
+    def snapshot(self):
+        """
+        :return: dict of engine name to live rate, concurrency and in flight counts
+        """
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {engine: limiter.snapshot() for engine, limiter in sorted(limiters.items())}
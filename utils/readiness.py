@@ -0,0 +1,111 @@
+import threading
+import time
+from utils.cassette import is_replay
+from utils.page_scripts import FIND_ALL_FUNCTION
+from settings import READINESS_POLL_INTERVAL, READINESS_QUIET_PERIOD
+
+
+# WAIT ONLY AS LONG AS THE PAGE NEEDS
+
+# arguments: optional (By, value) of an element that has to be present
+READINESS_SCRIPT = FIND_ALL_FUNCTION + """
+var found = arguments[0] ? findAll(document, arguments[0], arguments[1]).length > 0 : true;
+// the resource timing buffer stops at 250 entries, a count read from it stands still on heavy
+// pages, so resources are counted by an observer installed on the first poll of a document
+if (window.__readinessResources === undefined) {
+    try { performance.setResourceTimingBufferSize(100000); } catch (e) {}
+    window.__readinessResources = performance.getEntriesByType('resource').length;
+    try {
+        new PerformanceObserver(function (list) {
+            window.__readinessResources += list.getEntries().length;
+        }).observe({type: 'resource'});
+    } catch (e) {
+        window.__readinessResources = null;
+    }
+}
+var resources = window.__readinessResources === null
+    ? performance.getEntriesByType('resource').length : window.__readinessResources;
+return [document.readyState, resources, found];
+"""
+
+
+class ReadinessStats:
+    """
+    Process wide totals of readiness waits compared with the fixed sleeps they replace
+    """
+    _lock = threading.Lock()
+    waits = 0
+    timed_out = 0
+    seconds_waited = 0.0
+    seconds_saved = 0.0
+
+    @classmethod
+    def record(cls, ready, elapsed, fixed_sleep):
+        with cls._lock:
+            cls.waits += 1
+            cls.timed_out += 0 if ready else 1
+            cls.seconds_waited += elapsed
+            cls.seconds_saved += max(0.0, fixed_sleep - elapsed)
+
+    @classmethod
+    def report(cls):
+        """
+        :return: dict with the number of waits and the seconds spent / saved
+        """
+        with cls._lock:
+            return {
+                "waits": cls.waits,
+                "timed_out": cls.timed_out,
+                "seconds_waited": round(cls.seconds_waited, 3),
+                "seconds_saved": round(cls.seconds_saved, 3),
+            }
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls.waits = cls.timed_out = 0
+            cls.seconds_waited = cls.seconds_saved = 0.0
+
+
+class PageReadiness:
+    """
+    Polls the browser until the document is complete, no new resources have been
+    requested for the quiet period and, optionally, a locator is present.
+    """
+
+    def __init__(self, driver, poll_interval=READINESS_POLL_INTERVAL, quiet_period=READINESS_QUIET_PERIOD):
+        """
+        :param driver: WebDriver object
+        :param poll_interval: seconds between two readiness checks
+        :param quiet_period: seconds without new network requests before the page counts as idle
+        """
+        self._driver = driver
+        self.poll_interval = poll_interval
+        self.quiet_period = quiet_period
+        if is_replay(driver):
+            # the recorded polls already tell when the page was ready, waiting in between only slows replay down
+            self.poll_interval = self.quiet_period = 0
+
+    def wait(self, timeout, locator_by=None):
+        """
+        Wait till the page is ready or the timeout expires, whichever comes first
+        :param timeout: maximum seconds to wait
+        :param locator_by: optional (By, value) tuple that has to be present
+        :return: (ready, elapsed seconds)
+        """
+        by, value = locator_by if locator_by else (None, None)
+        start = time.monotonic()
+        deadline = start + timeout
+        last_resource_count = None
+        quiet_since = start
+        while True:
+            ready_state, resource_count, found = self._driver.execute_script(READINESS_SCRIPT, by, value)
+            now = time.monotonic()
+            if resource_count != last_resource_count:
+                last_resource_count = resource_count
+                quiet_since = now
+            if ready_state == "complete" and found and now - quiet_since >= self.quiet_period:
+                return True, now - start
+            if now >= deadline:
+                return False, now - start
+            time.sleep(min(self.poll_interval, deadline - now))
@@ -0,0 +1,125 @@
+"""
+On disk cache of scraped search result pages, shared by every worker process on the host.
+Entries are keyed by (engine, keyword, page, locale), expire after a TTL and the least
+recently used entries are evicted once the cache holds more than max_entries pages.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from settings import RESULT_CACHE_PATH, RESULT_CACHE_TTL, RESULT_CACHE_MAX_ENTRIES
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    engine TEXT NOT NULL,
+    keyword TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    locale TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (engine, keyword, page, locale)
+);
+CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class ResultCache:
+    """
+    Usage:
+        cache = ResultCache()
+        results = cache.get("google", "selenium", page=1, locale="en-US")
+        if results is None:
+            cache.put("google", "selenium", 1, "en-US", scraped_results)
+    """
+
+    def __init__(self, path=RESULT_CACHE_PATH, ttl=RESULT_CACHE_TTL, max_entries=RESULT_CACHE_MAX_ENTRIES):
+        """
+        :param path: sqlite database file
+        :param ttl: seconds a cached page stays valid
+        :param max_entries: number of cached pages kept before the least recently used are evicted
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+
+    def _connection(self):
+        # sqlite connections must not cross threads or a fork, so keep one per thread and pid
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, engine, keyword, page, locale):
+        """
+        :return: list of result dicts or None when the page is not cached or expired
+        """
+        key = (engine, keyword, page, locale)
+        now = time.time()
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT payload, created_at FROM entries WHERE engine=? AND keyword=? AND page=? AND locale=?",
+            key).fetchone()
+        if row is not None and now - row[1] > self.ttl:
+            connection.execute("DELETE FROM entries WHERE engine=? AND keyword=? AND page=? AND locale=?", key)
+            row = None
+        if row is None:
+            self._count("misses")
+            return None
+        connection.execute("UPDATE entries SET accessed_at=? WHERE engine=? AND keyword=? AND page=? AND locale=?",
+                           (now,) + key)
+        self._count("hits")
+        return json.loads(row[0])
+
+    def put(self, engine, keyword, page, locale, results):
+        """
+        Store a page of results, evicting the least recently used pages beyond max_entries
+        :param results: list of result dicts
+        """
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                               (engine, keyword, page, locale, json.dumps(results, separators=(",", ":")), now, now))
+            overflow = connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                connection.execute("DELETE FROM entries WHERE rowid IN "
+                                   "(SELECT rowid FROM entries ORDER BY accessed_at LIMIT ?)", (overflow,))
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def clear(self):
+        self._connection().execute("DELETE FROM entries")
+
+    def _count(self, name):
+        setattr(self, name, getattr(self, name) + 1)
+        self._connection().execute("INSERT INTO counters VALUES (?, 1) "
+                                   "ON CONFLICT(name) DO UPDATE SET value = value + 1", (name,))
+
+    def report(self):
+        """
+        :return: hit / miss counts of this instance and totals across every process using the file
+        """
+        totals = dict(self._connection().execute("SELECT name, value FROM counters").fetchall())
+        entries = self._connection().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries,
+                "total_hits": totals.get("hits", 0), "total_misses": totals.get("misses", 0)}
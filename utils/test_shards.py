@@ -0,0 +1,269 @@
+"""
+Sharding of the unittest suites over Appium endpoints and worker processes. Tests are
+spread with the longest processing time first rule on their durations from earlier runs,
+so the shards finish at about the same time, every shard runs in its own process against
+its own endpoint and streams a record per test back to be merged into one report.
+"""
+
+import heapq
+import json
+import multiprocessing
+import os
+import queue
+import re
+import sys
+import time
+import traceback
+import unittest
+from utils.general_utils import percentile
+from settings import TEST_DEFAULT_DURATION, TEST_DURATION_SMOOTHING, TEST_DURATIONS_PATH
+
+PASSED, FAILED, ERROR, SKIPPED = "passed", "failed", "error", "skipped"
+# description of the stand-in test unittest reports errors of class and module fixtures with
+FIXTURE = re.compile(r"(setUpClass|setUpModule|tearDownClass|tearDownModule) \((.*)\)")
+
+
+def collect(names):
+    """
+    :param names: test modules, classes or methods, e.g. calculator or teams.SimpleTeamsTests
+    :return: (list of test ids in suite order, list of error records of names that did not load)
+    """
+    tests, errors = [], []
+
+    def flatten(suite):
+        for test in suite:
+            if isinstance(test, unittest.TestSuite):
+                flatten(test)
+            elif isinstance(test, unittest.loader._FailedTest):
+                errors.append({"test": test.id(), "status": ERROR, "seconds": 0.0,
+                               "message": str(test._exception).strip().splitlines()[-1]})
+            else:
+                tests.append(test.id())
+
+    for name in names:
+        flatten(unittest.TestLoader().loadTestsFromName(name))
+    return tests, errors
+
+
+class TestDurations:
+    """
+    Durations of earlier runs per test id, smoothed over the runs
+    """
+
+    def __init__(self, path=TEST_DURATIONS_PATH):
+        self.path = path
+        try:
+            with open(path, encoding="utf-8") as history:
+                self.seconds = json.load(history)
+        except (OSError, ValueError):
+            self.seconds = {}
+
+    def estimate(self, test):
+        if test in self.seconds:
+            return self.seconds[test]
+        # a new test is assumed to be as long as a typical known one
+        return percentile(list(self.seconds.values()), 0.5) if self.seconds else TEST_DEFAULT_DURATION
+
+    def update(self, records):
+        for record in records:
+            if record["status"] in (PASSED, FAILED) and record["seconds"] > 0:
+                old = self.seconds.get(record["test"])
+                self.seconds[record["test"]] = round(record["seconds"] if old is None else
+                                                     old + TEST_DURATION_SMOOTHING * (record["seconds"] - old), 3)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # replaced in one step, an interrupted run never leaves a torn history
+        temporary = "{}.{}.tmp".format(self.path, os.getpid())
+        with open(temporary, "w", encoding="utf-8") as history:
+            json.dump(self.seconds, history, indent=1, sort_keys=True)
+        os.replace(temporary, self.path)
+
+
+class Shard:
+
+    def __init__(self, index, endpoint):
+        self.index = index
+        self.endpoint = endpoint
+        self.tests = []
+        self.predicted_seconds = 0.0
+
+    def to_dict(self):
+        return {"shard": self.index, "endpoint": self.endpoint, "tests": len(self.tests),
+                "predicted_seconds": round(self.predicted_seconds, 3)}
+
+
+def test_class(test):
+    """
+    :return: id of the TestCase class of a test id, e.g. calculator.SimpleCalculatorTests
+    """
+    return test.rpartition(".")[0]
+
+
+def plan(tests, endpoints, processes=1, durations=None):
+    """
+    Longest processing time first over whole TestCase classes: the longest class goes to the shard
+    with the least work so far, so a class runs in one worker and its tests share one session
+    :param tests: test ids in suite order
+    :param endpoints: Appium endpoints, each gets processes shards
+    :param durations: TestDurations
+    :return: list of Shard with at least one test, tests in suite order
+    """
+    durations = durations or TestDurations()
+    shards = [Shard(index, endpoint)
+              for index, endpoint in enumerate(endpoint for endpoint in endpoints for _ in range(processes))]
+    loads = [(0.0, shard.index) for shard in shards]
+    order = {test: position for position, test in enumerate(tests)}
+    classes = {}
+    for test in tests:
+        classes.setdefault(test_class(test), []).append(test)
+    seconds = {name: sum(durations.estimate(test) for test in members) for name, members in classes.items()}
+    for name in sorted(classes, key=lambda name: (-seconds[name], order[classes[name][0]])):
+        load, index = heapq.heappop(loads)
+        shards[index].tests.extend(classes[name])
+        shards[index].predicted_seconds += seconds[name]
+        heapq.heappush(loads, (load + seconds[name], index))
+    for shard in shards:
+        # the loader runs the classes of a shard in this order, setUpModule runs once per module
+        shard.tests.sort(key=order.get)
+    return [shard for shard in shards if shard.tests]
+
+
+class _StreamingResult(unittest.TestResult):
+    """
+    Puts a record per finished test on a queue
+    """
+
+    def __init__(self, shard, results):
+        super().__init__()
+        self.shard = shard
+        self.results = results
+        self._started = {}
+        self._failed_subtests = set()
+        self._reported = set()
+
+    def _put(self, test, status, err=None, message=None):
+        if err is not None:
+            message = "".join(traceback.format_exception_only(err[0], err[1])).strip()
+        fixture = FIXTURE.fullmatch(test.id()) if isinstance(test, unittest.suite._ErrorHolder) else None
+        if fixture is not None and fixture.group(1).startswith("setUp"):
+            # the tests of the class or module never start, each gets the error of its fixture once
+            prefix = fixture.group(2) + "."
+            test_ids = [test_id for test_id in self.shard.tests
+                        if test_id.startswith(prefix) and test_id not in self._reported]
+        else:
+            test_ids = [test.id()]
+        for test_id in test_ids:
+            started = self._started.pop(test_id, None)
+            self._reported.add(test_id)
+            self.results.put({"test": test_id, "status": status, "shard": self.shard.index,
+                              "endpoint": self.shard.endpoint, "message": message,
+                              "seconds": round(time.perf_counter() - started, 3) if started else 0.0})
+
+    def startTest(self, test):
+        super().startTest(test)
+        self._started[test.id()] = time.perf_counter()
+
+    def addSuccess(self, test):
+        super().addSuccess(test)
+        self._put(test, PASSED)
+
+    def addFailure(self, test, err):
+        super().addFailure(test, err)
+        self._put(test, FAILED, err)
+
+    def addError(self, test, err):
+        # also called for errors of class and module fixtures, with a stand-in for the test
+        super().addError(test, err)
+        self._put(test, ERROR, err)
+
+    def addSkip(self, test, reason):
+        super().addSkip(test, reason)
+        self._put(test, SKIPPED, message=reason)
+
+    def addExpectedFailure(self, test, err):
+        super().addExpectedFailure(test, err)
+        self._put(test, PASSED, message="expected failure")
+
+    def addUnexpectedSuccess(self, test):
+        super().addUnexpectedSuccess(test)
+        self._put(test, FAILED, message="unexpected success")
+
+    def addSubTest(self, test, subtest, err):
+        super().addSubTest(test, subtest, err)
+        # a failed subtest fails its test, which gets no addSuccess then
+        if err is not None and test.id() not in self._failed_subtests:
+            self._failed_subtests.add(test.id())
+            self._put(test, FAILED if issubclass(err[0], test.failureException) else ERROR, err)
+
+
+def _run_shard(shard, results):
+    """
+    Worker process, runs the tests of one shard against its endpoint
+    """
+    from utils.appium_session import AppiumSessions
+    AppiumSessions.endpoint = shard.endpoint
+    try:
+        unittest.TestLoader().loadTestsFromNames(shard.tests).run(_StreamingResult(shard, results))
+    finally:
+        AppiumSessions.close()
+        results.put(("done", shard.index))
+
+
+def run(shards, progress=sys.stderr):
+    """
+    Run every shard in its own process
+    :param progress: text stream a line per finished test is written to
+    :return: list of test records of every shard
+    """
+    results = multiprocessing.Queue()
+    processes = {shard.index: multiprocessing.Process(target=_run_shard, args=(shard, results), daemon=True)
+                 for shard in shards}
+    for process in processes.values():
+        process.start()
+    records, done = [], set()
+    while len(done) < len(shards):
+        try:
+            record = results.get(timeout=1)
+        except queue.Empty:
+            if not any(process.is_alive() for process in processes.values()):
+                break
+            continue
+        if isinstance(record, tuple) and record[0] == "done":
+            done.add(record[1])
+            continue
+        records.append(record)
+        if progress is not None:
+            progress.write("{status:<8}{test} ({seconds:.2f}s, shard {shard})\n".format(**record))
+            progress.flush()
+    for process in processes.values():
+        process.join()
+    reported = {record["test"] for record in records}
+    for shard in shards:
+        # a worker that crashed reports nothing for the rest of its tests
+        exit_code = processes[shard.index].exitcode
+        for test in shard.tests:
+            if test not in reported:
+                records.append({"test": test, "status": ERROR, "shard": shard.index, "endpoint": shard.endpoint,
+                                "seconds": 0.0, "message": "not run, worker exited with code {}".format(exit_code)})
+    return records
+
+
+def merge(shards, records, seconds):
+    """
+    :return: one report of all shards, tests sorted by id
+    """
+    statuses = {status: 0 for status in (PASSED, FAILED, ERROR, SKIPPED)}
+    shard_seconds = {shard.index: 0.0 for shard in shards}
+    for record in records:
+        statuses[record["status"]] += 1
+        if record.get("shard") in shard_seconds:
+            shard_seconds[record["shard"]] += record["seconds"]
+    busy = list(shard_seconds.values())
+    return {
+        "summary": dict(statuses, tests=len(records), seconds=round(seconds, 3),
+                        # 1.0 when every shard was busy for the same time
+                        imbalance=round(max(busy) / (sum(busy) / len(busy)), 3) if busy and sum(busy) else None),
+        "shards": [dict(shard.to_dict(), seconds=round(shard_seconds[shard.index], 3)) for shard in shards],
+        "tests": sorted(records, key=lambda record: record["test"]),
+    }